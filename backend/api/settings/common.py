@@ -83,6 +83,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.smear.identity_map.IdentityMapMiddleware",
 ]
 
 ROOT_URLCONF = "api.urls"
@@ -229,3 +230,13 @@ LOGGING = {
 
 ANONYMOUS_EMAIL = "is_anonymous@playsmear.com"
 TAWK_KEY = os.getenv("TAWK_KEY", "amazing, I have the same key on my luggage")
+
+# Precomputed computer bids, see apps.smear.bid_book. Computers calculate their bids when it isn't set
+BID_BOOK_PATH = os.getenv("BID_BOOK_PATH")
+
+# Monte-Carlo bidding, see apps.smear.bid_simulation. Computers only simulate their bids when
+# MONTE_CARLO_BID_BUDGET (seconds per bid) is set, and fall back to the bid book or calculate_bid in time
+MONTE_CARLO_BID_BUDGET = float(os.getenv("MONTE_CARLO_BID_BUDGET", "0"))
+MONTE_CARLO_BID_SAMPLES = int(os.getenv("MONTE_CARLO_BID_SAMPLES", "1000"))
+# Processes in the simulation pool, 0 simulates in the web worker itself
+MONTE_CARLO_BID_WORKERS = int(os.getenv("MONTE_CARLO_BID_WORKERS", "2"))
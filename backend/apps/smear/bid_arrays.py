@@ -0,0 +1,150 @@
+"""NumPy version of the computer's bidding for batches of hands
+
+calculate_bids() does what computer_logic.calculate_bid does, for an
+(N, cards_per_hand) array of card ids (see apps.smear.card_arrays) instead
+of one Player, and without touching the database: the number of players,
+whether the bidder is the dealer and whether there is already a high bid
+are passed in. Every step does the same floating point operations in the
+same order as the scalar code, so the results agree exactly.
+
+Trumps are returned as trump indexes (an index into SUITS), with NO_TRUMP
+where the hand has no trump worth bidding. estimate_bid_ties() returns every
+trump tied for the best bid instead, for the bid book (see
+apps.smear.bid_book).
+"""
+import numpy as np
+
+from apps.smear.bid_odds import no_one_else_dealt
+from apps.smear.card_arrays import EMPTY, is_trump, trump_rank
+from apps.smear.cards import CARD_VALUE_INDEX, NO_TRUMP, NUM_CARDS, SUITS, VALUES
+from apps.smear.computer_logic import expected_total_trump
+
+# Value index of each card id, EMPTY (-1) looks up the trailing -1
+_VALUE_INDEX = np.array([*CARD_VALUE_INDEX, -1], dtype=np.int8)
+TEN = VALUES.index("10")
+JACK = VALUES.index("jack")
+QUEEN = VALUES.index("queen")
+KING = VALUES.index("king")
+ACE = VALUES.index("ace")
+# Indexed by the number of A, K and Q of trump held
+TAKE_FACTORS = np.array([0, 0.1, 0.75, 1])
+
+
+def _no_one_else_dealt_table(num_players, max_cards):
+    # [num_cards, k] for one table size
+    return np.array(
+        [
+            [no_one_else_dealt(num_cards, num_players, k) for k in range(NUM_CARDS + 1)]
+            for num_cards in range(max_cards + 1)
+        ]
+    )
+
+
+def suit_bids(hands, num_players):
+    """Returns the unrounded bid of each hand for each trump, an (N, len(SUITS)) array"""
+    hands = np.asarray(hands)
+    num_cards = (hands != EMPTY).sum(axis=1)
+    values = _VALUE_INDEX[hands]
+    odds = _no_one_else_dealt_table(num_players, hands.shape[1])
+
+    bids = np.zeros((len(hands), len(SUITS)))
+    for trump in range(len(SUITS)):
+        trump_cards = is_trump(hands, trump)
+        ranks = trump_rank(hands, trump)
+        num_trump = trump_cards.sum(axis=1)
+        has_trump = num_trump > 0
+        high_rank = np.where(trump_cards, ranks, 0).max(axis=1)
+        low_rank = np.where(trump_cards, ranks, 15).min(axis=1)
+
+        # expected_points_from_high and expected_points_from_low
+        high = np.where(has_trump, odds[num_cards, np.where(has_trump, 14 - high_rank, 0)], 0)
+        high = np.where(high < 0.4, 0, high)
+        low = np.where(has_trump, odds[num_cards, np.where(has_trump, low_rank - 1, 0)], 0)
+        low = np.where(low < 0.4, 0, low)
+
+        # expected_points_from_game, added up in hundredths like HandProfile
+        game = np.zeros(len(hands), dtype=np.int64)
+        for column in range(hands.shape[1]):
+            is_trump_card = trump_cards[:, column]
+            value = values[:, column]
+            points = np.select(
+                [
+                    is_trump_card & (value == TEN),
+                    is_trump_card,
+                    (value == ACE) | (value == KING),
+                    (value == QUEEN) | (value == JACK),
+                ],
+                [
+                    np.where(num_trump > 2, 60, 30),
+                    np.where(ranks[:, column] < 5, 10, 20),
+                    20,
+                    15,
+                ],
+                0,
+            )
+            game = game + points
+        game = game / 100
+        game = np.where(game > 1, 1, np.where(game < 0.3, 0, game))
+
+        # expected_points_from_jack_and_jick
+        num_jacks_and_jicks = (trump_cards & (values == JACK)).sum(axis=1)
+        num_non_jacks = num_trump - num_jacks_and_jicks
+        num_AKQ = (trump_cards & ((values == ACE) | (values == KING) | (values == QUEEN))).sum(axis=1)
+        num_expected_remaining_trump = expected_total_trump(num_players) - num_trump
+        num_expected_remaining_trump = np.where(num_expected_remaining_trump < 1, 1, num_expected_remaining_trump)
+        buffer_required = num_expected_remaining_trump * 0.6
+        expected_jacks_and_jicks = 2 * (6 * num_players) / 52
+        percentage_someone_takes = (3 - num_AKQ) / 3 * (buffer_required - num_non_jacks) / buffer_required
+        percentage_someone_takes = np.where(percentage_someone_takes < 0, 0, percentage_someone_takes)
+        exp_my_points = np.where(num_jacks_and_jicks > 0, num_jacks_and_jicks * (1 - percentage_someone_takes), 0)
+        available_jacks_and_jicks = expected_jacks_and_jicks - num_jacks_and_jicks
+        available_jacks_and_jicks = np.where(available_jacks_and_jicks < 0, 0, available_jacks_and_jicks)
+        exp_taken_points = np.where(
+            (num_AKQ > 0) & (num_jacks_and_jicks < 2), available_jacks_and_jicks * TAKE_FACTORS[num_AKQ], 0
+        )
+        jack_and_jick = exp_my_points + exp_taken_points
+
+        bids[:, trump] = 0 + high + low + game + jack_and_jick
+    return bids
+
+
+def round_bids(bids, aggression_factor):
+    """Vectorized computer_logic.round_bid"""
+    whole_bids = np.floor(bids)
+    round_up_or_down = (aggression_factor + (bids - whole_bids)) >= 1
+    return whole_bids.astype(np.int64) + round_up_or_down
+
+
+def estimate_bids(hands, num_players, aggression_factor=0.2):
+    """Vectorized computer_logic.estimate_bid, returns the rounded bids and trump indexes of each hand"""
+    bids_by_trump = suit_bids(hands, num_players)
+    bids = bids_by_trump.max(axis=1)
+    # The first trump with the best bid, like estimate_bid, if it is worth anything
+    trumps = np.where(bids > 0, bids_by_trump.argmax(axis=1), NO_TRUMP)
+    return round_bids(bids, aggression_factor), trumps
+
+
+def estimate_bid_ties(hands, num_players, aggression_factor=0.2):
+    """Like estimate_bids, but returns a bit mask of the trump indexes tied for the best bid of each hand
+
+    The mask is 0 when the hand has no trump worth bidding.
+    """
+    bids_by_trump = suit_bids(hands, num_players)
+    bids = bids_by_trump.max(axis=1)
+    tied = (bids_by_trump == bids[:, np.newaxis]) & (bids[:, np.newaxis] > 0)
+    return round_bids(bids, aggression_factor), (tied << np.arange(len(SUITS))).sum(axis=1)
+
+
+def apply_dealer_rule(bids, is_dealer=False, has_high_bid=False):
+    """Vectorized computer_logic._apply_dealer_rule"""
+    forced = ~np.asarray(has_high_bid) & np.asarray(is_dealer) & (bids == 1)
+    return np.where(bids < 2, np.where(forced, 2, 0), bids)
+
+
+def calculate_bids(hands, num_players, is_dealer=False, has_high_bid=False, aggression_factor=0.2):
+    """Vectorized computer_logic.calculate_bid, returns the bids and trump indexes of each hand
+
+    is_dealer and has_high_bid can be a bool for every hand, or an array with one per hand
+    """
+    bids, trumps = estimate_bids(hands, num_players, aggression_factor)
+    return apply_dealer_rule(bids, is_dealer, has_high_bid), trumps
@@ -0,0 +1,149 @@
+"""A precomputed table of computer bids for every 6-card hand
+
+The bid a hand is worth (before the dealer rule, see
+computer_logic.estimate_bid) only depends on the cards and the number of
+players, and hands that are the same up to relabelling suits (see
+apps.smear.canonical) are worth the same bid. So every canonical hand can be
+evaluated ahead of time, with `python manage.py build_bid_book`, and looked up
+when a computer bids.
+
+Relabelling the suits changes which trump estimate_bid picks when several are
+tied (it takes the first in SUITS order), so the book keeps every tied trump
+and lookup() picks the first of them once they're mapped back to the
+original suits.
+
+The file is read with mmap, so the gunicorn workers on a machine share the
+pages of one copy through the OS page cache. Its layout is:
+
+    MAGIC, the number of hands (uint64)
+    the sorted canonical HandMask integers (uint64 each)
+    one byte per hand and number of players (MIN_PLAYERS to MAX_PLAYERS):
+    the bid in the low 4 bits and a bit mask of the tied canonical trump
+    indexes above it (0 for no trump), or UNKNOWN if it wasn't computed
+"""
+import logging
+import mmap
+from itertools import combinations, islice
+
+import numpy as np
+from django.conf import settings
+
+from apps.smear.canonical import BIDDING_PERMUTATIONS, SUIT_BITS, canonicalize
+from apps.smear.card_arrays import CARD_DTYPE
+from apps.smear.cards import NUM_CARDS, NUM_VALUES, SUITS
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b"SMEARBB2"
+HEADER_SIZE = len(MAGIC) + 8
+MIN_PLAYERS = 2
+MAX_PLAYERS = 8
+CARDS_PER_HAND = 6
+UNKNOWN = 0xFF
+KEY_DTYPE = np.dtype("<u8")
+
+
+class BidBook:
+    def __init__(self, path):
+        with open(path, "rb") as book_file:
+            self.buffer = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a bid book")
+        num_hands = int(np.frombuffer(self.buffer, dtype=KEY_DTYPE, count=1, offset=len(MAGIC))[0])
+        self.keys = np.frombuffer(self.buffer, dtype=KEY_DTYPE, count=num_hands, offset=HEADER_SIZE)
+        self.bids = np.frombuffer(
+            self.buffer,
+            dtype=np.uint8,
+            count=num_hands * (MAX_PLAYERS - MIN_PLAYERS + 1),
+            offset=HEADER_SIZE + self.keys.nbytes,
+        ).reshape(num_hands, MAX_PLAYERS - MIN_PLAYERS + 1)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, mask, num_players):
+        """Returns the bid and trump for a HandMask integer, or None if the book doesn't have it"""
+        if not MIN_PLAYERS <= num_players <= MAX_PLAYERS:
+            return None
+        canonical = canonicalize(mask)
+        index = int(np.searchsorted(self.keys, canonical.key))
+        if index == len(self.keys) or int(self.keys[index]) != canonical.key:
+            return None
+        entry = int(self.bids[index, num_players - MIN_PLAYERS])
+        if entry == UNKNOWN:
+            return None
+        tied_trumps = entry >> 4
+        tied_suits = {
+            canonical.to_original_suit(suit) for trump, suit in enumerate(SUITS) if tied_trumps & (1 << trump)
+        }
+        return entry & 0xF, next((suit for suit in SUITS if suit in tied_suits), None)
+
+
+_bid_books = {}
+
+
+def get_bid_book():
+    """Returns the BidBook at settings.BID_BOOK_PATH, loaded once per process, or None"""
+    path = getattr(settings, "BID_BOOK_PATH", None)
+    if not path:
+        return None
+    if path not in _bid_books:
+        try:
+            _bid_books[path] = BidBook(path)
+            LOG.info(f"Loaded bid book with {len(_bid_books[path])} hands from {path}")
+        except (OSError, ValueError) as error:
+            LOG.warning(f"Unable to load bid book from {path}, computers will calculate their bids: {error}")
+            _bid_books[path] = None
+    return _bid_books[path]
+
+
+def canonical_bidding_keys(chunk_size=1_000_000):
+    """Returns a sorted array of the canonical HandMask integers of every 6-card hand"""
+    hands = combinations(range(NUM_CARDS), CARDS_PER_HAND)
+    keys = []
+    while chunk := list(islice(hands, chunk_size)):
+        masks = np.bitwise_or.reduce(np.uint64(1) << np.array(chunk, dtype=np.uint64), axis=1)
+        canonical = np.min([_permute_masks(masks, permutation) for permutation in BIDDING_PERMUTATIONS], axis=0)
+        keys.append(masks[masks == canonical])
+    return np.sort(np.concatenate(keys))
+
+
+def _permute_masks(masks, permutation):
+    # canonical.permute_mask() for an array of HandMask integers
+    permuted = np.zeros_like(masks)
+    for suit in range(len(SUITS)):
+        suit_cards = (masks >> np.uint64(NUM_VALUES * suit)) & np.uint64(SUIT_BITS)
+        permuted |= suit_cards << np.uint64(NUM_VALUES * permutation[suit])
+    return permuted
+
+
+def card_ids_from_keys(keys):
+    """Returns the (N, 6) card ids of an array of HandMask integers, lowest first like iter_card_ids()"""
+    held = (keys[:, np.newaxis] >> np.arange(NUM_CARDS, dtype=np.uint64)) & np.uint64(1)
+    return np.argsort(held == 0, axis=1, kind="stable")[:, :CARDS_PER_HAND].astype(CARD_DTYPE)
+
+
+def build_bids(keys, num_players_options, evaluate, progress=None, chunk_size=100_000):
+    """Returns the bids array for keys
+
+    evaluate(hands, num_players) is given an (N, 6) array of card ids and
+    returns arrays of their bids and tied trump masks, see bid_arrays.estimate_bid_ties
+    """
+    bids = np.full((len(keys), MAX_PLAYERS - MIN_PLAYERS + 1), UNKNOWN, dtype=np.uint8)
+    for start in range(0, len(keys), chunk_size):
+        end = min(start + chunk_size, len(keys))
+        hands = card_ids_from_keys(keys[start:end])
+        for num_players in num_players_options:
+            chunk_bids, chunk_trumps = evaluate(hands, num_players)
+            bids[start:end, num_players - MIN_PLAYERS] = chunk_bids | chunk_trumps << 4
+        if progress:
+            progress(end)
+    return bids
+
+
+def write_bid_book(path, keys, bids):
+    with open(path, "wb") as book_file:
+        book_file.write(MAGIC)
+        book_file.write(np.array([len(keys)], dtype=KEY_DTYPE).tobytes())
+        book_file.write(np.ascontiguousarray(keys, dtype=KEY_DTYPE).tobytes())
+        book_file.write(np.ascontiguousarray(bids, dtype=np.uint8).tobytes())
@@ -0,0 +1,67 @@
+"""Exact odds of where the cards a player can't see were dealt, precomputed for bidding
+
+When bidding, a player only knows their own cards. Every other player was
+dealt cards_per_hand cards at random from the rest of the deck, so whether
+any of them holds one of k particular cards (e.g. the trump higher than my
+highest trump) is a hypergeometric question.
+
+The tables are computed exactly with Fractions at import, and are indexed
+by [cards_per_hand][num_players][k] for every hand size, table size and
+number of cards the game allows.
+"""
+from fractions import Fraction
+from math import comb
+
+from apps.smear.cards import NUM_CARDS
+
+MAX_CARDS_PER_HAND = 6
+MAX_PLAYERS = 8
+
+
+def _no_one_dealt(cards_per_hand, num_others, k):
+    # The other hands together are one draw from the cards I can't see
+    unseen = NUM_CARDS - cards_per_hand
+    dealt = cards_per_hand * num_others
+    if dealt > unseen:
+        return Fraction(0)
+    k = min(k, unseen)
+    return Fraction(comb(unseen - k, dealt), comb(unseen, dealt))
+
+
+def _at_most_one_dealt(cards_per_hand, num_others, k):
+    # No one, plus exactly one of the others (everyone but them was dealt none, less no one at all)
+    no_one = _no_one_dealt(cards_per_hand, num_others, k)
+    if num_others == 0:
+        return no_one
+    all_but_one = _no_one_dealt(cards_per_hand, num_others - 1, k)
+    return no_one + num_others * (all_but_one - no_one)
+
+
+def _table(odds):
+    return [
+        [
+            [float(odds(cards_per_hand, num_players - 1, k)) for k in range(NUM_CARDS + 1)] if num_players else []
+            for num_players in range(MAX_PLAYERS + 1)
+        ]
+        for cards_per_hand in range(MAX_CARDS_PER_HAND + 1)
+    ]
+
+
+# Chance that no one else was dealt any of k cards
+NO_ONE_ELSE_DEALT = _table(_no_one_dealt)
+# Chance that at most one other player was dealt any of the k cards
+AT_MOST_ONE_OTHER_DEALT = _table(_at_most_one_dealt)
+
+
+def no_one_else_dealt(cards_per_hand, num_players, k):
+    """Chance that none of the other num_players - 1 players was dealt any of k cards I can't see"""
+    if cards_per_hand <= MAX_CARDS_PER_HAND and 0 < num_players <= MAX_PLAYERS and 0 <= k <= NUM_CARDS:
+        return NO_ONE_ELSE_DEALT[cards_per_hand][num_players][k]
+    return float(_no_one_dealt(cards_per_hand, num_players - 1, k))
+
+
+def at_most_one_other_dealt(cards_per_hand, num_players, k):
+    """Chance that at most one of the other num_players - 1 players was dealt any of k cards I can't see"""
+    if cards_per_hand <= MAX_CARDS_PER_HAND and 0 < num_players <= MAX_PLAYERS and 0 <= k <= NUM_CARDS:
+        return AT_MOST_ONE_OTHER_DEALT[cards_per_hand][num_players][k]
+    return float(_at_most_one_dealt(cards_per_hand, num_players - 1, k))
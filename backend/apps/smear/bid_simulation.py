@@ -0,0 +1,283 @@
+"""Monte-Carlo bidding: estimate what a hand is worth by playing out random deals
+
+The bidder only knows their own cards. expected_points() deals the rest of
+the deck to the other players at random (see DealSampler), plays every deal
+out for each possible trump with a simple policy, and averages the points
+the bidder's contestant (the bidder, or their team) would win.
+
+High and low go to whoever was dealt them, so they come straight from the
+deal. Jack, jick and game are decided by the play out, which is done for a
+whole batch of deals at once with NumPy: the bidder leads the first trick,
+the leader plays strong trump or off suit face cards, and followers take the
+trick with their cheapest winning card, feed points to a teammate who is
+winning it, or otherwise throw their least valuable card.
+
+Samples are split into chunks and run on a process pool, and the result is
+only used if every chunk finishes within the time budget. The caller falls
+back to the heuristic bid otherwise, and the pool is replaced so the next
+bid doesn't wait for the chunks still running.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+from apps.smear.card_arrays import CARD_DTYPE, EMPTY
+from apps.smear.cards import (
+    BEATS,
+    CARD_GAME_POINTS,
+    CARD_VALUE_INDEX,
+    EFFECTIVE_SUIT_INDEX,
+    IS_JACK,
+    IS_JICK,
+    IS_TRUMP,
+    JACK_INDEX,
+    NUM_CARDS,
+    SUITS,
+    TRUMP_RANK,
+)
+from apps.smear.deal_sampler import CARDS_PER_PLAYER, DealSampler
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 250
+# Keys used to choose a card are compared within one hand, so hold the missing cards below everything
+NOT_HELD = -(10**6)
+
+
+def _padded(values, empty_value=0):
+    # Add a trailing entry so that card id -1 (EMPTY) looks up empty_value
+    return np.array([*values, empty_value], dtype=np.int64)
+
+
+class PlayTables:
+    """What the play policy needs to know about every card, for one trump"""
+
+    def __init__(self, trump):
+        rank = _padded(TRUMP_RANK[trump])
+        value = _padded(CARD_VALUE_INDEX)
+        self.game_points = _padded(CARD_GAME_POINTS)
+        self.is_trump = _padded(IS_TRUMP[trump]).astype(bool)
+        self.is_jack = _padded(IS_JACK[trump]).astype(bool)
+        self.is_jick = _padded(IS_JICK[trump]).astype(bool)
+        self.trump_rank = np.where(self.is_trump, rank, 0)
+        self.effective_suit = _padded(EFFECTIVE_SUIT_INDEX[trump], -1)
+        beats = np.zeros((NUM_CARDS + 1, NUM_CARDS + 1), dtype=bool)
+        beats[:NUM_CARDS, :NUM_CARDS] = BEATS[trump]
+        self.beats = beats
+
+        # Lead A, K, Q of trump, then off suit face cards, then low off suit, then low trump, then anything
+        is_face = (value >= JACK_INDEX) & ~self.is_trump
+        self.lead_key = np.select(
+            [self.is_trump & (rank >= 12), is_face, ~self.is_trump & (self.game_points == 0), self.is_trump],
+            [300 + rank, 200 + value, 100 - value, 50 - rank],
+            0,
+        )
+        # Take tricks as cheaply as possible, trump cost more than any off suit card
+        self.power = np.where(self.is_trump, 100 + rank, value)
+        # Throw away worthless off suit cards first and hold on to trump
+        self.throw_cost = np.where(self.is_trump, 200 + rank, self.game_points * 10 + value)
+        # Give a winning teammate the most game points, keeping trump if possible
+        self.feed_key = self.game_points * 100 - self.is_trump * 50 - value
+
+
+_play_tables = {}
+
+
+def play_tables(trump):
+    if trump not in _play_tables:
+        _play_tables[trump] = PlayTables(trump)
+    return _play_tables[trump]
+
+
+def _choose(key, candidates):
+    return np.argmax(np.where(candidates, key, NOT_HELD), axis=1)
+
+
+def play_out(deals, trump, contestants):
+    """Plays out deals with trump, returns the points contestant 0 wins in each
+
+    deals is an (N, num_players, cards_per_hand) array of card ids in the order
+    players play, starting with the bidder, and contestants has the contestant
+    index (the player, or their team) of each seat in the same order.
+    """
+    tables = play_tables(trump)
+    contestants = np.asarray(contestants)
+    num_deals, num_players, cards_per_hand = deals.shape
+    rows = np.arange(num_deals)
+    hands = deals.astype(np.int64)
+    hands[hands == EMPTY] = NUM_CARDS
+
+    game_points = np.zeros((num_deals, num_players), dtype=np.int64)
+    jack_taker = np.full(num_deals, -1)
+    jick_taker = np.full(num_deals, -1)
+    leader = np.zeros(num_deals, dtype=np.int64)
+    for _ in range(cards_per_hand):
+        trick_points = np.zeros(num_deals, dtype=np.int64)
+        has_jack = np.zeros(num_deals, dtype=bool)
+        has_jick = np.zeros(num_deals, dtype=bool)
+        for position in range(num_players):
+            seat = (leader + position) % num_players
+            cards = hands[rows, seat]
+            held = cards != NUM_CARDS
+            if position == 0:
+                choice = _choose(tables.lead_key[cards], held)
+                card = cards[rows, choice]
+                lead_suit = tables.effective_suit[card]
+                winning_card, winning_seat = card, seat
+            else:
+                # Follow suit if able, trump can always be played
+                following = held & (tables.effective_suit[cards] == lead_suit[:, np.newaxis])
+                legal = np.where(
+                    following.any(axis=1)[:, np.newaxis], following | (held & tables.is_trump[cards]), held
+                )
+                winners = legal & tables.beats[winning_card[:, np.newaxis], cards]
+                teammate_winning = contestants[winning_seat] == contestants[seat]
+                choice = np.where(
+                    winners.any(axis=1) & ~teammate_winning,
+                    _choose(-tables.power[cards], winners),
+                    np.where(
+                        teammate_winning,
+                        _choose(tables.feed_key[cards], legal),
+                        _choose(-tables.throw_cost[cards], legal),
+                    ),
+                )
+                card = cards[rows, choice]
+                takes = tables.beats[winning_card, card]
+                winning_card = np.where(takes, card, winning_card)
+                winning_seat = np.where(takes, seat, winning_seat)
+            hands[rows, seat, choice] = NUM_CARDS
+            trick_points += tables.game_points[card]
+            has_jack |= tables.is_jack[card]
+            has_jick |= tables.is_jick[card]
+
+        game_points[rows, winning_seat] += trick_points
+        jack_taker = np.where(has_jack, winning_seat, jack_taker)
+        jick_taker = np.where(has_jick, winning_seat, jick_taker)
+        leader = winning_seat
+
+    return _score(deals, tables, contestants, game_points, jack_taker, jick_taker)
+
+
+def _score(deals, tables, contestants, game_points, jack_taker, jick_taker):
+    # Points won by contestant 0, awarded like Hand._finalize_hand
+    # High and low go to whoever was dealt them, EMPTY and non-trump have rank 0
+    ranks = tables.trump_rank[deals]
+    high_ranks = ranks.max(axis=2)
+    low_ranks = np.where(ranks > 0, ranks, NUM_CARDS).min(axis=2)
+    has_trump = high_ranks.max(axis=1) > 0
+    is_mine = contestants == 0
+
+    points = (has_trump & is_mine[high_ranks.argmax(axis=1)]).astype(np.int64)
+    points += has_trump & is_mine[low_ranks.argmin(axis=1)]
+    points += (jack_taker >= 0) & is_mine[jack_taker]
+    points += (jick_taker >= 0) & is_mine[jick_taker]
+
+    # Game goes to the contestant with the most game points, no one gets it on a tie
+    num_contestants = contestants.max() + 1
+    contestant_points = np.zeros((len(deals), num_contestants), dtype=np.int64)
+    for seat, contestant in enumerate(contestants):
+        contestant_points[:, contestant] += game_points[:, seat]
+    best = contestant_points.max(axis=1)
+    ties = (contestant_points == best[:, np.newaxis]).sum(axis=1) > 1
+    points += ~ties & (contestant_points[:, 0] == best)
+    return points
+
+
+def simulate(cards, contestants, num_samples, seed=None):
+    """Returns the total points contestant 0 wins over num_samples random deals, for each trump
+
+    cards are the bidder's card ids, contestants as for play_out()
+    """
+    num_others = len(contestants) - 1
+    unseen = ((1 << NUM_CARDS) - 1) & ~sum(1 << card_id for card_id in cards)
+    sampler = DealSampler(range(num_others), [CARDS_PER_PLAYER] * num_others, [unseen] * num_others, seed=seed)
+    others = sampler.sample(num_samples)
+    mine = np.broadcast_to(np.array(cards, dtype=CARD_DTYPE), (num_samples, 1, len(cards)))
+    deals = np.concatenate([mine, others], axis=1)
+    return np.array([play_out(deals, trump, contestants).sum() for trump in range(len(SUITS))])
+
+
+_pools = {}
+
+
+def get_pool():
+    """Returns the process pool for simulations, started once per process, or None to simulate in process
+
+    The workers start on the first bid, which can run out of time and fall back while they do
+    """
+    workers = settings.MONTE_CARLO_BID_WORKERS
+    if not workers:
+        return None
+    if workers not in _pools:
+        # Spawn rather than fork, the workers don't need (and mustn't share) the parent's database connections
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pools[workers]
+
+
+def _replace_pool():
+    """Swaps in a new pool, leaving chunks that already started to finish in the old one
+
+    Running chunks can't be cancelled, and the next bid would otherwise queue
+    behind them and run out of time as well.
+    """
+    old_pool = _pools.pop(settings.MONTE_CARLO_BID_WORKERS, None)
+    if old_pool is not None:
+        old_pool.shutdown(wait=False, cancel_futures=True)
+    pool = get_pool()
+    # Start the workers now rather than during the next bid
+    for _ in range(settings.MONTE_CARLO_BID_WORKERS):
+        pool.submit(int)
+
+
+def _contestant_indexes(contestants):
+    # Number the contestants in the order they appear, so the bidder's is 0
+    indexes = {}
+    return [indexes.setdefault(contestant, len(indexes)) for contestant in contestants]
+
+
+def expected_points(cards, contestants, num_samples, budget, seed=None):
+    """Returns the points the bidder can expect to win for each trump, or None if it ran out of time
+
+    cards are the bidder's card ids, contestants are the team (or player) of
+    each player in the order they play, starting with the bidder. budget is
+    the wall clock time allowed in seconds. Without a pool, chunks run in this
+    process and the budget is only checked between them.
+    """
+    deadline = time.monotonic() + budget
+    contestants = _contestant_indexes(contestants)
+    num_chunks = max(1, -(-num_samples // CHUNK_SIZE))
+    seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+    chunk_sizes = [len(chunk) for chunk in np.array_split(np.arange(num_samples), num_chunks)]
+
+    pool = get_pool()
+    if pool is None:
+        totals = []
+        for chunk_size, chunk_seed in zip(chunk_sizes, seeds):
+            if time.monotonic() >= deadline:
+                LOG.info(f"Monte-Carlo bid ran out of time with {num_chunks - len(totals)} of {num_chunks} chunks left")
+                return None
+            totals.append(simulate(cards, contestants, chunk_size, chunk_seed))
+    else:
+        try:
+            futures = [
+                pool.submit(simulate, cards, contestants, chunk_size, chunk_seed)
+                for chunk_size, chunk_seed in zip(chunk_sizes, seeds)
+            ]
+            done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            if not_done:
+                LOG.info(f"Monte-Carlo bid ran out of time with {len(not_done)} of {len(futures)} chunks left")
+                _replace_pool()
+                return None
+            totals = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died, start a new pool for the next bid
+            LOG.exception("Monte-Carlo bid pool is broken")
+            _replace_pool()
+            return None
+
+    return np.sum(totals, axis=0) / num_samples
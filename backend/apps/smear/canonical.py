@@ -0,0 +1,101 @@
+"""Suit-isomorphism canonicalization for hands
+
+Two hands are strategically identical if one can be turned into the other by
+relabelling suits, as long as the relabelling keeps the jick paired with its
+trump suit (spades/clubs and hearts/diamonds). That leaves 8 relabellings
+when bidding (trump not known yet) and 2 once trump is fixed (the two suits
+of the other colour can be swapped).
+
+canonicalize() maps a hand to the smallest HandMask integer over those
+relabellings, so results computed for the canonical hand (bids, probability
+tables, simulations) can be cached and shared by every equivalent hand.
+When trump is known, the canonical hand always uses SUITS[0] as trump.
+"""
+from itertools import permutations
+
+from apps.smear.cards import NUM_VALUES, SUIT_INDEX, SUITS, trump_index
+from apps.smear.hand_mask import HandMask
+
+SUIT_BITS = (1 << NUM_VALUES) - 1
+CANONICAL_TRUMP = SUITS[0]
+
+
+def _keeps_jick_pairs(permutation):
+    # Suits of the same color are two apart in SUITS, they must stay paired
+    return all(permutation[(suit + 2) % 4] == (permutation[suit] + 2) % 4 for suit in range(4))
+
+
+# Each permutation maps an original suit index to a canonical suit index
+BIDDING_PERMUTATIONS = [p for p in permutations(range(4)) if _keeps_jick_pairs(p)]
+# For each trump index, the permutations that move trump to CANONICAL_TRUMP
+PLAYING_PERMUTATIONS = [[p for p in BIDDING_PERMUTATIONS if p[trump] == 0] for trump in range(4)]
+
+
+def permute_mask(mask, permutation):
+    """Relabels the suits of a HandMask integer"""
+    permuted = 0
+    for suit in range(4):
+        permuted |= ((mask >> (NUM_VALUES * suit)) & SUIT_BITS) << (NUM_VALUES * permutation[suit])
+    return permuted
+
+
+def invert_permutation(permutation):
+    inverse = [0] * len(permutation)
+    for suit, canonical_suit in enumerate(permutation):
+        inverse[canonical_suit] = suit
+    return tuple(inverse)
+
+
+class CanonicalHand:
+    """A canonical hand, along with the relabelling used to get there
+
+    key is the canonical HandMask integer. permutation maps the original
+    suit indexes to canonical suit indexes, and can be used to map suits (for
+    example a bid's trump) back and forth.
+    """
+
+    __slots__ = ("key", "trump", "permutation")
+
+    def __init__(self, key, trump, permutation):
+        self.key = key
+        self.trump = trump
+        self.permutation = permutation
+
+    def __repr__(self):
+        return f"CanonicalHand({HandMask(self.key).reps()}, trump={self.trump})"
+
+    def to_canonical_suit(self, suit):
+        return SUITS[self.permutation[SUIT_INDEX[suit]]]
+
+    def to_original_suit(self, canonical_suit):
+        return SUITS[self.permutation.index(SUIT_INDEX[canonical_suit])]
+
+    def to_original_mask(self, canonical_mask):
+        """Maps a HandMask integer in canonical suits back to the original suits"""
+        return permute_mask(canonical_mask, invert_permutation(self.permutation))
+
+
+def _as_mask(hand):
+    if isinstance(hand, HandMask):
+        return hand.mask
+    if isinstance(hand, int):
+        return hand
+    return HandMask.from_cards(hand).mask
+
+
+def canonical_key(hand, trump=None):
+    """Returns just the canonical HandMask integer for a hand
+
+    hand may be a HandMask, a HandMask integer or a list of Cards
+    """
+    mask = _as_mask(hand)
+    candidates = PLAYING_PERMUTATIONS[trump_index(trump)] if trump else BIDDING_PERMUTATIONS
+    return min(permute_mask(mask, permutation) for permutation in candidates)
+
+
+def canonicalize(hand, trump=None):
+    """Returns the CanonicalHand for a hand, with trump if it is known"""
+    mask = _as_mask(hand)
+    candidates = PLAYING_PERMUTATIONS[trump_index(trump)] if trump else BIDDING_PERMUTATIONS
+    key, permutation = min((permute_mask(mask, p), p) for p in candidates)
+    return CanonicalHand(key, CANONICAL_TRUMP if trump else None, permutation)
@@ -0,0 +1,86 @@
+"""NumPy versions of the card rules tables for batched queries
+
+Each per-trump table from apps.smear.cards is available here as an array of
+shape (4, 52), indexed by [trump_index, card_id]. The functions below take
+int8 arrays of card ids of any shape (for example (N, 6) for N hands) and
+answer a rules query for every card with a single array operation.
+
+Card id -1 (EMPTY) can be used as padding, e.g. for hands that have
+already played some of their cards. It is never trump and is worth nothing.
+
+trump is a trump index, or an array of trump indexes that broadcasts
+against the cards (e.g. shape (N, 1) for an (N, 6) batch of hands).
+"""
+import numpy as np
+
+from apps.smear.cards import (
+    CARD_GAME_POINTS,
+    CARD_REPRESENTATION,
+    IS_JACK,
+    IS_JICK,
+    IS_TRUMP,
+    NO_TRUMP,
+    TRUMP_RANK,
+    card_id_from_representation,
+)
+
+EMPTY = -1
+CARD_DTYPE = np.int8
+
+IS_TRUMP_ARRAY = np.array(IS_TRUMP[:NO_TRUMP], dtype=bool)
+IS_JACK_ARRAY = np.array(IS_JACK[:NO_TRUMP], dtype=bool)
+IS_JICK_ARRAY = np.array(IS_JICK[:NO_TRUMP], dtype=bool)
+TRUMP_RANK_ARRAY = np.array(TRUMP_RANK[:NO_TRUMP], dtype=np.int8)
+GAME_POINTS_ARRAY = np.array([CARD_GAME_POINTS] * NO_TRUMP, dtype=np.int8)
+
+
+def _padded(table, empty_value):
+    # Add a trailing column so that card id -1 (EMPTY) looks up empty_value
+    return np.concatenate([table, np.full((table.shape[0], 1), empty_value, dtype=table.dtype)], axis=1)
+
+
+_IS_TRUMP = _padded(IS_TRUMP_ARRAY, False)
+_IS_JACK = _padded(IS_JACK_ARRAY, False)
+_IS_JICK = _padded(IS_JICK_ARRAY, False)
+_TRUMP_RANK = _padded(TRUMP_RANK_ARRAY, 0)
+_GAME_POINTS = _padded(GAME_POINTS_ARRAY, 0)[0]
+_REPRESENTATIONS = np.array([*CARD_REPRESENTATION, ""], dtype=object)
+
+
+def cards_from_representations(representations):
+    """Returns an int8 array of card ids, nested lists of representations keep their shape"""
+    return np.vectorize(card_id_from_representation, otypes=[CARD_DTYPE])(np.asarray(representations, dtype=object))
+
+
+def cards_to_representations(cards):
+    return _REPRESENTATIONS[cards]
+
+
+def is_trump(cards, trump):
+    return _IS_TRUMP[trump, cards]
+
+
+def is_jack(cards, trump):
+    return _IS_JACK[trump, cards]
+
+
+def is_jick(cards, trump):
+    return _IS_JICK[trump, cards]
+
+
+def trump_rank(cards, trump):
+    return _TRUMP_RANK[trump, cards]
+
+
+def game_points(cards):
+    return _GAME_POINTS[cards]
+
+
+def hand_game_points(hands):
+    """Total game points of each hand in an (..., cards_per_hand) array"""
+    return game_points(hands).sum(axis=-1, dtype=np.int16)
+
+
+def trump_counts(hands, trump):
+    """Number of trump in each hand of an (..., cards_per_hand) array"""
+    return is_trump(hands, trump).sum(axis=-1)
@@ -0,0 +1,41 @@
+"""Compact wire format for cards
+
+Each card is sent as its one byte card id (see the integer card encoding in
+apps.smear.cards), and a list of cards is sent as those bytes in base64.
+A full hand of six cards becomes an 8 character string.
+
+Clients opt in with ?card_format=compact or by asking for
+"application/json; card_format=compact" in the Accept header.
+"""
+import base64
+
+from django.http.request import MediaType
+
+from apps.smear.cards import CARD_REPRESENTATION, NUM_CARDS, card_id_from_representation
+
+CARD_FORMAT_PARAM = "card_format"
+COMPACT = "compact"
+
+
+def encode_cards(representations):
+    """Encodes a list of card representations as one base64 string"""
+    card_ids = bytes(card_id_from_representation(rep) for rep in representations)
+    return base64.urlsafe_b64encode(card_ids).decode("ascii")
+
+
+def decode_cards(encoded):
+    """Decodes a string from encode_cards() back into card representations"""
+    card_ids = base64.urlsafe_b64decode(encoded.encode("ascii"))
+    if any(card_id >= NUM_CARDS for card_id in card_ids):
+        raise ValueError(f"Unable to decode cards: {encoded}")
+    return [CARD_REPRESENTATION[card_id] for card_id in card_ids]
+
+
+def wants_compact_cards(request):
+    """Whether the client asked for cards in the compact format"""
+    if request.query_params.get(CARD_FORMAT_PARAM) == COMPACT:
+        return True
+    accepted_media_type = getattr(request, "accepted_media_type", None)
+    if not accepted_media_type:
+        return False
+    return MediaType(accepted_media_type).params.get(CARD_FORMAT_PARAM) == COMPACT
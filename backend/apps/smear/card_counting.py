@@ -1,42 +1,270 @@
 import logging
+from functools import wraps
 
-from django.db.models import Q
-
-from apps.smear.cards import Card, Deck
+from apps.smear.cards import (
+    CARD_GAME_POINTS,
+    CARD_IDS,
+    CARDS,
+    EFFECTIVE_SUIT_INDEX,
+    IS_TRUMP,
+    SUIT_INDEX,
+    SUITS,
+    TRUMP_INDEXES,
+    TRUMP_RANK,
+    Card,
+    trump_index,
+)
+from apps.smear.hand_mask import (
+    BEATEN_BY_MASKS,
+    CARD_MASKS,
+    EFFECTIVE_SUIT_MASKS,
+    FULL_MASK,
+    TRUMP_MASKS,
+    TRUMP_ORDER,
+    seat_voids,
+    value_mask,
+)
 from apps.smear.models import Play
 
 LOG = logging.getLogger(__name__)
 
+# Card ids of each suit ordered from highest to lowest, indexed by [trump_index][suit]
+# The jick is part of the trump suit
+SUIT_ORDER = [
+    [
+        sorted(
+            (c for c in CARD_IDS if EFFECTIVE_SUIT_INDEX[trump][c] == suit),
+            key=lambda c, trump=trump: TRUMP_RANK[trump][c],
+            reverse=True,
+        )
+        for suit in range(len(SUITS))
+    ]
+    for trump in TRUMP_INDEXES
+]
+# The jack and jick of each trump, indexed by trump_index
+JACK_AND_JICK_MASKS = [value_mask("jack") & TRUMP_MASKS[trump] for trump in TRUMP_INDEXES]
+
+
+def _void_mask(card, lead_card, trump):
+    # The cards a player is known to be out of after playing card to a trick led by lead_card
+    if lead_card is None or card == lead_card:
+        return 0
+    index = trump_index(trump)
+    lead_suit = EFFECTIVE_SUIT_INDEX[index][lead_card.id]
+    if EFFECTIVE_SUIT_INDEX[index][card.id] == lead_suit:
+        return 0
+    if IS_TRUMP[index][card.id]:
+        # Trump can be played at any time, so the player may still have the lead suit
+        return 0
+    return EFFECTIVE_SUIT_MASKS[index][lead_suit]
+
+
+class HandKnowledge:
+    """The cards played so far in a hand, kept in memory
+
+    Loaded once per hand (see Hand.knowledge) and then kept up to date with
+    record_play() as each card is played, so card counting questions don't
+    need to query the plays of the hand again.
+
+    It also keeps what can be inferred about each player's cards: a player
+    that doesn't follow suit is out of that suit, and high and low were
+    awarded when trump was declared. possible_cards() combines these into a
+    bitmask of the cards a player could still be holding.
+    """
+
+    def __init__(self, trump, played_mask=0, winner_high_id=None, winner_low_id=None, hand=None):
+        self.trump = trump
+        self.played_mask = played_mask
+        self.winner_high_id = winner_high_id
+        self.winner_low_id = winner_low_id
+        # The suit voids of the hand are read when needed, they are kept up to date as cards are played
+        self.hand = hand
+        # The cards each player has played, and is known to not have, by player id
+        self.played_by = {}
+        self.void_masks = {}
+        # Game points in the tricks each player has taken, by player id
+        self.game_points = {}
+
+    @classmethod
+    def for_hand(cls, hand):
+        knowledge = cls(
+            hand.trump,
+            winner_high_id=hand.winner_high_id,
+            winner_low_id=hand.winner_low_id,
+            hand=hand,
+        )
+        plays = Play.objects.filter(trick__hand=hand)
+        # Start from the snapshot of the last finished trick, and only replay the plays after it
+        snapshot = (
+            hand.tricks.filter(played_mask__isnull=False)
+            .order_by("-num")
+            .values("num", "played_mask", "played_by_seat", "void_masks_by_seat", "game_points_by_seat")
+            .first()
+        )
+        if snapshot:
+            plays = plays.filter(trick__num__gt=snapshot.pop("num"))
+            knowledge.restore(hand.game.seat_ring.player_ids, **snapshot)
+        plays = plays.order_by("trick__num", "id").values_list("trick_id", "trick__taker_id", "player_id", "card")
+        lead_cards = {}
+        for trick_id, taker_id, player_id, representation in plays:
+            card = Card.from_rep(representation)
+            knowledge.record_play(card, player_id, lead_cards.setdefault(trick_id, card))
+            if taker_id is not None:
+                # The trick is finished, its taker won the game points in it
+                knowledge.record_trick_taken(taker_id, CARD_GAME_POINTS[card.id])
+        return knowledge
+
+    def snapshot(self, player_ids):
+        """Returns the state needed to restore this knowledge, with the masks of each player in player_ids order"""
+        return {
+            "played_mask": self.played_mask,
+            "played_by_seat": [self.played_by.get(player_id, 0) for player_id in player_ids],
+            "void_masks_by_seat": [self.void_masks.get(player_id, 0) for player_id in player_ids],
+            "game_points_by_seat": [self.game_points.get(player_id, 0) for player_id in player_ids],
+        }
+
+    def restore(self, player_ids, played_mask, played_by_seat, void_masks_by_seat, game_points_by_seat):
+        """Restores the state returned by snapshot()"""
+        self.played_mask = played_mask
+        self.played_by = {player_id: mask for player_id, mask in zip(player_ids, played_by_seat) if mask}
+        self.void_masks = {player_id: mask for player_id, mask in zip(player_ids, void_masks_by_seat) if mask}
+        self.game_points = {player_id: points for player_id, points in zip(player_ids, game_points_by_seat) if points}
+
+    def record_trick_taken(self, taker_id, game_points):
+        self.game_points[taker_id] = self.game_points.get(taker_id, 0) + game_points
+
+    def record_play(self, card, player_id=None, lead_card=None):
+        card_mask = CARD_MASKS[card.id]
+        self.played_mask |= card_mask
+        if player_id is None:
+            return
+        self.played_by[player_id] = self.played_by.get(player_id, 0) | card_mask
+        void_mask = _void_mask(card, lead_card, self.trump)
+        if void_mask:
+            self.void_masks[player_id] = self.void_masks.get(player_id, 0) | void_mask
+
+    def possible_cards(self, player_id, observer=None):
+        """Returns a bitmask of the cards player_id could still be holding
+
+        When an observer (a Player) is given, the cards in the observer's
+        hand are excluded, along with what the observer can tell from having
+        been awarded high or low. The mask includes cards that were never
+        dealt, since nobody can tell which cards those are.
+        """
+        mask = FULL_MASK & ~self.played_mask & ~self.void_masks.get(player_id, 0) & ~self._out_of_suits(player_id)
+        if observer is not None and observer.id != player_id:
+            observer_mask = observer.hand_mask.mask
+            mask &= ~observer_mask & ~self._excluded_by_high_and_low(observer, observer_mask)
+        return mask
+
+    def _out_of_suits(self, player_id):
+        if self.hand is None or not self.hand.suit_voids:
+            return 0
+        index = trump_index(self.trump)
+        voids = seat_voids(self.hand.suit_voids, self.hand.game.seat_ring.player(player_id).seat)
+        out_of_suits = 0
+        for suit in range(len(SUITS)):
+            if voids >> suit & 1:
+                out_of_suits |= EFFECTIVE_SUIT_MASKS[index][suit]
+        return out_of_suits
+
+    def _excluded_by_high_and_low(self, observer, observer_mask):
+        # If the observer won high (or low), no one else was dealt a higher (or lower) trump
+        if observer.id not in (self.winner_high_id, self.winner_low_id):
+            return 0
+        index = trump_index(self.trump)
+        trump_dealt = (observer_mask | self.played_by.get(observer.id, 0)) & TRUMP_MASKS[index]
+        if not trump_dealt:
+            return 0
+        excluded = 0
+        trump_order = [card_id for card_id in TRUMP_ORDER[index] if trump_dealt & CARD_MASKS[card_id]]
+        if observer.id == self.winner_high_id:
+            excluded |= BEATEN_BY_MASKS[index][trump_order[0]]
+        if observer.id == self.winner_low_id:
+            lowest = trump_order[-1]
+            excluded |= TRUMP_MASKS[index] & ~BEATEN_BY_MASKS[index][lowest] & ~CARD_MASKS[lowest]
+        return excluded
+
+    def has_been_played(self, card):
+        return bool(self.played_mask & CARD_MASKS[card.id])
+
+    def highest_still_out(self, suit, ignore_card=None):
+        """Returns the highest card of suit (the jick counts as trump) that hasn't been played
+
+        ignore_card is considered to still be out, even if it has been played
+        """
+        if suit not in SUIT_INDEX:
+            return None
+        played_mask = self.played_mask
+        if ignore_card:
+            played_mask &= ~CARD_MASKS[ignore_card.id]
+        for card_id in SUIT_ORDER[trump_index(self.trump)][SUIT_INDEX[suit]]:
+            if not played_mask & CARD_MASKS[card_id]:
+                return CARDS[card_id]
+        return None
+
+    def jack_or_jick_still_out(self):
+        jack_and_jick = JACK_AND_JICK_MASKS[trump_index(self.trump)]
+        return self.played_mask & jack_and_jick != jack_and_jick
+
 
 def card_has_been_played(hand, card):
-    return Play.objects.filter(trick__hand=hand, card=card.representation).exists()
+    return hand.knowledge.has_been_played(card)
 
 
 def highest_card_still_out(hand, suit, ignore_card=None):
-    all_plays = Play.objects.filter(trick__hand=hand)
-    all_cards_played = [Card(representation=play.card) for play in all_plays]
-    if ignore_card:
-        all_cards_played = [card for card in all_cards_played if card != ignore_card]
+    return hand.knowledge.highest_still_out(suit, ignore_card=ignore_card)
+
 
-    cards_played_from_suit = [card for card in all_cards_played if card.is_suit(suit, hand.trump)]
-    cards_played_rep = [card.representation for card in cards_played_from_suit]
+def jack_or_jick_still_out(hand):
+    return hand.knowledge.jack_or_jick_still_out()
 
-    all_cards_from_suit = [card for card in Deck().cards if card.is_suit(suit, hand.trump)]
-    all_cards_sorted = sorted(all_cards_from_suit, key=lambda c: c.trump_rank(hand.trump), reverse=True)
 
-    highest_not_played = next((card for card in all_cards_sorted if card.representation not in cards_played_rep), None)
+class DecisionCache:
+    """Answers to card counting questions for a single computer decision
 
-    return highest_not_played
+    The heuristics in computer_logic.choose_card ask the same questions about
+    the same cards, so they share one of these, which is thrown away once a
+    card has been chosen. hits and misses count how often it saved work.
+    """
 
+    def __init__(self):
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
 
-def jack_or_jick_still_out(hand):
-    jack_rep = Card(value="jack", suit=hand.trump).representation
-    jick_rep = Card(value="jack", suit=Card.jick_suit(hand.trump)).representation
-    jboys_played = Play.objects.filter(Q(card=jack_rep) | Q(card=jick_rep), trick__hand=hand).count()
-    return jboys_played < 2
+    def __repr__(self):
+        return f"DecisionCache({self.hits} hits, {self.misses} misses)"
 
+    def get_or_compute(self, key, compute):
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+        self.misses += 1
+        result = self.results[key] = compute()
+        return result
 
-def is_teammate_taking_trick(hand, trick, player, plays):
+
+def decision_cached(function):
+    """Caches the result of function in its cache keyword argument, when one is given
+
+    function takes (hand, trick, player, [card,] plays), results are keyed on
+    the card and the state of the trick.
+    """
+
+    @wraps(function)
+    def cached(hand, trick, player, *args, cache=None):
+        if cache is None:
+            return function(hand, trick, player, *args)
+        *card, plays = args
+        key = (function.__name__, trick.id, player.id, card[0].id if card else None, tuple(p.card for p in plays))
+        return cache.get_or_compute(key, lambda: function(hand, trick, player, *args, cache=cache))
+
+    return cached
+
+
+@decision_cached
+def is_teammate_taking_trick(hand, trick, player, plays, cache=None):
     if hand.game.num_teams == 0:
         return False
 
@@ -46,68 +274,45 @@ def is_teammate_taking_trick(hand, trick, player, plays):
 
     # Pretend that we are playing that card, if we would take the trick then
     # our teammate is taking the trick
-    return not could_be_defeated(hand, trick, player, Card(representation=current_winning_play.card), plays, already_played=True)
+    return not could_be_defeated(hand, trick, player, Card.from_rep(current_winning_play.card), plays, cache=cache)
 
 
 # Returns true if it is known that no one else (besides teammates) in the trick can take this card
-def safe_to_play(hand, trick, player, card, plays):
+@decision_cached
+def safe_to_play(hand, trick, player, card, plays, cache=None):
     # Before checking anything, make sure we can beat the current winning card
     # (or the current winning card belongs to a teammate)
     current_winning_play = trick.find_winning_play(plays)
-    if not Card(representation=current_winning_play.card).is_less_than(
-        card, hand.trump
-    ) and not is_teammate_taking_trick(hand, trick, player, plays):
+    if not Card.from_rep(current_winning_play.card).is_less_than(card, hand.trump) and not is_teammate_taking_trick(
+        hand, trick, player, plays, cache=cache
+    ):
         LOG.debug(f"safe_to_play {card} would be defeated by the current winning play")
         return False
 
-    return not could_be_defeated(hand, trick, player, card, plays)
+    return not could_be_defeated(hand, trick, player, card, plays, cache=cache)
 
 
-def could_be_defeated(hand, trick, player, card, plays, already_played=False):
-    # Check to see if it is the highest remaining card of that suit
-    suit_to_check = hand.trump if card.is_trump(hand.trump) else card.suit
-    ignore_card = card if already_played else None
-    highest_card_left_of_same_suit = highest_card_still_out(hand, suit_to_check, ignore_card=ignore_card)
-    is_highest_left_of_same_suit = card.representation == highest_card_left_of_same_suit.representation
+@decision_cached
+def could_be_defeated(hand, trick, player, card, plays, cache=None):
+    """Whether anyone left to play in the trick (besides teammates) could hold a card that takes card
+
+    Uses what player knows: their own cards, the cards played so far this
+    hand, which suits others are known to be out of, and high and low.
+    """
+    knowledge = hand.knowledge
+    beaten_by = BEATEN_BY_MASKS[trump_index(hand.trump)][card.id]
 
     plays_so_far = len(plays)
     # subtract one to account for me
     remaining_plays = hand.game.num_players - plays_so_far - 1
-    current_player = player
-
-    while remaining_plays != 0:
-        remaining_plays -= 1
-        # next_player is a db query
-        # TODO: rework so we don't need players, just IDs
-        next_player = hand.game.next_player(current_player)
-        current_player = next_player
-
-        if is_highest_left_of_same_suit and card.is_trump(hand.trump):
-            LOG.debug(
-                f"could_be_defeated {card} breaking because it is highest remaining trump (excluding cards already played this hand)"
-            )
-            break
-        elif hand.game.num_teams != 0 and player.team == next_player.team:
-            # This is a teammate
+    seat_ring = hand.game.seat_ring
+
+    for next_player in seat_ring.players_after(player.id, remaining_plays):
+        if hand.game.num_teams != 0 and seat_ring.are_teammates(player.id, next_player.id):
             LOG.debug(f"could_be_defeated {card} continuing because {next_player} is a teammate")
             continue
-        elif card.is_trump(hand.trump) or is_highest_left_of_same_suit:
-            # If we don't have the highest remaining trump, but we have a trump or
-            # the highest card left of its suit, then we need everyone after
-            # us to be out of trump
-            if str(next_player.id) in hand.players_out_of_suits.get(hand.trump, []):
-                LOG.debug(f"could_be_defeated {card} continuing because {next_player} is out of trump")
-                continue
-        else:
-            # If we don't have the highest of the suit and we don't have trump, we need
-            # everyone after us to be out of trump and that suit
-            if str(next_player.id) in hand.players_out_of_suits.get(hand.trump, []) and str(
-                next_player.id
-            ) in hand.players_out_of_suits.get(card.suit, []):
-                LOG.debug(f"could_be_defeated {card} continuing because {next_player} is out of trump and {card.suit}")
-                continue
-        # If we made it through the if/else's, that means this player could have cards that can take ours
-        LOG.debug(f"could_be_defeated {card} True: A remaining player could take our card")
-        return True
+        if knowledge.possible_cards(next_player.id, observer=player) & beaten_by:
+            LOG.debug(f"could_be_defeated {card} True: {next_player} could have a card that takes ours")
+            return True
     LOG.debug(f"could_be_defeated {card} can not be defeated by any remaining plays")
     return False
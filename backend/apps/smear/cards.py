@@ -1,6 +1,6 @@
-import copy
 import logging
 import random
+from collections import namedtuple
 
 LOG = logging.getLogger(__name__)
 
@@ -10,89 +10,220 @@ CLUBS = "clubs"
 DIAMONDS = "diamonds"
 SUITS = [SPADES, HEARTS, CLUBS, DIAMONDS]
 SUIT_CHOICES = ((suit, suit) for suit in SUITS)
+VALUES = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "jack", "queen", "king", "ace"]
+
+# Integer card encoding
+#
+# Each card is an int from 0 to 51: card_id = suit_index * 13 + value_index,
+# using the order of SUITS and VALUES above. The rules queries below are
+# precomputed once at import into tables that are indexed by [card_id] or,
+# when the answer depends on trump, by [trump_index][card_id]. trump_index is
+# the position of trump in SUITS, or NO_TRUMP when trump hasn't been declared.
+NUM_CARDS = 52
+NUM_VALUES = len(VALUES)
+NO_TRUMP = len(SUITS)
+VALUE_REPRESENTATIONS = "234567890JQKA"
+SUIT_REPRESENTATIONS = "SHCD"
+SUIT_INDEX = {suit: index for index, suit in enumerate(SUITS)}
+JACK_INDEX = VALUES.index("jack")
+
+
+def trump_index(trump):
+    """Returns the index used for the [trump_index][card_id] tables"""
+    return SUIT_INDEX.get(trump, NO_TRUMP)
+
+
+def _same_color(suit_index, other_suit_index):
+    # SUITS is ordered spades, hearts, clubs, diamonds, so colors alternate
+    return other_suit_index != NO_TRUMP and suit_index % 2 == other_suit_index % 2
+
+
+def _is_trump(value_index, suit_index, trump):
+    # The jick (the jack of the same color) is trump as well
+    is_jick = value_index == JACK_INDEX and _same_color(suit_index, trump)
+    return suit_index == trump or is_jick
+
+
+def _trump_rank(value_index, suit_index, trump):
+    if value_index == JACK_INDEX:
+        # Differentiate between jack and jick
+        return 11 if suit_index == trump else 10
+    # 2 through 10 are ranked 1 through 9, queen through ace are 12 through 14
+    return value_index + 1 if value_index < JACK_INDEX else value_index + 2
+
+
+CARD_IDS = range(NUM_CARDS)
+CARD_SUIT_INDEX = [card_id // NUM_VALUES for card_id in CARD_IDS]
+CARD_VALUE_INDEX = [card_id % NUM_VALUES for card_id in CARD_IDS]
+CARD_VALUE = [VALUES[value_index] for value_index in CARD_VALUE_INDEX]
+CARD_SUIT = [SUITS[suit_index] for suit_index in CARD_SUIT_INDEX]
+CARD_REPRESENTATION = [
+    VALUE_REPRESENTATIONS[card_id % NUM_VALUES] + SUIT_REPRESENTATIONS[card_id // NUM_VALUES] for card_id in CARD_IDS
+]
+CARD_RANK = [value_index + 1 for value_index in CARD_VALUE_INDEX]
+CARD_GAME_POINTS = [{"10": 10, "jack": 1, "queen": 2, "king": 3, "ace": 4}.get(value, 0) for value in CARD_VALUE]
+REPRESENTATION_TO_CARD_ID = {rep: card_id for card_id, rep in enumerate(CARD_REPRESENTATION)}
+VALUE_AND_SUIT_TO_CARD_ID = {(CARD_VALUE[card_id], CARD_SUIT[card_id]): card_id for card_id in CARD_IDS}
+
+TRUMP_INDEXES = range(NO_TRUMP + 1)
+IS_TRUMP = [
+    [_is_trump(CARD_VALUE_INDEX[card_id], CARD_SUIT_INDEX[card_id], trump) for card_id in CARD_IDS]
+    for trump in TRUMP_INDEXES
+]
+IS_JACK = [
+    [CARD_VALUE_INDEX[card_id] == JACK_INDEX and CARD_SUIT_INDEX[card_id] == trump for card_id in CARD_IDS]
+    for trump in TRUMP_INDEXES
+]
+IS_JICK = [
+    [IS_TRUMP[trump][card_id] and CARD_SUIT_INDEX[card_id] != trump for card_id in CARD_IDS] for trump in TRUMP_INDEXES
+]
+TRUMP_RANK = [
+    [_trump_rank(CARD_VALUE_INDEX[card_id], CARD_SUIT_INDEX[card_id], trump) for card_id in CARD_IDS]
+    for trump in TRUMP_INDEXES
+]
+# The suit a card belongs to once trump is known (the jick moves to the trump suit)
+EFFECTIVE_SUIT_INDEX = [
+    [trump if IS_TRUMP[trump][card_id] else CARD_SUIT_INDEX[card_id] for card_id in CARD_IDS] for trump in TRUMP_INDEXES
+]
+JICK_SUIT_INDEX = [(trump + 2) % len(SUITS) for trump in range(len(SUITS))]
+
+
+def _beats(trump, card_id, other_id):
+    """Whether other_id takes a trick that card_id is currently winning"""
+    is_trump = IS_TRUMP[trump]
+    if is_trump[card_id] != is_trump[other_id]:
+        # Trump beats non-trump
+        return is_trump[other_id]
+    if is_trump[card_id]:
+        # Both are trump, trump_rank accounts for the jick
+        return TRUMP_RANK[trump][card_id] < TRUMP_RANK[trump][other_id]
+    # Neither are trump. When deciding who takes a trick between two non-trump
+    # cards, if the other card didn't follow suit it isn't greater than our card
+    return CARD_SUIT_INDEX[card_id] == CARD_SUIT_INDEX[other_id] and CARD_RANK[card_id] < CARD_RANK[other_id]
+
+
+# BEATS[trump_index][winning_card_id][card_id] is True if card_id takes the
+# trick from winning_card_id. The winning card is always the lead card, a card
+# that followed it, or trump, so the lead suit is accounted for by the row.
+BEATS = [
+    [[_beats(trump, card_id, other_id) for other_id in CARD_IDS] for card_id in CARD_IDS] for trump in TRUMP_INDEXES
+]
+
+
+def winning_index(cards, trump):
+    """Returns the index of the card that takes the trick, cards[0] being the lead"""
+    beats = BEATS[trump_index(trump)]
+    winning = 0
+    winning_beaten_by = beats[cards[0].id]
+    for index in range(1, len(cards)):
+        card_id = cards[index].id
+        if winning_beaten_by[card_id]:
+            winning = index
+            winning_beaten_by = beats[card_id]
+    return winning
+
+
+TrickResult = namedtuple("TrickResult", ["winner_index", "game_points", "has_jack", "has_jick", "trump_count"])
+
+
+def resolve_trick(cards, trump):
+    """Resolves a trick in a single pass, cards[0] being the lead
+
+    Returns a TrickResult with the index of the card that takes the trick,
+    the game points in the trick, whether the jack and jick are in the
+    trick, and how many trump were played.
+    """
+    index = trump_index(trump)
+    beats = BEATS[index]
+    is_trump = IS_TRUMP[index]
+    is_jack = IS_JACK[index]
+    is_jick = IS_JICK[index]
+    winning = 0
+    winning_beaten_by = None
+    game_points = 0
+    has_jack = False
+    has_jick = False
+    trump_count = 0
+    for position, card in enumerate(cards):
+        card_id = card.id
+        if winning_beaten_by is None or winning_beaten_by[card_id]:
+            winning = position
+            winning_beaten_by = beats[card_id]
+        game_points += CARD_GAME_POINTS[card_id]
+        if is_trump[card_id]:
+            trump_count += 1
+            has_jack = has_jack or is_jack[card_id]
+            has_jick = has_jick or is_jick[card_id]
+    return TrickResult(winning, game_points, has_jack, has_jick, trump_count)
+
+
+def card_id_from_representation(representation):
+    card_id = REPRESENTATION_TO_CARD_ID.get(representation[0:2])
+    if card_id is None:
+        raise ValueError(f"Unable to parse card representation: {representation}")
+    return card_id
+
+
+def card_id_from_value_and_suit(value, suit):
+    card_id = VALUE_AND_SUIT_TO_CARD_ID.get((value, suit))
+    if card_id is None:
+        raise ValueError(f"Unable to convert card to representation: value: {value} suit: {suit}")
+    return card_id
 
 
 class Card:
-    def _representation_to_value_and_suit(self, representation):
-        value = {
-            "2": "2",
-            "3": "3",
-            "4": "4",
-            "5": "5",
-            "6": "6",
-            "7": "7",
-            "8": "8",
-            "9": "9",
-            "0": "10",
-            "J": "jack",
-            "Q": "queen",
-            "K": "king",
-            "A": "ace",
-        }.get(representation[0:1], None)
-
-        suit = {
-            "S": SPADES,
-            "H": HEARTS,
-            "C": CLUBS,
-            "D": DIAMONDS,
-        }.get(representation[1:2], None)
-
-        if not value or not suit:
-            raise ValueError(f"Unable to parse card representation: {representation}")
-
-        return value, suit
+    """A single card
+
+    Card is a thin wrapper around the integer card_id, all of the rules
+    queries are answered from the precomputed tables above.
+
+    There are only ever 52 Card instances: Card(...) and Card.from_rep()
+    return the interned instance for that card, so cards are immutable and
+    can be used in sets and as dict keys.
+    """
+
+    __slots__ = ("id", "value", "suit")
 
     def rank(self):
-        rank = {
-            "2": 1,
-            "3": 2,
-            "4": 3,
-            "5": 4,
-            "6": 5,
-            "7": 6,
-            "8": 7,
-            "9": 8,
-            "10": 9,
-            "jack": 10,
-            "queen": 11,
-            "king": 12,
-            "ace": 13,
-        }.get(self.value, None)
-
-        if not rank:
-            raise ValueError(f"Unable to find rank for value: {self.value}")
-
-        return rank
+        return CARD_RANK[self.id]
 
     def trump_rank(self, trump):
-        rank = {
-            "2": 1,
-            "3": 2,
-            "4": 3,
-            "5": 4,
-            "6": 5,
-            "7": 6,
-            "8": 7,
-            "9": 8,
-            "10": 9,
-            "jack": None,
-            "queen": 12,
-            "king": 13,
-            "ace": 14,
-        }.get(self.value)
+        return TRUMP_RANK[trump_index(trump)][self.id]
+
+    def __new__(cls, representation=None, value=None, suit=None):
+        if representation:
+            return CARDS[card_id_from_representation(representation)]
+        if value and suit:
+            return CARDS[card_id_from_value_and_suit(value, suit)]
+        raise ValueError("value and suit must be provided, either by representation or through parameters")
+
+    @classmethod
+    def _create(cls, card_id):
+        card = object.__new__(cls)
+        object.__setattr__(card, "id", card_id)
+        object.__setattr__(card, "value", CARD_VALUE[card_id])
+        object.__setattr__(card, "suit", CARD_SUIT[card_id])
+        return card
 
-        # Differentiate between jack and jick
-        if not rank:
-            rank = 11 if self.suit == trump else 10
+    @staticmethod
+    def from_rep(representation):
+        """Returns the interned card for a two character representation"""
+        card = CARDS_BY_REPRESENTATION.get(representation)
+        return card if card is not None else CARDS[card_id_from_representation(representation)]
+
+    @staticmethod
+    def from_id(card_id):
+        return CARDS[card_id]
 
-        return rank
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
 
-    def __init__(self, representation=None, value=None, suit=None):
-        value, suit = self._representation_to_value_and_suit(representation) if representation else (value, suit)
-        if not value or not suit:
-            raise ValueError("value and suit must be provided, either by representation or through parameters")
-        self.value = value
-        self.suit = suit
+    def __delattr__(self, name):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        # Copying or unpickling a card returns the interned instance
+        return (Card.from_id, (self.id,))
 
     def __str__(self):
         return f"{self.to_representation()}"
@@ -105,46 +236,17 @@ class Card:
         return f"{self.value} of {self.suit}"
 
     def __eq__(self, other):
-        return other and self.value == other.value and self.suit == other.suit
+        return other and self.id == other.id
+
+    def __hash__(self):
+        return self.id
 
     @property
     def representation(self):
         return self.to_representation()
 
     def to_representation(self):
-        value = {
-            "2": "2",
-            "3": "3",
-            "4": "4",
-            "5": "5",
-            "6": "6",
-            "7": "7",
-            "8": "8",
-            "9": "9",
-            "10": "0",
-            "jack": "J",
-            "queen": "Q",
-            "king": "K",
-            "ace": "A",
-        }.get(self.value, None)
-
-        suit = {
-            SPADES: "S",
-            HEARTS: "H",
-            CLUBS: "C",
-            DIAMONDS: "D",
-        }.get(self.suit, None)
-
-        if not value or not suit:
-            raise ValueError(f"Unable to convert card to representation: value: {self.value} suit: {self.suit}")
-
-        return value + suit
-
-    def _same_color(self, suit):
-        if self.suit == HEARTS or self.suit == DIAMONDS:
-            return suit == HEARTS or suit == DIAMONDS
-        if self.suit == CLUBS or self.suit == SPADES:
-            return suit == CLUBS or suit == SPADES
+        return CARD_REPRESENTATION[self.id]
 
     def is_suit(self, suit, trump):
         """Determines if a card is considered Clubs, Spades, etc
@@ -157,124 +259,80 @@ class Card:
         """
         if self.suit == suit:
             return True
-        if trump == suit and self.value == "jack" and self._same_color(suit):
-            return True
-        return False
+        return trump == suit and IS_TRUMP[trump_index(trump)][self.id]
 
     def same_suit(self, other_card, trump):
         """Determines if a card is the same suit as another card"""
-        if self.is_trump(trump) and other_card.is_trump(trump):
-            return True
-        if self.is_jick(trump) or other_card.is_jick(trump):
-            # Since we already know both cards aren't trump, if one is jick
-            # then the other is not the same suit
-            return False
-        return self.suit == other_card.suit
+        effective_suit = EFFECTIVE_SUIT_INDEX[trump_index(trump)]
+        return effective_suit[self.id] == effective_suit[other_card.id]
 
     def is_trump(self, trump):
-        if self.suit == trump:
-            return True
-
-        if self.value == "jack":
-            return self._same_color(trump)
-
-        return False
+        return IS_TRUMP[trump_index(trump)][self.id]
 
     def is_jick(self, trump):
-        return self.value == "jack" and self.suit != trump and self._same_color(trump)
+        return IS_JICK[trump_index(trump)][self.id]
 
     def is_jack(self, trump):
-        return self.value == "jack" and self.suit == trump
+        return IS_JACK[trump_index(trump)][self.id]
 
     def is_less_than(self, other, trump):
-        less_than = False
-        if other is None:
-            less_than = False
-        elif self.is_trump(trump) and not other.is_trump(trump):
-            # self is trump and other isn't, return false
-            less_than = False
-        elif not self.is_trump(trump) and other.is_trump(trump):
-            # self is not trump and other is, return true
-            less_than = True
-        elif self.is_trump(trump):
-            # Both are trump
-            if self.suit == other.suit:
-                # Neither are Jicks, just compare
-                less_than = self.rank() < other.rank()
-            else:
-                # One of the cards is the jick
-                if self.suit != trump:
-                    # self is a jick, if both are value=jack than self is less
-                    less_than = self.rank() <= other.rank()
-                else:
-                    # other is a jick, if both are value=jack than self is not less
-                    less_than = self.rank() < other.rank()
-        else:
-            # Neither are trump
-            if other.suit != self.suit:
-                # When deciding who takes a trick between two non-trump cards,
-                # if the other card didn't follow suit it isn't greater than
-                # our card
-                less_than = False
-            else:
-                # Both cards are same suit, just compare rank
-                less_than = self.rank() < other.rank()
-
-        return less_than
+        return other is not None and BEATS[trump_index(trump)][self.id][other.id]
 
     @property
     def game_points(self):
-        return {
-            "10": 10,
-            "jack": 1,
-            "queen": 2,
-            "king": 3,
-            "ace": 4,
-        }.get(self.value, 0)
+        return CARD_GAME_POINTS[self.id]
 
     @staticmethod
     def jick_suit(trump):
-        if trump == HEARTS:
-            return DIAMONDS
-        if trump == DIAMONDS:
-            return HEARTS
-        if trump == CLUBS:
-            return SPADES
-        if trump == SPADES:
-            return CLUBS
+        index = SUIT_INDEX.get(trump)
+        return SUITS[JICK_SUIT_INDEX[index]] if index is not None else None
+
+
+CARDS = tuple(Card._create(card_id) for card_id in CARD_IDS)
+CARDS_BY_REPRESENTATION = {card.representation: card for card in CARDS}
 
 
 class Deck:
-    ALL_CARDS = [
-        Card(value=value, suit=suit)
-        for value in [
-            "2",
-            "3",
-            "4",
-            "5",
-            "6",
-            "7",
-            "8",
-            "9",
-            "10",
-            "jack",
-            "queen",
-            "king",
-            "ace",
-        ]
-        for suit in SUITS
-    ]
-
-    def __init__(self):
-        self.reset()
-
-    def reset(self):
-        self.cards = copy.deepcopy(self.ALL_CARDS)
+    """A deck of cards backed by a permutation of card ids
+
+    The permutation comes from a random.Random seeded with self.seed, so a
+    deck created with the same seed deals exactly the same cards.
+    """
+
+    ALL_CARDS = [Card(value=value, suit=suit) for value in VALUES for suit in SUITS]
+    ALL_CARD_IDS = [card.id for card in ALL_CARDS]
+    # Seeds are stored in a signed 64 bit column
+    SEED_BITS = 63
+
+    def __init__(self, seed=None):
+        self.reset(seed=seed)
+
+    def reset(self, seed=None):
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(self.SEED_BITS)
+        self.rng = random.Random(self.seed)
+        self.card_ids = list(self.ALL_CARD_IDS)
+        self.position = 0
         self.shuffle()
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        # Only the cards that haven't been dealt yet are shuffled
+        position = self.position
+        remaining = self.card_ids[position:]
+        self.rng.shuffle(remaining)
+        self.card_ids[position:] = remaining
+
+    @property
+    def cards(self):
+        position = self.position
+        return [CARDS[card_id] for card_id in self.card_ids[position:]]
+
+    def deal_ids(self, num=3):
+        # Deals num card ids, returning a list of card ids
+        start = self.position
+        end = min(start + num, len(self.card_ids))
+        self.position = end
+        return self.card_ids[start:end]
 
     def deal(self, num=3):
         # Deals num cards, returning a list of cards
-        return [self.cards.pop(0) for x in range(0, num)]
+        return [CARDS[card_id] for card_id in self.deal_ids(num)]
@@ -1,13 +1,30 @@
 import logging
 
-from apps.smear import card_counting
-from apps.smear.cards import SUITS, Card
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from apps.smear import bid_simulation, card_counting
+from apps.smear.bid_book import get_bid_book
+from apps.smear.bid_odds import no_one_else_dealt
+from apps.smear.cards import CARD_VALUE, IS_TRUMP, SUIT_INDEX, SUITS, TRUMP_RANK, Card, card_id_from_representation
+from apps.smear.hand_mask import CARD_MASKS, TRUMP_ORDER, value_mask
 
 LOG = logging.getLogger(__name__)
 
+JACKS = value_mask("jack")
+ACE_KING_QUEEN = value_mask("ace", "king", "queen")
+TENS_AND_FACE_CARDS = value_mask("ace", "king", "queen", "jack", "10")
+
 
 def computer_bid(player, hand):
-    bid_value, trump_value = calculate_bid(player, hand)
+    estimate = simulated_bid(player, hand) if settings.MONTE_CARLO_BID_BUDGET else None
+    if estimate is None:
+        book = get_bid_book()
+        estimate = book.lookup(player.hand_mask.mask, hand.game.num_players) if book else None
+    if estimate:
+        bid_value, trump_value = _apply_dealer_rule(player, hand, *estimate)
+    else:
+        bid_value, trump_value = calculate_bid(player, hand)
 
     if hand.high_bid and bid_value <= hand.high_bid.bid:
         LOG.info("Unable to beat current high bid, passing")
@@ -23,28 +40,72 @@ def computer_play_card(player, trick, current_plays_arg):
 
 
 def calculate_bid(player, hand, aggression_factor=0.2):
+    LOG.debug(f"calculating bid for player {player} with hand {hand}")
+    profile = HandProfile(player.cards_in_hand)
+    rounded_bid, bid_trump = estimate_bid(profile, hand.game.num_players, aggression_factor, player=player)
+    return _apply_dealer_rule(player, hand, rounded_bid, bid_trump)
+
+
+def estimate_bid(profile, num_players, aggression_factor=0.2, player=None):
+    """Returns the bid a hand is worth, rounded, and its trump
+
+    This only depends on the cards and the number of players, the bid still
+    needs to go through _apply_dealer_rule() (see the bid book).
+    """
     bid = 0
     bid_trump = None
 
-    LOG.debug(f"calculating bid for player {player} with hand {hand}")
     for suit in SUITS:
+        trump_profile = profile.trumps[suit]
         tmp_bid = 0
-        tmp_bid += expected_points_from_high(player, hand, suit)
-        tmp_bid += expected_points_from_low(player, hand, suit)
-        tmp_bid += expected_points_from_game(player, hand, suit)
-        tmp_bid += expected_points_from_jack_and_jick(player, hand, suit)
+        tmp_bid += expected_points_from_high(player, num_players, profile, trump_profile)
+        tmp_bid += expected_points_from_low(player, num_players, profile, trump_profile)
+        tmp_bid += expected_points_from_game(player, num_players, profile, trump_profile)
+        tmp_bid += expected_points_from_jack_and_jick(player, num_players, profile, trump_profile)
 
         LOG.debug(f"{player} suit {suit} would result in bid of {tmp_bid}")
         if tmp_bid > bid:
             bid, bid_trump = tmp_bid, suit
 
+    return round_bid(bid, aggression_factor), bid_trump
+
+
+def round_bid(bid, aggression_factor):
     # Determine whether to round up or down
-    round_up_or_down = 0
     fractional_part = bid - int(bid)
     round_up_or_down = 1 if aggression_factor + fractional_part >= 1 else 0
     # int() always rounds down
-    rounded_bid = int(bid) + round_up_or_down
+    return int(bid) + round_up_or_down
+
 
+def simulated_bid(player, hand, aggression_factor=0.2):
+    """Returns the bid a hand is worth and its trump from playing out random deals (see bid_simulation)
+
+    Like estimate_bid the dealer rule still needs to be applied. Returns None
+    if the simulation didn't finish within settings.MONTE_CARLO_BID_BUDGET.
+    """
+    seat_ring = hand.game.seat_ring
+    players = [player, *seat_ring.players_after(player.id, len(seat_ring) - 1)]
+    teams = hand.game.num_teams != 0
+    points_by_trump = bid_simulation.expected_points(
+        [card_id_from_representation(rep) for rep in player.cards_in_hand],
+        [other.team_id if teams else other.id for other in players],
+        settings.MONTE_CARLO_BID_SAMPLES,
+        settings.MONTE_CARLO_BID_BUDGET,
+    )
+    if points_by_trump is None:
+        return None
+
+    bid = 0
+    bid_trump = None
+    for suit, points in zip(SUITS, points_by_trump.tolist()):
+        LOG.debug(f"{player} suit {suit} would win {points:.2f} points in simulated deals")
+        if points > bid:
+            bid, bid_trump = points, suit
+    return round_bid(bid, aggression_factor), bid_trump
+
+
+def _apply_dealer_rule(player, hand, rounded_bid, bid_trump):
     is_dealer = player.id == hand.dealer_id
     if rounded_bid < 2:
         if not hand.high_bid and is_dealer and rounded_bid == 1:
@@ -57,61 +118,67 @@ def calculate_bid(player, hand, aggression_factor=0.2):
     return rounded_bid, bid_trump
 
 
-def choose(n, k):
-    """
-    A fast way to calculate binomial coefficients by Andrew Dalke (contrib).
-    """
-    if 0 <= k <= n:
-        ntok = 1
-        ktok = 1
-        for t in range(1, min(k, n - k) + 1):
-            ntok *= n
-            ktok *= t
-            n -= 1
-        return ntok // ktok
-    else:
-        return 0
-
-
-def calculate_percent_that_no_one_else_was_dealt_a_card(cards_per_hand, num_players, possible_cards):
-    # subtract cards_per_hand to account for the cards in my hand
-    remaining_cards_in_deck = 52 - cards_per_hand
-    percent_that_no_one_else_was_dealt_a_card = 1.0
-
-    # percent_that_no_one_else_was_dealt_a_card = (
-    #   percent_that_player1_was_not_dealt_a_card *
-    #   percent_that_player2_was_not_dealt_a_card *
-    #   percent_that_player3_was_not_dealt_a_card *
-    #   ...
-    # )
-    for i in range(0, num_players - 1):
-        if (remaining_cards_in_deck - possible_cards) < cards_per_hand:
-            percent_that_no_one_else_was_dealt_a_card = 0
-            break
-        percent_that_no_one_else_was_dealt_a_card *= choose(
-            remaining_cards_in_deck - possible_cards, cards_per_hand
-        ) / float(choose(remaining_cards_in_deck, cards_per_hand))
-        remaining_cards_in_deck -= cards_per_hand
-
-    return percent_that_no_one_else_was_dealt_a_card
-
-
-def expected_points_from_high(player, hand, suit):
+class TrumpProfile:
+    """What the bidding estimators need to know about a hand if suit was trump"""
+
+    def __init__(self, suit, trump_ids):
+        self.suit = suit
+        index = SUIT_INDEX[suit]
+        # Trump card ids, highest first
+        self.trump_ids = trump_ids
+        self.num_trump = len(trump_ids)
+        self.high_rank = TRUMP_RANK[index][trump_ids[0]] if trump_ids else None
+        self.low_rank = TRUMP_RANK[index][trump_ids[-1]] if trump_ids else None
+        self.num_jacks_and_jicks = sum(1 for card_id in trump_ids if CARD_MASKS[card_id] & JACKS)
+        self.num_AKQ = sum(1 for card_id in trump_ids if CARD_MASKS[card_id] & ACE_KING_QUEEN)
+        # Added up by HandProfile in hundredths, before expected_points_from_game limits it
+        self.game_points = 0
+
+
+class HandProfile:
+    """A hand looked at once for every possible trump, so calculate_bid doesn't re-read the cards"""
+
+    def __init__(self, cards_in_hand):
+        self.num_cards = len(cards_in_hand)
+        card_ids = [card_id_from_representation(rep) for rep in cards_in_hand]
+        mask = 0
+        for card_id in card_ids:
+            mask |= CARD_MASKS[card_id]
+        self.trumps = {
+            suit: TrumpProfile(suit, [card_id for card_id in TRUMP_ORDER[index] if mask & CARD_MASKS[card_id]])
+            for index, suit in enumerate(SUITS)
+        }
+
+        # Points towards game are added up card by card, in whole hundredths so
+        # the total doesn't depend on the order of the cards (see the bid book)
+        for card_id in card_ids:
+            value = CARD_VALUE[card_id]
+            for index, trump_profile in enumerate(self.trumps.values()):
+                if IS_TRUMP[index][card_id] and value == "10":
+                    # 10 of trump is valuable, especially if you have many trump
+                    trump_profile.game_points += 60 if trump_profile.num_trump > 2 else 30
+                elif IS_TRUMP[index][card_id]:
+                    # All trump cards will help some
+                    trump_profile.game_points += 10 if TRUMP_RANK[index][card_id] < 5 else 20
+                elif value in ("ace", "king"):
+                    # High face cards are worth some
+                    trump_profile.game_points += 20
+                elif value in ("queen", "jack"):
+                    # lower face cards are worth a little less
+                    trump_profile.game_points += 15
+
+
+def expected_points_from_high(player, num_players, profile, trump_profile):
     exp_points = 0
+    suit = trump_profile.suit
 
-    cards = player.get_trump(suit)
-    if not cards:
+    if not trump_profile.num_trump:
         return 0
 
     # (14 - high_rank) because there are 14 trumps
-    high_rank = cards[0].trump_rank(suit)
-    other_possible_highs = 14 - high_rank
+    other_possible_highs = 14 - trump_profile.high_rank
 
-    percent_that_no_one_else_has_high = calculate_percent_that_no_one_else_was_dealt_a_card(
-        len(player.cards_in_hand),
-        hand.game.num_players,
-        other_possible_highs,
-    )
+    percent_that_no_one_else_has_high = no_one_else_dealt(profile.num_cards, num_players, other_possible_highs)
 
     exp_points = 1 * percent_that_no_one_else_has_high
     if exp_points < 0.4:
@@ -121,22 +188,17 @@ def expected_points_from_high(player, hand, suit):
     return exp_points
 
 
-def expected_points_from_low(player, hand, suit):
+def expected_points_from_low(player, num_players, profile, trump_profile):
     exp_points = 0
+    suit = trump_profile.suit
 
-    cards = player.get_trump(suit)
-    if not cards:
+    if not trump_profile.num_trump:
         return 0
 
     # (low_rank - 1) because the lowest is 2
-    low_rank = cards[-1].trump_rank(suit)
-    other_possible_lows = low_rank - 1
+    other_possible_lows = trump_profile.low_rank - 1
 
-    percent_that_no_one_else_has_low = calculate_percent_that_no_one_else_was_dealt_a_card(
-        len(player.cards_in_hand),
-        hand.game.num_players,
-        other_possible_lows,
-    )
+    percent_that_no_one_else_has_low = no_one_else_dealt(profile.num_cards, num_players, other_possible_lows)
 
     exp_points = 1 * percent_that_no_one_else_has_low
     if exp_points < 0.4:
@@ -146,28 +208,10 @@ def expected_points_from_low(player, hand, suit):
     return exp_points
 
 
-def expected_points_from_game(player, hand, suit):
-    exp_points = 0.0
-
-    my_trump = player.get_trump(suit)
-    my_cards = player.get_cards()
-
-    for card in my_cards:
-        if card.is_trump(suit) and card.value == "10":
-            # 10 of trump is valuable, especially if you have many trump
-            if len(my_trump) > 2:
-                exp_points += 0.6
-            else:
-                exp_points += 0.3
-        elif card.is_trump(suit):
-            # All trump cards will help some
-            exp_points += 0.1 if card.trump_rank(suit) < 5 else 0.2
-        elif card.value in ("ace", "king"):
-            # High face cards are worth some
-            exp_points += 0.20
-        elif card.value in ("queen", "jack"):
-            # lower face cards are worth a little less
-            exp_points += 0.15
+def expected_points_from_game(player, num_players, profile, trump_profile):
+    suit = trump_profile.suit
+    # See HandProfile for how the cards add up
+    exp_points = trump_profile.game_points / 100
 
     if exp_points > 1:
         exp_points = 1
@@ -190,24 +234,24 @@ def expected_total_trump(num_players):
     }.get(num_players, 0)
 
 
-def expected_points_from_jack_and_jick(player, hand, suit):
+def expected_points_from_jack_and_jick(player, num_players, profile, trump_profile):
     exp_points = 0
     exp_my_points = 0
     exp_taken_points = 0
+    suit = trump_profile.suit
 
-    my_trump = player.get_trump(suit)
-    num_jacks_and_jicks = len([card for card in my_trump if card.value == "jack"])
-    num_non_jacks = len(my_trump) - num_jacks_and_jicks
-    num_my_AKQ = len([card for card in my_trump if card.value in ("ace", "king", "queen")])
-    num_expected_trump = expected_total_trump(hand.game.num_players)
-    num_expected_remaining_trump = num_expected_trump - len(my_trump)
+    num_jacks_and_jicks = trump_profile.num_jacks_and_jicks
+    num_non_jacks = trump_profile.num_trump - num_jacks_and_jicks
+    num_my_AKQ = trump_profile.num_AKQ
+    num_expected_trump = expected_total_trump(num_players)
+    num_expected_remaining_trump = num_expected_trump - trump_profile.num_trump
     if num_expected_remaining_trump < 1:
         # Enforce a minimum so we don't divide by zero
         num_expected_remaining_trump = 1
     # buffer_required is the number of other trump I need in order to feel comfortable
     # that I can take my J&Js
     buffer_required = num_expected_remaining_trump * 0.6
-    expected_jacks_and_jicks = 2 * (6 * hand.game.num_players) / 52
+    expected_jacks_and_jicks = 2 * (6 * num_players) / 52
 
     if num_jacks_and_jicks:
         # How many points will I get from my own Jacks and Jicks
@@ -237,26 +281,78 @@ def expected_points_from_jack_and_jick(player, hand, suit):
     return exp_points
 
 
-def get_A_K_Q_of_trump(player, trump):
-    my_trump = player.get_trump(trump)
-    highest_AKQ = next((card for card in my_trump if card.value in ("ace", "king", "queen")), None)
+class TrickContext:
+    """What a computer player looks at when choosing a card
+
+    Built once at the top of choose_card and passed to every heuristic, each
+    attribute is computed the first time a heuristic uses it. Card counting
+    answers are shared through a DecisionCache.
+    """
+
+    def __init__(self, player, trick, plays):
+        self.player = player
+        self.trick = trick
+        self.hand = trick.hand
+        self.trump = trick.hand.trump
+        self.plays = plays
+        self.lead_play = plays[0] if plays else None
+        self.cache = card_counting.DecisionCache()
+
+    @cached_property
+    def my_cards(self):
+        return self.player.get_cards()
+
+    @cached_property
+    def hand_mask(self):
+        return self.player.hand_mask
+
+    @cached_property
+    def my_trump(self):
+        """My trump, highest first"""
+        return self.hand_mask.trump_cards(self.trump)
+
+    @cached_property
+    def cards_played(self):
+        return [play.card_obj for play in self.plays]
+
+    @cached_property
+    def winning_play(self):
+        return self.trick.find_winning_play(self.plays)
+
+    @cached_property
+    def winning_card(self):
+        return self.winning_play.card_obj
+
+    @cached_property
+    def legal_plays(self):
+        return self.trick.get_legal_plays(self.player, self.lead_play)
+
+    @cached_property
+    def is_teammate_taking_trick(self):
+        return card_counting.is_teammate_taking_trick(self.hand, self.trick, self.player, self.plays, cache=self.cache)
+
+    def safe_to_play(self, card):
+        return card_counting.safe_to_play(self.hand, self.trick, self.player, card, self.plays, cache=self.cache)
+
+
+def get_A_K_Q_of_trump(context):
+    highest_AKQ = next((card for card in context.my_trump if card.value in ("ace", "king", "queen")), None)
     if highest_AKQ:
         LOG.debug(f"get_A_K_Q_of_trump chooses {highest_AKQ}")
     return highest_AKQ
 
 
-def get_lowest_trump(player, trump):
-    my_trump = player.get_trump(trump)
-    lowest_trump = my_trump[-1] if my_trump else None
+def get_lowest_trump(context):
+    lowest_trump = context.my_trump[-1] if context.my_trump else None
     if lowest_trump:
         LOG.debug(f"get_lowest_trump chooses {lowest_trump}")
     return lowest_trump
 
 
-def get_lowest_spare_trump_to_lead(player, trump):
-    my_trump = player.get_trump(trump)
-    all_spare_trump = [card for card in my_trump if card.value not in ("ace", "king", "queen", "jack", "10")]
-    jboys = [card for card in my_trump if card.value == "jack"]
+def get_lowest_spare_trump_to_lead(context):
+    hand_mask = context.hand_mask
+    all_spare_trump = (hand_mask - TENS_AND_FACE_CARDS).trump_cards(context.trump)
+    jboys = hand_mask.trump(context.trump) & JACKS
     # If we have any jacks/jicks, keep at least one spare trump to protect it
     required_trump = 2 if jboys else 1
     spare_trump = all_spare_trump[-1] if len(all_spare_trump) >= required_trump else None
@@ -266,10 +362,11 @@ def get_lowest_spare_trump_to_lead(player, trump):
     return spare_trump
 
 
-def get_A_K_Q_J_of_off_suit(player, trump):
-    my_cards = player.get_cards()
+def get_A_K_Q_J_of_off_suit(context):
     off_suit_AKQJ = [
-        card for card in my_cards if card.value in ("ace", "king", "queen", "jack") and not card.is_trump(trump)
+        card
+        for card in context.my_cards
+        if card.value in ("ace", "king", "queen", "jack") and not card.is_trump(context.trump)
     ]
     off_suit_AKQJ_sorted = sorted(off_suit_AKQJ, key=lambda c: c.rank(), reverse=True)
     highest_card = off_suit_AKQJ_sorted[0] if off_suit_AKQJ_sorted else None
@@ -279,12 +376,11 @@ def get_A_K_Q_J_of_off_suit(player, trump):
     return highest_card
 
 
-def get_below_10_of_off_suit(player, trump):
-    my_cards = player.get_cards()
+def get_below_10_of_off_suit(context):
     off_suit_lows = [
         card
-        for card in my_cards
-        if card.value not in ("ace", "king", "queen", "jack", "10") and not card.is_trump(trump)
+        for card in context.my_cards
+        if card.value not in ("ace", "king", "queen", "jack", "10") and not card.is_trump(context.trump)
     ]
     # high to low
     off_suit_lows_sorted = sorted(off_suit_lows, key=lambda c: c.rank(), reverse=True)
@@ -295,9 +391,9 @@ def get_below_10_of_off_suit(player, trump):
     return highest_card
 
 
-def get_any_card(player, trump):
+def get_any_card(context):
     # We should only be calling this if we can only play an off-suit 10
-    card = player.get_cards()[0]
+    card = context.my_cards[0]
     if card.value != "10":
         LOG.warning(f"get_any_card chooses {card}, but it shouldn't have to do this")
 
@@ -305,41 +401,36 @@ def get_any_card(player, trump):
     return card
 
 
-def give_teammate_jack_or_jick_if_possible(hand, trick, player, plays):
+def give_teammate_jack_or_jick_if_possible(context):
     card = None
-    if card_counting.is_teammate_taking_trick(hand, trick, player, plays):
-        my_trump = player.get_trump(hand.trump)
-        card = next((card for card in my_trump if card.value == "jack"), None)
+    if context.is_teammate_taking_trick:
+        card = next((card for card in context.my_trump if card.value == "jack"), None)
     if card:
         LOG.debug(f"give_teammate_jack_or_jick_if_possible chooses {card}")
     return card
 
 
-def take_jack_or_jick_if_possible(hand, trick, player, plays):
+def take_jack_or_jick_if_possible(context):
     card = None
-    cards_played = [Card(representation=play.card) for play in plays]
-    jboys = [card for card in cards_played if card.is_trump(hand.trump) and card.value == "jack"]
-    only_jick = len(jboys) == 1 and jboys[0].is_jick(hand.trump)
+    trump = context.trump
+    jboys = [card for card in context.cards_played if card.is_trump(trump) and card.value == "jack"]
+    only_jick = len(jboys) == 1 and jboys[0].is_jick(trump)
 
     if not jboys:
         return None
 
-    if card_counting.is_teammate_taking_trick(hand, trick, player, plays):
+    if context.is_teammate_taking_trick:
         return None
 
-    current_winning_play = trick.find_winning_play(plays)
-    current_winning_card = Card(representation=current_winning_play.card)
-
     # First check to see if I can play AKQ
-    card = get_A_K_Q_of_trump(player, hand.trump)
-    if card and not current_winning_card.is_less_than(card, hand.trump):
+    card = get_A_K_Q_of_trump(context)
+    if card and not context.winning_card.is_less_than(card, trump):
         # If our AKQ can't beat the current winning card, don't select it
         card = None
     elif not card and only_jick:
         # If no AKQ, check to see if I have a Jack that can safely take the Jick
-        my_trump = player.get_trump(hand.trump)
-        jack = next((card for card in my_trump if card.value == "jack"), None)
-        if jack and card_counting.safe_to_play(hand, trick, player, jack, plays):
+        jack = next((card for card in context.my_trump if card.value == "jack"), None)
+        if jack and context.safe_to_play(jack):
             card = jack
 
     if card:
@@ -347,20 +438,21 @@ def take_jack_or_jick_if_possible(hand, trick, player, plays):
     return card
 
 
-def lead_jack_or_jick_if_they_are_high_trump_and_can_take_something_valuable(hand, trick, player, plays):
+def lead_jack_or_jick_if_they_are_high_trump_and_can_take_something_valuable(context):
     card = None
+    hand = context.hand
     highest_trump = card_counting.highest_card_still_out(hand, hand.trump)
     if not highest_trump or highest_trump.value != "jack":
         return None
 
-    my_trump = player.get_trump(hand.trump)
+    hand_mask = context.hand_mask
 
     jick = Card(value="jack", suit=Card.jick_suit(hand.trump))
     ten = Card(value="10", suit=hand.trump)
-    jick_still_out = (not card_counting.card_has_been_played(hand, jick)) and jick not in my_trump
-    ten_still_out = (not card_counting.card_has_been_played(hand, ten)) and ten not in my_trump
+    jick_still_out = (not card_counting.card_has_been_played(hand, jick)) and jick not in hand_mask
+    ten_still_out = (not card_counting.card_has_been_played(hand, ten)) and ten not in hand_mask
 
-    potentials = [card for card in my_trump if card.value == "jack"]
+    potentials = (hand_mask & JACKS).trump_cards(hand.trump)
     for lead in potentials:
         if lead.is_jack(hand.trump) and highest_trump == lead and (jick_still_out or ten_still_out):
             card = lead
@@ -374,20 +466,21 @@ def lead_jack_or_jick_if_they_are_high_trump_and_can_take_something_valuable(han
     return card
 
 
-def take_jack_or_jick_if_high_cards_are_out(hand, trick, player, plays):
+def take_jack_or_jick_if_high_cards_are_out(context):
     card = None
-    highest_trump = card_counting.highest_card_still_out(hand, hand.trump)
+    trump = context.trump
+    highest_trump = card_counting.highest_card_still_out(context.hand, trump)
     if not highest_trump or highest_trump.value not in ("ace", "king", "queen", "jack"):
         return None
-    jboys = [card for card in player.get_trump(hand.trump) if card.value == "jack"]
+    jboys = (context.hand_mask & JACKS).trump_cards(trump)
     for jboy in jboys:
-        if card_counting.safe_to_play(hand, trick, player, jboy, plays):
-            if jboy.is_jack(hand.trump) and highest_trump.value in ("ace", "king", "queen"):
+        if context.safe_to_play(jboy):
+            if jboy.is_jack(trump) and highest_trump.value in ("ace", "king", "queen"):
                 # If I have a Jack, play if there are still A K Q out
                 card = jboy
                 break
-            elif jboy.is_jick(hand.trump) and (
-                highest_trump.value in ("ace", "king", "queen") or highest_trump.is_jack(hand.trump)
+            elif jboy.is_jick(trump) and (
+                highest_trump.value in ("ace", "king", "queen") or highest_trump.is_jack(trump)
             ):
                 # If I have a Jick, play if there are still A K Q Jack out
                 card = jboy
@@ -397,68 +490,60 @@ def take_jack_or_jick_if_high_cards_are_out(hand, trick, player, plays):
     return card
 
 
-def take_ten_if_possible(hand, trick, player, plays):
+def take_ten_if_possible(context):
     card = None
     ten_card = None
-    cards_played = [Card(representation=play.card) for play in plays]
-    ten_card = next((card for card in cards_played if card.value == "10"), None)
-    lead_play = plays[0] if plays else None
+    trump = context.trump
+    ten_card = next((card for card in context.cards_played if card.value == "10"), None)
 
     if ten_card:
-        if card_counting.is_teammate_taking_trick(hand, trick, player, plays):
+        if context.is_teammate_taking_trick:
             return None
 
-        legal_plays = [
-            card for card in player.get_cards() if not trick.is_card_invalid_to_play(card, player, lead_play)
-        ]
         # Sorted from least to most
         legal_trump = sorted(
-            [card for card in legal_plays if card.is_trump(hand.trump)], key=lambda c: c.trump_rank(hand.trump)
+            [card for card in context.legal_plays if card.is_trump(trump)], key=lambda c: c.trump_rank(trump)
+        )
+        legal_offsuit = sorted(
+            [card for card in context.legal_plays if not card.is_trump(trump)], key=lambda c: c.rank()
         )
-        legal_offsuit = sorted([card for card in legal_plays if not card.is_trump(hand.trump)], key=lambda c: c.rank())
 
-        current_winning_play = trick.find_winning_play(plays)
-        current_winning_card = Card(representation=current_winning_play.card)
+        current_winning_card = context.winning_card
 
         # First check to see if I can safely take it with a non-trump
         for taker in legal_offsuit:
-            if current_winning_card.is_less_than(taker, hand.trump) and card_counting.safe_to_play(hand, trick, player, taker, plays):
+            if current_winning_card.is_less_than(taker, trump) and context.safe_to_play(taker):
                 card = taker
                 break
         # Then check to see if I can safely take it with a jack or jick or 10
         if not card:
             for taker in legal_trump:
-                if (taker.value == "jack" or taker.value == "10") and card_counting.safe_to_play(hand, trick, player, taker, plays):
+                if (taker.value == "jack" or taker.value == "10") and context.safe_to_play(taker):
                     card = taker
                     break
         # Then check to see if I can take it with a low trump
         if not card:
             for taker in legal_trump:
                 if taker.value not in ("ace", "king", "queen", "jack", "10") and current_winning_card.is_less_than(
-                    taker, hand.trump
+                    taker, trump
                 ):
                     card = taker
                     break
         # Then see if there are any jacks/jicks left still, and if not if I can take it with an AKQ
         if not card:
-            if not card_counting.jack_or_jick_still_out(hand):
-                card = get_A_K_Q_of_trump(player, hand.trump)
+            if not card_counting.jack_or_jick_still_out(context.hand):
+                card = get_A_K_Q_of_trump(context)
 
     if card:
         LOG.debug(f"take_10_if_possible chooses {card}")
     return card
 
 
-def give_teammate_ten_if_possible(hand, trick, player, plays):
+def give_teammate_ten_if_possible(context):
     card = None
-    lead_play = plays[0] if plays else None
-    if card_counting.is_teammate_taking_trick(hand, trick, player, plays):
-        legal_10s = [
-            card
-            for card in player.get_cards()
-            if card.value == "10" and not trick.is_card_invalid_to_play(card, player, lead_play)
-        ]
-        non_trump_10 = next((card for card in legal_10s if not card.is_trump(hand.trump)), None)
+    if context.is_teammate_taking_trick:
+        legal_10s = [card for card in context.legal_plays if card.value == "10"]
+        non_trump_10 = next((card for card in legal_10s if not card.is_trump(context.trump)), None)
         if non_trump_10:
             card = non_trump_10
         else:
@@ -469,22 +554,17 @@ def give_teammate_ten_if_possible(hand, trick, player, plays):
     return card
 
 
-def take_home_ten_safely(hand, trick, player, plays):
+def take_home_ten_safely(context):
     card = None
     ten_card = None
-    lead_play = plays[0] if plays else None
-    legal_10s = [
-        card
-        for card in player.get_cards()
-        if card.value == "10" and not trick.is_card_invalid_to_play(card, player, lead_play)
-    ]
-    non_trump_10 = next((card for card in legal_10s if not card.is_trump(hand.trump)), None)
+    legal_10s = [card for card in context.legal_plays if card.value == "10"]
+    non_trump_10 = next((card for card in legal_10s if not card.is_trump(context.trump)), None)
     if non_trump_10:
         ten_card = non_trump_10
     else:
         ten_card = legal_10s[0] if legal_10s else None
 
-    if ten_card and card_counting.safe_to_play(hand, trick, player, ten_card, plays):
+    if ten_card and context.safe_to_play(ten_card):
         card = ten_card
 
     if card:
@@ -492,26 +572,19 @@ def take_home_ten_safely(hand, trick, player, plays):
     return card
 
 
-def take_with_off_suit(hand, trick, player, plays):
+def take_with_off_suit(context):
     card = None
-    lead_play = plays[0] if plays else None
-    if card_counting.is_teammate_taking_trick(hand, trick, player, plays):
+    if context.is_teammate_taking_trick:
         return None
 
     # smallest to largest
     legal_offsuit = sorted(
-        [
-            card
-            for card in player.get_cards()
-            if not card.is_trump(hand.trump) and not trick.is_card_invalid_to_play(card, player, lead_play)
-        ],
+        [card for card in context.legal_plays if not card.is_trump(context.trump)],
         key=lambda c: c.rank(),
     )
-    current_winning_play = trick.find_winning_play(plays)
-    current_winning_card = Card(representation=current_winning_play.card)
 
     for taker in legal_offsuit:
-        if current_winning_card.is_less_than(taker, hand.trump) and card_counting.safe_to_play(hand, trick, player, taker, plays):
+        if context.winning_card.is_less_than(taker, context.trump) and context.safe_to_play(taker):
             card = taker
             break
     if card:
@@ -519,23 +592,19 @@ def take_with_off_suit(hand, trick, player, plays):
     return card
 
 
-def take_with_low_trump_if_game_points(hand, trick, player, plays):
+def take_with_low_trump_if_game_points(context):
     card = None
-    my_trump = player.get_trump(hand.trump, smallest_to_largest=True)
-    small_trump = [card for card in my_trump if card.value not in ("ace", "king", "queen", "jack", "10")]
+    small_trump = (context.hand_mask - TENS_AND_FACE_CARDS).trump_cards(context.trump, smallest_to_largest=True)
     if len(small_trump) < 2:
         return None
 
-    cards_played = [Card(representation=play.card) for play in plays]
-    game_points = sum(card.game_points for card in cards_played)
+    game_points = sum(card.game_points for card in context.cards_played)
     # Only take 2 or more game points
     if game_points < 2:
         return None
 
-    current_winning_play = trick.find_winning_play(plays)
-    current_winning_card = Card(representation=current_winning_play.card)
     for taker in small_trump:
-        if current_winning_card.is_less_than(taker, hand.trump):
+        if context.winning_card.is_less_than(taker, context.trump):
             card = taker
             break
     if card:
@@ -543,18 +612,13 @@ def take_with_low_trump_if_game_points(hand, trick, player, plays):
     return card
 
 
-def get_a_loser(hand, trick, player, plays):
+def get_a_loser(context):
     card = None
-    lead_play = plays[0] if plays else None
     legal_losers = sorted(
         [
             card
-            for card in player.get_cards()
-            if (
-                not card.is_trump(hand.trump)
-                and not trick.is_card_invalid_to_play(card, player, lead_play)
-                and card.value not in ("ace", "king", "queen", "jack", "10")
-            )
+            for card in context.legal_plays
+            if not card.is_trump(context.trump) and card.value not in ("ace", "king", "queen", "jack", "10")
         ],
         key=lambda c: c.rank(),
     )
@@ -565,18 +629,13 @@ def get_a_loser(hand, trick, player, plays):
     return card
 
 
-def get_least_valuable_face_card(hand, trick, player, plays):
+def get_least_valuable_face_card(context):
     card = None
-    lead_play = plays[0] if plays else None
     legal_face_cards = sorted(
         [
             card
-            for card in player.get_cards()
-            if (
-                not card.is_trump(hand.trump)
-                and not trick.is_card_invalid_to_play(card, player, lead_play)
-                and card.value in ("ace", "king", "queen", "jack")
-            )
+            for card in context.legal_plays
+            if not card.is_trump(context.trump) and card.value in ("ace", "king", "queen", "jack")
         ],
         key=lambda c: c.rank(),
     )
@@ -584,11 +643,9 @@ def get_least_valuable_face_card(hand, trick, player, plays):
 
     # However, check to see if any of the face cards could take the
     # trick currently (even if it isn't a guarantee)
-    current_winning_play = trick.find_winning_play(plays)
-    current_winning_card = Card(representation=current_winning_play.card)
     face_card_taker = None
     for taker in legal_face_cards:
-        if current_winning_card.is_less_than(taker, hand.trump):
+        if context.winning_card.is_less_than(taker, context.trump):
             face_card_taker = taker
             break
 
@@ -599,9 +656,9 @@ def get_least_valuable_face_card(hand, trick, player, plays):
     return card
 
 
-def get_least_valuable_trump(hand, trick, player, plays):
+def get_least_valuable_trump(context):
     card = None
-    my_trump = player.get_trump(hand.trump, smallest_to_largest=True)
+    my_trump = context.my_trump[::-1]
 
     # Try to skip 10s and Jacks if we can
     non_10_jack = next((card for card in my_trump if card.value not in ("10", "jack")), None)
@@ -613,11 +670,10 @@ def get_least_valuable_trump(hand, trick, player, plays):
     return card
 
 
-def get_the_least_worst_card_to_lose(hand, trick, player, plays):
+def get_the_least_worst_card_to_lose(context):
     card = None
-    lead_play = plays[0] if plays else None
     legal_cards = sorted(
-        [card for card in player.get_cards() if not trick.is_card_invalid_to_play(card, player, lead_play)],
+        context.legal_plays,
         key=lambda c: c.rank(),
     )
 
@@ -632,69 +688,70 @@ def get_the_least_worst_card_to_lose(hand, trick, player, plays):
 
 def choose_card(player, trick, current_plays_arg):
     is_bidder = trick.hand.bidder_id == player.id
-    trump = trick.hand.trump
     current_plays = current_plays_arg or []
+    context = TrickContext(player, trick, current_plays)
 
     # First player, leading the trick...
     if not current_plays:
         # Play A, K, Q of trump
-        card = get_A_K_Q_of_trump(player, trump)
+        card = get_A_K_Q_of_trump(context)
         if not card and is_bidder and len(player.cards_in_hand) == 6:
             # If bidder and I didn't have AKQ, and this is first trick, play lowest trump
-            card = get_lowest_trump(player, trump)
+            card = get_lowest_trump(context)
         if not card:
-            card = lead_jack_or_jick_if_they_are_high_trump_and_can_take_something_valuable(trick.hand, trick, player, current_plays)
+            card = lead_jack_or_jick_if_they_are_high_trump_and_can_take_something_valuable(context)
         if not card and is_bidder and len(player.cards_in_hand) == 5:
             # If bidder and this is second trick, and I didn't have AKQ, play another trump if I have one to spare
-            card = get_lowest_spare_trump_to_lead(player, trump)
+            card = get_lowest_spare_trump_to_lead(context)
         # Play A, K, Q, J of other suits
         if not card:
-            card = get_A_K_Q_J_of_off_suit(player, trump)
+            card = get_A_K_Q_J_of_off_suit(context)
         # Play low of other suit
         if not card:
-            card = get_below_10_of_off_suit(player, trump)
+            card = get_below_10_of_off_suit(context)
         # Play lowest trump
         if not card:
-            card = get_lowest_trump(player, trump)
+            card = get_lowest_trump(context)
         # Play anything (should be just 10 off suit at this point)
         if not card:
-            card = get_any_card(player, trump)
+            card = get_any_card(context)
     else:
         # Not the first player
         # Give my teammate a jack or jick, if possible
-        card = give_teammate_jack_or_jick_if_possible(trick.hand, trick, player, current_plays)
+        card = give_teammate_jack_or_jick_if_possible(context)
         # If I can take a Jack or Jick, take it
         if not card:
-            card = take_jack_or_jick_if_possible(trick.hand, trick, player, current_plays)
+            card = take_jack_or_jick_if_possible(context)
         # If there are high trump still out but I can safely take home my jack or jick, play it
         if not card:
-            card = take_jack_or_jick_if_high_cards_are_out(trick.hand, trick, player, current_plays)
+            card = take_jack_or_jick_if_high_cards_are_out(context)
         # If I can take a 10, take it
         if not card:
-            card = take_ten_if_possible(trick.hand, trick, player, current_plays)
+            card = take_ten_if_possible(context)
         # Give my teammate a 10, if possible
         if not card:
-            card = give_teammate_ten_if_possible(trick.hand, trick, player, current_plays)
+            card = give_teammate_ten_if_possible(context)
         # If I can safely take home a ten, take it
         if not card:
-            card = take_home_ten_safely(trick.hand, trick, player, current_plays)
+            card = take_home_ten_safely(context)
         # If I can take the trick with a non-trump, take it
         if not card:
-            card = take_with_off_suit(trick.hand, trick, player, current_plays)
+            card = take_with_off_suit(context)
         # If there is a face card and I have two or more low trump, take it
         if not card:
-            card = take_with_low_trump_if_game_points(trick.hand, trick, player, current_plays)
+            card = take_with_low_trump_if_game_points(context)
         # Play a loser
         if not card:
-            card = get_a_loser(trick.hand, trick, player, current_plays)
+            card = get_a_loser(context)
         # Play a face card to save trump and 10s
         if not card:
-            card = get_least_valuable_face_card(trick.hand, trick, player, current_plays)
+            card = get_least_valuable_face_card(context)
         # Play lowest trump
         if not card:
-            card = get_least_valuable_trump(trick.hand, trick, player, current_plays)
+            card = get_least_valuable_trump(context)
         # At this point we likely only have 10s left
         if not card:
-            card = get_the_least_worst_card_to_lose(trick.hand, trick, player, current_plays)
+            card = get_the_least_worst_card_to_lose(context)
+        LOG.debug(f"choose_card {card} for {player}: {context.cache}")
 
     return card
@@ -0,0 +1,131 @@
+"""Random deals of the unseen cards that are consistent with what is known
+
+A player only knows their own cards and the cards that have been played.
+DealSampler deals everything else to the other players at random, so that
+sampling-based logic can play out or score many possible deals.
+
+Every deal respects each player's hand size and the cards they could hold
+(see HandKnowledge.possible_cards, which covers cards played, suits
+players are known to be out of and high and low). Cards that nobody can
+hold stay in the deck. There is no rejection loop: cards are grouped into
+classes by which players could hold them, and each card is only given out
+if the rest of the deal can still be completed (Hall's condition over the
+classes), so every draw succeeds.
+
+Deals are produced as NumPy arrays in the format of apps.smear.card_arrays,
+an (N, num_players, hand_size) array of card ids padded with EMPTY.
+"""
+import numpy as np
+
+from apps.smear.card_arrays import CARD_DTYPE, EMPTY
+from apps.smear.cards import CARDS, NUM_CARDS
+from apps.smear.hand_mask import iter_card_ids
+
+CARDS_PER_PLAYER = 6
+
+
+class DealSampler:
+    """Deals the unseen cards to player_ids
+
+    hand_sizes and possible_masks are lists in the same order as player_ids,
+    with the number of cards each player still holds and a HandMask integer
+    of the cards each player could be holding.
+    """
+
+    def __init__(self, player_ids, hand_sizes, possible_masks, seed=None):
+        self.player_ids = list(player_ids)
+        self.hand_sizes = np.array(hand_sizes, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+
+        # Group the cards by which players could hold them
+        classes = {}
+        for card_id in iter_card_ids(_union(possible_masks)):
+            signature = tuple(bool(mask >> card_id & 1) for mask in possible_masks)
+            classes.setdefault(signature, []).append(card_id)
+        signatures = list(classes)
+        self.class_cards = [np.array(classes[signature], dtype=CARD_DTYPE) for signature in signatures]
+        self.class_sizes = np.array([len(cards) for cards in self.class_cards], dtype=np.int64)
+        # allowed[player, class] is True if the player could hold cards of the class
+        self.allowed = np.array(signatures, dtype=bool).T.reshape(len(self.player_ids), len(signatures))
+
+        # For every set of classes, which players can only hold cards from that set
+        num_classes = len(signatures)
+        class_sets = np.arange(1 << num_classes)
+        self.in_set = (class_sets[:, None] >> np.arange(num_classes)) & 1
+        player_classes = (self.allowed * (1 << np.arange(num_classes))).sum(axis=1)
+        self.confined = (player_classes[None, :] & ~class_sets[:, None]) == 0
+        if np.any(self._slack(self.class_sizes[None, :], self.hand_sizes[None, :]) < 0):
+            raise ValueError("No deal is consistent with the known cards")
+
+        # Deal to the most constrained players first
+        self.order = sorted(range(len(self.player_ids)), key=lambda p: self.allowed[p] @ self.class_sizes)
+
+    @classmethod
+    def for_player(cls, hand, player, seed=None):
+        """A sampler for the cards held by everyone else in hand, as far as player knows"""
+        knowledge = hand.knowledge
+        player_ids = [player_id for player_id in hand.game.seat_ring.player_ids if player_id != player.id]
+        hand_sizes = [CARDS_PER_PLAYER - knowledge.played_by.get(player_id, 0).bit_count() for player_id in player_ids]
+        possible_masks = [knowledge.possible_cards(player_id, observer=player) for player_id in player_ids]
+        return cls(player_ids, hand_sizes, possible_masks, seed=seed)
+
+    def _slack(self, class_sizes, hand_sizes):
+        # For every set of classes, the cards left in it minus the cards needed by players confined to it
+        return class_sizes @ self.in_set.T - hand_sizes @ self.confined.T
+
+    def sample(self, count):
+        """Returns count deals as an array of shape (count, len(player_ids), max hand size)"""
+        class_sizes = np.repeat(self.class_sizes[None, :], count, axis=0)
+        hand_sizes = np.repeat(self.hand_sizes[None, :], count, axis=0)
+        dealt = np.zeros((count, len(self.player_ids), len(self.class_cards)), dtype=np.int64)
+
+        # First decide how many cards of each class every player gets
+        for player in self.order:
+            for _ in range(self.hand_sizes[player]):
+                slack = self._slack(class_sizes, hand_sizes)
+                weights = np.zeros(class_sizes.shape)
+                for card_class in np.flatnonzero(self.allowed[player]):
+                    # Taking a card of this class must leave enough cards for everyone else
+                    needed = self.in_set[:, card_class] - self.confined[:, player]
+                    can_take = np.all(slack >= needed, axis=1)
+                    weights[:, card_class] = class_sizes[:, card_class] * can_take
+                cumulative = weights.cumsum(axis=1)
+                choice = self.rng.random(count) * cumulative[:, -1]
+                card_class = (cumulative <= choice[:, None]).sum(axis=1)
+                rows = np.arange(count)
+                class_sizes[rows, card_class] -= 1
+                hand_sizes[:, player] -= 1
+                dealt[rows, player, card_class] += 1
+
+        # Then shuffle the cards of each class and hand them out in those amounts
+        owner = np.full((count, NUM_CARDS), EMPTY, dtype=np.int64)
+        rows = np.arange(count)[:, None]
+        for card_class, cards in enumerate(self.class_cards):
+            shuffled = cards[np.argsort(self.rng.random((count, len(cards))), axis=1)]
+            ends = dealt[:, :, card_class].cumsum(axis=1)
+            positions = np.arange(len(cards))
+            receiver = (positions[None, :, None] >= ends[:, None, :]).sum(axis=2)
+            owner[rows, shuffled] = np.where(receiver < len(self.player_ids), receiver, EMPTY)
+
+        hands = np.full((count, len(self.player_ids), max(self.hand_sizes, default=0)), EMPTY, dtype=CARD_DTYPE)
+        for player, hand_size in enumerate(self.hand_sizes):
+            # Card ids owned by the player sort to the front
+            hands[:, player, :hand_size] = np.argsort(owner != player, axis=1, kind="stable")[:, :hand_size]
+        return hands
+
+    def deals(self, count):
+        """Returns count deals, each a dict of player id to a list of Cards"""
+        return [
+            {
+                player_id: [CARDS[card_id] for card_id in hand if card_id != EMPTY]
+                for player_id, hand in zip(self.player_ids, deal)
+            }
+            for deal in self.sample(count).tolist()
+        ]
+
+
+def _union(masks):
+    union = 0
+    for mask in masks:
+        union |= mask
+    return union
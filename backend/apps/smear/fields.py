@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils.functional import cached_property
+
+from apps.smear.cards import CARD_REPRESENTATION, card_id_from_representation
+
+
+class CardField(models.SmallIntegerField):
+    """A card, stored as its card id but used as its two character representation
+
+    Filtering, creating and reading rows all use the representation (e.g.
+    "AS"), only the database column holds the smallint card id.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else CARD_REPRESENTATION[value]
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return CARD_REPRESENTATION[value]
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return card_id_from_representation(value)
+        return int(value)
+
+    @cached_property
+    def validators(self):
+        # The range validators of SmallIntegerField don't apply to representations
+        return [*self.default_validators, *self._validators]
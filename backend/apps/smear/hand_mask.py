@@ -0,0 +1,197 @@
+"""Bitmask representation of a set of cards
+
+A HandMask is a 52 bit integer with bit card_id set for every card in the
+set (see the integer card encoding in apps.smear.cards). Questions like
+"my trump", "cards that follow the lead suit" or "cards of a suit still
+out" become a single AND against one of the precomputed masks below, and
+counting is a popcount.
+"""
+from apps.smear.cards import (
+    BEATS,
+    CARD_IDS,
+    CARD_SUIT_INDEX,
+    CARD_VALUE_INDEX,
+    CARDS,
+    EFFECTIVE_SUIT_INDEX,
+    IS_TRUMP,
+    NUM_CARDS,
+    SUITS,
+    TRUMP_INDEXES,
+    TRUMP_RANK,
+    VALUES,
+    card_id_from_representation,
+    trump_index,
+)
+
+FULL_MASK = (1 << NUM_CARDS) - 1
+CARD_MASKS = [1 << card_id for card_id in CARD_IDS]
+
+
+def _mask_of(card_ids):
+    mask = 0
+    for card_id in card_ids:
+        mask |= CARD_MASKS[card_id]
+    return mask
+
+
+# Cards by printed suit, indexed by suit index
+SUIT_MASKS = [_mask_of(c for c in CARD_IDS if CARD_SUIT_INDEX[c] == suit) for suit in range(len(SUITS))]
+# Cards by value, indexed by value index (e.g. VALUE_MASKS[VALUES.index("jack")] is all four jacks)
+VALUE_MASKS = [_mask_of(c for c in CARD_IDS if CARD_VALUE_INDEX[c] == value) for value in range(len(VALUES))]
+# Trump cards, including the jick, indexed by trump_index
+TRUMP_MASKS = [_mask_of(c for c in CARD_IDS if IS_TRUMP[trump][c]) for trump in TRUMP_INDEXES]
+# Cards that count as a suit once trump is known (the jick moves to trump), indexed by [trump_index][suit]
+EFFECTIVE_SUIT_MASKS = [
+    [_mask_of(c for c in CARD_IDS if EFFECTIVE_SUIT_INDEX[trump][c] == suit) for suit in range(len(SUITS))]
+    for trump in TRUMP_INDEXES
+]
+# Trump card ids ordered from highest to lowest, indexed by trump_index
+TRUMP_ORDER = [
+    sorted((c for c in CARD_IDS if IS_TRUMP[trump][c]), key=lambda c, trump=trump: TRUMP_RANK[trump][c], reverse=True)
+    for trump in TRUMP_INDEXES
+]
+
+# Cards that take a trick from card_id when it is winning, indexed by [trump_index][card_id]
+BEATEN_BY_MASKS = [
+    [_mask_of(c for c in CARD_IDS if BEATS[trump][card_id][c]) for card_id in CARD_IDS] for trump in TRUMP_INDEXES
+]
+
+
+def value_mask(*values):
+    return _mask_of(c for c in CARD_IDS if VALUES[CARD_VALUE_INDEX[c]] in values)
+
+
+def iter_card_ids(mask):
+    """Yields the card ids in mask, lowest id first"""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class HandMask:
+    """An immutable set of cards stored as a 52 bit integer"""
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask=0):
+        object.__setattr__(self, "mask", mask)
+
+    @classmethod
+    def from_reps(cls, representations):
+        return cls(_mask_of(card_id_from_representation(rep) for rep in representations))
+
+    @classmethod
+    def from_cards(cls, cards):
+        return cls(_mask_of(card.id for card in cards))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HandMask is immutable")
+
+    def __repr__(self):
+        return f"HandMask({self.reps()})"
+
+    def __eq__(self, other):
+        return isinstance(other, HandMask) and self.mask == other.mask
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __iter__(self):
+        return iter_card_ids(self.mask)
+
+    def __contains__(self, card):
+        card_id = card if isinstance(card, int) else card.id
+        return bool(self.mask & CARD_MASKS[card_id])
+
+    def __and__(self, other):
+        return HandMask(self.mask & _as_int(other))
+
+    def __or__(self, other):
+        return HandMask(self.mask | _as_int(other))
+
+    def __sub__(self, other):
+        return HandMask(self.mask & ~_as_int(other))
+
+    def __invert__(self):
+        return HandMask(FULL_MASK & ~self.mask)
+
+    def cards(self):
+        return [CARDS[card_id] for card_id in iter_card_ids(self.mask)]
+
+    def reps(self):
+        return [card.representation for card in self.cards()]
+
+    def trump(self, trump):
+        """Trump cards in this set, including the jick"""
+        return HandMask(self.mask & TRUMP_MASKS[trump_index(trump)])
+
+    def non_trump(self, trump):
+        return HandMask(self.mask & ~TRUMP_MASKS[trump_index(trump)])
+
+    def suit(self, suit, trump=None):
+        """Cards in this set that follow suit
+
+        When trump is given the jick is considered trump rather than part of
+        its printed suit, the same way Card.same_suit() treats it.
+        """
+        index = SUITS.index(suit)
+        suit_mask = EFFECTIVE_SUIT_MASKS[trump_index(trump)][index] if trump else SUIT_MASKS[index]
+        return HandMask(self.mask & suit_mask)
+
+    def trump_cards(self, trump, smallest_to_largest=False):
+        """Returns the trump cards as Cards, ordered by trump rank (highest first by default)"""
+        mask = self.mask
+        ordered = [CARDS[card_id] for card_id in TRUMP_ORDER[trump_index(trump)] if mask & CARD_MASKS[card_id]]
+        if smallest_to_largest:
+            ordered.reverse()
+        return ordered
+
+
+def _as_int(other):
+    return other.mask if isinstance(other, HandMask) else other
+
+
+def legal_mask(hand, lead_card, trump):
+    """Returns the HandMask of cards in hand that can legally be played
+
+    If trump was lead, trump must be played if able. For other lead suits
+    the player must either follow suit (if able, the jick doesn't count as
+    its printed suit) or play trump.
+    """
+    if lead_card is None:
+        return hand
+    index = trump_index(trump)
+    following = hand.mask & EFFECTIVE_SUIT_MASKS[index][EFFECTIVE_SUIT_INDEX[index][lead_card.id]]
+    if not following:
+        return hand
+    return HandMask(following | (hand.mask & TRUMP_MASKS[index]))
+
+
+def legal_moves(hand_cards, lead_card, trump):
+    """Returns the cards from hand_cards that can legally be played, in the same order"""
+    legal = legal_mask(HandMask.from_cards(hand_cards), lead_card, trump).mask
+    return [card for card in hand_cards if legal & CARD_MASKS[card.id]]
+
+
+# Suits players are known to be out of, packed into one integer with a bit
+# for every (seat, suit): bit seat * len(SUITS) + suit index
+MAX_SEATS = 8
+SEAT_VOIDS_MASK = (1 << len(SUITS)) - 1
+# Every seat out of a suit, indexed by suit index
+ALL_SEATS_VOID_MASKS = [sum(1 << (seat * len(SUITS) + suit) for seat in range(MAX_SEATS)) for suit in range(len(SUITS))]
+
+
+def void_bit(seat, suit_index):
+    return 1 << (seat * len(SUITS) + suit_index)
+
+
+def seat_voids(voids, seat):
+    """Returns the suits seat is out of from a packed voids integer, as a bitmask of suit indexes"""
+    return voids >> (seat * len(SUITS)) & SEAT_VOIDS_MASK
@@ -0,0 +1,128 @@
+"""Request-scoped identity map for Player, Team and Hand instances
+
+While a request is handled (see IdentityMapMiddleware), there is at most
+one instance of each (model, pk). Foreign keys declared with
+IdentityMapForeignKey resolve through the map, so trick.active_player,
+play.player, hand.bidder, player.team and so on share one instance of the
+row (and one query) instead of each lazily loading its own copy.
+
+Loading a row again with a queryset returns that same instance, updated
+with the values just loaded, so changes made through one reference are
+never hidden behind a stale copy held by another. Fields with unsaved edits
+(compared to the values last loaded or saved) keep the edit, so a reload
+doesn't silently drop them either. refresh_from_db() still discards them.
+"""
+import copy
+from contextlib import contextmanager
+from threading import local
+
+from django.db import models
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+
+localstore = local()
+
+
+@contextmanager
+def identity_map():
+    previous = getattr(localstore, "instances", None)
+    localstore.instances = {}
+    try:
+        yield localstore.instances
+    finally:
+        localstore.instances = previous
+
+
+def lookup(model, pk):
+    instances = getattr(localstore, "instances", None)
+    if instances is None or pk is None:
+        return None
+    return instances.get((model, pk))
+
+
+def remember(instance):
+    """Adds instance to the identity map, if one is active and it doesn't already have the row"""
+    instances = getattr(localstore, "instances", None)
+    if instances is not None and instance is not None and instance.pk is not None:
+        instances.setdefault((type(instance), instance.pk), instance)
+    return instance
+
+
+class IdentityMapMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_map():
+            return self.get_response(request)
+
+
+def _loaded_value(value):
+    # Lists and dicts (cards_in_hand, game_points_by_player, ...) are edited in place, so compare against a copy
+    return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+
+class IdentityMapModel:
+    """Mixin for models whose instances are shared through the identity map"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        loaded = super().from_db(db, field_names, values)
+        existing = lookup(cls, loaded.pk)
+        if existing is None:
+            loaded._set_loaded_values()
+            return remember(loaded)
+        # Update the instance already in use with the values just loaded, unless it has unsaved edits
+        deferred_fields = loaded.get_deferred_fields()
+        pending_fields = existing.get_pending_fields()
+        attnames = [
+            field.attname
+            for field in cls._meta.concrete_fields
+            if field.attname not in deferred_fields and field.attname not in pending_fields
+        ]
+        for attname in attnames:
+            setattr(existing, attname, getattr(loaded, attname))
+        existing._set_loaded_values(attnames)
+        existing._state.db = db
+        return existing
+
+    def _set_loaded_values(self, attnames=None):
+        if attnames is None:
+            deferred_fields = self.get_deferred_fields()
+            attnames = [field.attname for field in self._meta.concrete_fields if field.attname not in deferred_fields]
+        loaded_values = self.__dict__.setdefault("_loaded_values", {})
+        for attname in attnames:
+            loaded_values[attname] = _loaded_value(getattr(self, attname))
+
+    def get_pending_fields(self):
+        """Returns the attnames of fields edited since they were last loaded or saved"""
+        loaded_values = self.__dict__.get("_loaded_values", {})
+        return {attname for attname, value in loaded_values.items() if getattr(self, attname) != value}
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Reloading on purpose discards unsaved edits to the fields being reloaded
+        loaded_values = self.__dict__.get("_loaded_values", {})
+        for attname in list(loaded_values) if fields is None else fields:
+            loaded_values.pop(attname, None)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        self._set_loaded_values(
+            None if update_fields is None else [self._meta.get_field(name).attname for name in update_fields]
+        )
+        remember(self)
+
+
+class IdentityMapForwardDescriptor(ForwardManyToOneDescriptor):
+    def get_object(self, instance):
+        related = lookup(self.field.related_model, getattr(instance, self.field.attname))
+        if related is None:
+            related = remember(super().get_object(instance))
+        return related
+
+
+class IdentityMapForeignKey(models.ForeignKey):
+    """A ForeignKey that resolves through the identity map, when one is active"""
+
+    forward_related_accessor_class = IdentityMapForwardDescriptor
@@ -0,0 +1,42 @@
+import logging
+import os
+
+from django.core.management.base import BaseCommand
+
+from apps.smear.bid_arrays import estimate_bid_ties
+from apps.smear.bid_book import MAX_PLAYERS, MIN_PLAYERS, build_bids, canonical_bidding_keys, write_bid_book
+
+LOG = logging.getLogger(__name__)
+
+
+# Call from CLI via: $ python manage.py build_bid_book bid_book.bin
+# and point BID_BOOK_PATH at the file
+class Command(BaseCommand):
+    help = "Computes the computer bid for every canonical 6-card hand and writes a bid book"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--num-players",
+            type=int,
+            nargs="+",
+            choices=range(MIN_PLAYERS, MAX_PLAYERS + 1),
+            default=list(range(MIN_PLAYERS, MAX_PLAYERS + 1)),
+        )
+        parser.add_argument("--limit", type=int, help="Only evaluate the first LIMIT hands, the rest are calculated")
+
+    def handle(self, *args, **options):
+        keys = canonical_bidding_keys()
+        if options["limit"] is not None:
+            keys = keys[: options["limit"]]
+        LOG.info(f"Evaluating {len(keys)} hands for {options['num_players']} players")
+
+        bids = build_bids(
+            keys, options["num_players"], estimate_bid_ties, progress=lambda count: LOG.info(f"Evaluated {count} hands")
+        )
+
+        # Write to a temporary file first, so a worker never maps a half written book
+        tmp_path = f"{options['path']}.tmp"
+        write_bid_book(tmp_path, keys, bids)
+        os.replace(tmp_path, options["path"])
+        LOG.info(f"Wrote bid book for {len(keys)} hands to {options['path']}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smear', '0044_game_player_ids_in_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hand',
+            name='deck_seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
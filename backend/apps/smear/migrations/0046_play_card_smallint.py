@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:05
+
+import apps.smear.fields
+from django.db import migrations, models
+
+# card_id = suit_index * 13 + value_index, see apps.smear.cards
+REPRESENTATION_TO_CARD_ID_SQL = """
+UPDATE smear_play SET card_number =
+    (position(substr(card, 2, 1) in 'SHCD') - 1) * 13 + (position(substr(card, 1, 1) in '234567890JQKA') - 1)
+"""
+CARD_ID_TO_REPRESENTATION_SQL = """
+UPDATE smear_play SET card =
+    substr('234567890JQKA', card_number % 13 + 1, 1) || substr('SHCD', card_number / 13 + 1, 1)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smear', '0045_hand_deck_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='play',
+            name='card_number',
+            field=apps.smear.fields.CardField(null=True),
+        ),
+        # Allow nulls while both columns exist, so this can be reversed
+        migrations.AlterField(
+            model_name='play',
+            name='card',
+            field=models.CharField(max_length=2, null=True),
+        ),
+        migrations.RunSQL(REPRESENTATION_TO_CARD_ID_SQL, reverse_sql=CARD_ID_TO_REPRESENTATION_SQL),
+        migrations.RemoveField(
+            model_name='play',
+            name='card',
+        ),
+        migrations.RenameField(
+            model_name='play',
+            old_name='card_number',
+            new_name='card',
+        ),
+        migrations.AlterField(
+            model_name='play',
+            name='card',
+            field=apps.smear.fields.CardField(),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:41
+
+import apps.smear.identity_map
+import django.db.models.deletion
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smear', '0046_play_card_smallint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bid',
+            name='hand',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='smear.hand'),
+        ),
+        migrations.AlterField(
+            model_name='bid',
+            name='player',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bids', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='next_dealer',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_next_dealer', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='bidder',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hands_was_bidder', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='dealer',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='winner_game',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_winner_game', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='winner_high',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_winner_high', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='winner_jack',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_winner_jack', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='winner_jick',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_winner_jick', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='hand',
+            name='winner_low',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_winner_low', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='play',
+            name='player',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='plays', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='player',
+            name='team',
+            field=apps.smear.identity_map.IdentityMapForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='members', to='smear.team'),
+        ),
+        migrations.AlterField(
+            model_name='trick',
+            name='active_player',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tricks_playing', to='smear.player'),
+        ),
+        migrations.AlterField(
+            model_name='trick',
+            name='hand',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tricks', to='smear.hand'),
+        ),
+        migrations.AlterField(
+            model_name='trick',
+            name='taker',
+            field=apps.smear.identity_map.IdentityMapForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tricks_taken', to='smear.player'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+SUITS = ['spades', 'hearts', 'clubs', 'diamonds']
+
+
+class Migration(migrations.Migration):
+
+    def forwards_func(apps, schema_editor):
+        Hand = apps.get_model("smear", "Hand")
+        Player = apps.get_model("smear", "Player")
+
+        for hand in Hand.objects.exclude(players_out_of_suits={}):
+            seats = dict(Player.objects.filter(game_id=hand.game_id).values_list("id", "seat"))
+            for suit, player_ids in hand.players_out_of_suits.items():
+                for player_id in player_ids:
+                    seat = seats.get(int(player_id))
+                    if suit in SUITS and seat is not None:
+                        hand.suit_voids |= 1 << (seat * len(SUITS) + SUITS.index(suit))
+            hand.save()
+
+    def reverse_func(apps, schema_editor):
+        Hand = apps.get_model("smear", "Hand")
+        Player = apps.get_model("smear", "Player")
+
+        for hand in Hand.objects.exclude(suit_voids=0):
+            players_out_of_suits = {}
+            for player_id, seat in Player.objects.filter(game_id=hand.game_id).values_list("id", "seat"):
+                for index, suit in enumerate(SUITS):
+                    if seat is not None and hand.suit_voids >> (seat * len(SUITS) + index) & 1:
+                        players_out_of_suits.setdefault(suit, []).append(str(player_id))
+            hand.players_out_of_suits = players_out_of_suits
+            hand.save()
+
+    dependencies = [
+        ('smear', '0047_identity_map_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hand',
+            name='suit_voids',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(forwards_func, reverse_func),
+        migrations.RemoveField(
+            model_name='hand',
+            name='players_out_of_suits',
+        ),
+    ]
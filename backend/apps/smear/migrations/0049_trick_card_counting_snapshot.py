@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:49
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smear', '0048_hand_suit_voids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trick',
+            name='game_points_by_seat',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='trick',
+            name='played_by_seat',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='trick',
+            name='played_mask',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trick',
+            name='void_masks_by_seat',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None),
+        ),
+    ]
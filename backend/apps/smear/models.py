@@ -8,7 +8,11 @@ from django.db.models import F
 from django.utils.functional import cached_property
 from rest_framework.exceptions import ValidationError
 
-from apps.smear.cards import SUIT_CHOICES, Card, Deck
+from apps.smear.cards import SUIT_CHOICES, SUIT_INDEX, SUITS, Card, Deck, resolve_trick, winning_index
+from apps.smear.fields import CardField
+from apps.smear.hand_mask import ALL_SEATS_VOID_MASKS, HandMask, legal_mask, legal_moves, seat_voids, void_bit
+from apps.smear.identity_map import IdentityMapForeignKey, IdentityMapModel
+from apps.smear.seat_ring import SeatRing
 
 LOG = logging.getLogger(__name__)
 
@@ -29,7 +33,7 @@ class Game(models.Model):
     players = models.ManyToManyField("auth.User", through="Player")
     player_ids_in_order = ArrayField(models.IntegerField(), default=list)
     state = models.CharField(max_length=1024, blank=True, default="")
-    next_dealer = models.ForeignKey(
+    next_dealer = IdentityMapForeignKey(
         "Player", related_name="games_next_dealer", on_delete=models.SET_NULL, null=True, blank=True
     )
     # {
@@ -83,18 +87,15 @@ class Game(models.Model):
         scores = self.scores_by_contestant[contestant_id]
         scores[-1] = scores[-1] + score_delta
 
+    @cached_property
+    def seat_ring(self):
+        return SeatRing(self)
+
     def next_player(self, player):
-        player_id = self.next_player_id(player.id)
-        return Player.objects.get(id=player_id)
+        return self.seat_ring.next_player(player.id)
 
     def next_player_id(self, current_id):
-        for idx, player_id in enumerate(self.player_ids_in_order):
-            if player_id == current_id:
-                if idx + 1 == len(self.player_ids_in_order):
-                    return self.player_ids_in_order[0]
-                else:
-                    return self.player_ids_in_order[idx+1]
-        return None
+        return self.seat_ring.next_id(current_id)
 
     def create_initial_teams(self):
         teams = []
@@ -198,6 +199,8 @@ class Game(models.Model):
             prev_player = player
         Player.objects.bulk_update(players, ["plays_after"])
         self.save()
+        # The seat order has changed, rebuild the seat ring when it is next needed
+        self.__dict__.pop("seat_ring", None)
         return players[0]
 
     def advance_game(self):
@@ -238,7 +241,7 @@ class Game(models.Model):
         }
 
 
-class Team(models.Model):
+class Team(IdentityMapModel, models.Model):
     COLORS = ["blue", "orange", "plum", "sienna", "khaki", "linen", "cyan", "green"]
     game = models.ForeignKey(Game, related_name="teams", on_delete=models.CASCADE)
     name = models.CharField(max_length=1024)
@@ -250,7 +253,7 @@ class Team(models.Model):
         return f"{self.name} ({self.id})"
 
 
-class Player(models.Model):
+class Player(IdentityMapModel, models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -261,7 +264,7 @@ class Player(models.Model):
 
     is_computer = models.BooleanField(blank=True, default=False)
     name = models.CharField(max_length=1024)
-    team = models.ForeignKey(Team, related_name="members", on_delete=models.CASCADE, null=True, blank=True)
+    team = IdentityMapForeignKey(Team, related_name="members", on_delete=models.CASCADE, null=True, blank=True)
     seat = models.IntegerField(blank=True, null=True)
     plays_after = models.OneToOneField(
         "smear.Player", related_name="plays_before", on_delete=models.SET_NULL, null=True, blank=True
@@ -305,15 +308,15 @@ class Player(models.Model):
         representations = [card.to_representation() for card in cards]
         self.cards_in_hand.extend(representations)
 
+    @property
+    def hand_mask(self):
+        return HandMask.from_reps(self.cards_in_hand)
+
     def get_cards(self):
-        return [Card(representation=rep) for rep in self.cards_in_hand]
+        return [Card.from_rep(rep) for rep in self.cards_in_hand]
 
     def get_trump(self, trump, smallest_to_largest=False):
-        all_cards = [Card(representation=rep) for rep in self.cards_in_hand]
-        trump_cards = [card for card in all_cards if card.is_trump(trump)]
-        reverse = not smallest_to_largest
-        ordered_cards = sorted(trump_cards, key=lambda c: c.trump_rank(trump), reverse=reverse)
-        return ordered_cards
+        return self.hand_mask.trump_cards(trump, smallest_to_largest=smallest_to_largest)
 
     def create_bid(self, hand):
         # avoid circular imports
@@ -338,31 +341,28 @@ class Player(models.Model):
         self.save()
 
     def increment_score(self):
-        if self.team:
-            self.team.score = F("score") + 1
-            self.team.save()
-        else:
-            self.score = F("score") + 1
-            self.save()
+        self._add_to_score(1)
 
     def decrement_score(self, amount):
-        if self.team:
-            self.team.score = F("score") - amount
-            self.team.save()
-        else:
-            self.score = F("score") - amount
-            self.save()
+        self._add_to_score(-amount)
 
+    def _add_to_score(self, amount):
+        # Update the score in the database without saving the whole contestant,
+        # and keep the instance's score a number so a later save() doesn't apply it again
+        contestant = self.team if self.team else self
+        type(contestant).objects.filter(id=contestant.id).update(score=F("score") + amount)
+        contestant.score += amount
 
-class Hand(models.Model):
+
+class Hand(IdentityMapModel, models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     # num is the number hand in the game, starting at 1
     num = models.IntegerField()
 
     game = models.ForeignKey(Game, related_name="hands", on_delete=models.CASCADE, null=True)
-    dealer = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True)
-    bidder = models.ForeignKey(
+    dealer = IdentityMapForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True)
+    bidder = IdentityMapForeignKey(
         Player, related_name="hands_was_bidder", on_delete=models.SET_NULL, null=True, blank=True
     )
     high_bid = models.OneToOneField(
@@ -371,30 +371,25 @@ class Hand(models.Model):
     trump = models.CharField(max_length=16, blank=True, default="", choices=SUIT_CHOICES)
 
     # Used by card-counting logic. jicks are included in the trump suit
-    # The values in the list are the string of the player.id
-    # {
-    #   "spades": ["123", "533", "1"],
-    #   "clubs": ["123"],
-    #   "diamonds": [],
-    #   "hearts": ["32"],
-    # }
-    players_out_of_suits = models.JSONField(default=dict)
+    # Bit seat * 4 + suit index is set when the player in seat is out of suit,
+    # see is_out_of_suit() and hand_mask.void_bit()
+    suit_voids = models.BigIntegerField(default=0)
 
     # These values are updated as players win the cards, but game is
     # awarded at the end of the game
-    winner_high = models.ForeignKey(
+    winner_high = IdentityMapForeignKey(
         Player, related_name="games_winner_high", on_delete=models.SET_NULL, null=True, blank=True
     )
-    winner_low = models.ForeignKey(
+    winner_low = IdentityMapForeignKey(
         Player, related_name="games_winner_low", on_delete=models.SET_NULL, null=True, blank=True
     )
-    winner_jack = models.ForeignKey(
+    winner_jack = IdentityMapForeignKey(
         Player, related_name="games_winner_jack", on_delete=models.SET_NULL, null=True, blank=True
     )
-    winner_jick = models.ForeignKey(
+    winner_jick = IdentityMapForeignKey(
         Player, related_name="games_winner_jick", on_delete=models.SET_NULL, null=True, blank=True
     )
-    winner_game = models.ForeignKey(
+    winner_game = IdentityMapForeignKey(
         Player, related_name="games_winner_game", on_delete=models.SET_NULL, null=True, blank=True
     )
 
@@ -411,6 +406,9 @@ class Hand(models.Model):
 
     finished = models.BooleanField(blank=True, default=False)
 
+    # Seed of the Deck used to deal this hand, so the deal can be reproduced
+    deck_seed = models.BigIntegerField(blank=True, null=True)
+
     class Meta:
         ordering = ["num"]
         unique_together = (("game", "num"),)
@@ -422,6 +420,24 @@ class Hand(models.Model):
     def current_trick(self):
         return self.tricks.last()
 
+    @cached_property
+    def knowledge(self):
+        """Card counting information for this hand, see HandKnowledge"""
+        # avoid circular imports
+        from apps.smear.card_counting import HandKnowledge
+
+        return HandKnowledge.for_hand(self)
+
+    def record_play(self, card, player, lead_card):
+        # If knowledge hasn't been loaded yet it will include this play when it is
+        if "knowledge" in self.__dict__:
+            self.knowledge.record_play(card, player.id, lead_card)
+
+    def record_trick_taken(self, taker, game_points):
+        # Once the trick is saved with its taker, knowledge loaded later includes it
+        if "knowledge" in self.__dict__:
+            self.knowledge.record_trick_taken(taker.id, game_points)
+
     def start_hand(self, dealer):
         LOG.info(f"Starting hand {self.num} with dealer: {dealer}")
         # Set the dealer
@@ -430,18 +446,42 @@ class Hand(models.Model):
 
         # Deal out six cards
         deck = Deck()
-        players = self.game.player_set.all()
+        self.deck_seed = deck.seed
+        players = list(self.game.player_set.order_by("seat", "id"))
         for player in players:
             player.reset_for_new_hand()
-            player.accept_dealt_cards(deck.deal(3))
-        for player in players:
-            player.accept_dealt_cards(deck.deal(3))
+        self.deal(deck, players)
         for player in players:
             LOG.info(f"{player} starts hand {self.num} with {player.cards_in_hand}")
         Player.objects.bulk_update(players, ["cards_in_hand", "is_computer", "auto_pilot_mode"])
 
         self.save()
 
+    @staticmethod
+    def deal(deck, players):
+        # Three cards to each player, twice
+        for player in players:
+            player.accept_dealt_cards(deck.deal(3))
+        for player in players:
+            player.accept_dealt_cards(deck.deal(3))
+
+    def redeal(self):
+        """Recreates the cards each player was dealt at the start of this hand
+
+        Returns a dict of player id to the list of card representations dealt
+        """
+        if self.deck_seed is None:
+            raise ValueError(f"Unable to redeal hand {self.id}, it has no deck seed")
+        # Deal into plain lists, the players' instances hold the cards they have now
+        player_ids = list(self.game.player_set.order_by("seat", "id").values_list("id", flat=True))
+        dealt = {player_id: [] for player_id in player_ids}
+        deck = Deck(seed=self.deck_seed)
+        # Three cards to each player, twice, like deal()
+        for _ in range(2):
+            for player_id in player_ids:
+                dealt[player_id].extend(card.to_representation() for card in deck.deal(3))
+        return dealt
+
     def add_bid_to_hand(self, new_bid):
         if self.high_bid and new_bid.bid <= self.high_bid.bid and new_bid.bid != 0:
             # User bid the same as the current bid, invalid
@@ -650,13 +690,12 @@ class Hand(models.Model):
 
         if game_is_over:
             if bidding_contestant in contestants_at_or_over:
-                # Bidder always goes out
-                bidding_contestant.refresh_from_db()
+                # Bidder always goes out, use the copy just loaded with the latest score
+                bidding_contestant = contestants_at_or_over[contestants_at_or_over.index(bidding_contestant)]
                 high_score = bidding_contestant.score
                 winners = [bidding_contestant]
             else:
                 high_scorer = max(contestants_at_or_over, key=lambda c: c.score)
-                high_scorer.refresh_from_db()
                 high_score = high_scorer.score
                 # Accounting for the unlikely scenario of a tie
                 winners = [contestant for contestant in contestants_at_or_over if contestant.score == high_score]
@@ -694,19 +733,12 @@ class Hand(models.Model):
         )
         return bid_won, teammate_ids
 
-    def _refresh_all_scores(self):
-        contestants = self.game.teams.all() if self.game.num_teams != 0 else self.game.player_set.all()
-        for contestant in contestants:
-            contestant.refresh_from_db(fields=["score"])
-
     def _finalize_hand(self, no_bid=False):
         if no_bid:
             LOG.info("No bids, dealer is set 2")
             self.dealer.decrement_score(2)
             self.game.add_to_contestants_current_hand_score(self.bidder.contestant_id, -2)
             self.finished = True
-            # TODO: is this call necessary?
-            self._refresh_all_scores()
             return False
 
         self.award_game()
@@ -743,20 +775,16 @@ class Hand(models.Model):
 
         self.game.save()
 
-        # Refresh the scores of all contestants to get the latest loaded from DB
-        # TODO is this call necessary?
-        self._refresh_all_scores()
-
         return self._declare_winner_if_game_is_over(bid_won)
 
     def update_if_out_of_cards(self, player, card_played, lead_play, all_plays):
-        all_cards_played = [Card(representation=play.card) for play in all_plays]
+        all_cards_played = [play.card_obj for play in all_plays]
 
         suit_played = self.trump if card_played.is_trump(self.trump) else card_played.suit
         if card_played.is_trump(self.trump):
-            if len([card for card in all_cards_played if card.is_trump(self.trump)]) == 14:
+            if resolve_trick(all_cards_played, self.trump).trump_count == 14:
                 # If all trump have been played, everyone is out
-                self.players_out_of_suits[suit_played] = [str(p.id) for p in self.game.players.all()]
+                self.mark_everyone_out_of_suit(suit_played)
         else:
             # Only 12 cards exist in the jick suit (jick counts as trump)
             expected_cards = 12 if suit_played == Card.jick_suit(self.trump) else 13
@@ -765,10 +793,10 @@ class Hand(models.Model):
                 == expected_cards
             ):
                 # If all cards of this suit have been played, everyone is out
-                self.players_out_of_suits[suit_played] = [str(p.id) for p in self.game.players.all()]
+                self.mark_everyone_out_of_suit(suit_played)
 
         # Update if the player is out of the suit
-        lead_card = Card(representation=lead_play.card)
+        lead_card = Card.from_rep(lead_play.card)
         player_is_out = None
         if lead_card.is_trump(self.trump):
             if not card_played.is_trump(self.trump):
@@ -778,17 +806,30 @@ class Hand(models.Model):
                 # If player is trumping in, can't tell if he/she is out of lead_suit
                 # So if it isn't trump, and isn't the lead_suit, must be out of lead_suit
                 player_is_out = lead_card.suit
-        existing_outs = self.players_out_of_suits.get(suit_played, [])
-        new_outs = existing_outs if str(player.id) in existing_outs else [*existing_outs, str(player.id)]
-        self.players_out_of_suits[player_is_out] = new_outs
+        if player_is_out:
+            self.mark_out_of_suit(player, player_is_out)
+
+    def is_out_of_suit(self, player, suit):
+        return bool(self.suit_voids & void_bit(player.seat, SUIT_INDEX[suit]))
+
+    def suits_out_of(self, player):
+        """Returns the suits player is known to be out of"""
+        voids = seat_voids(self.suit_voids, player.seat)
+        return [suit for index, suit in enumerate(SUITS) if voids >> index & 1]
+
+    def mark_out_of_suit(self, player, suit):
+        self.suit_voids |= void_bit(player.seat, SUIT_INDEX[suit])
+
+    def mark_everyone_out_of_suit(self, suit):
+        self.suit_voids |= ALL_SEATS_VOID_MASKS[SUIT_INDEX[suit]]
 
 
 class Bid(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    hand = models.ForeignKey(Hand, related_name="bids", on_delete=models.CASCADE, null=True)
-    player = models.ForeignKey(Player, related_name="bids", on_delete=models.SET_NULL, null=True)
+    hand = IdentityMapForeignKey(Hand, related_name="bids", on_delete=models.CASCADE, null=True)
+    player = IdentityMapForeignKey(Player, related_name="bids", on_delete=models.SET_NULL, null=True)
     bid = models.IntegerField()
     trump = models.CharField(max_length=16, blank=True, default="", choices=SUIT_CHOICES)
 
@@ -805,8 +846,8 @@ class Play(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     trick = models.ForeignKey("Trick", related_name="plays", on_delete=models.CASCADE, null=True)
-    player = models.ForeignKey(Player, related_name="plays", on_delete=models.SET_NULL, null=True)
-    card = models.CharField(max_length=2)
+    player = IdentityMapForeignKey(Player, related_name="plays", on_delete=models.SET_NULL, null=True)
+    card = CardField()
 
     class Meta:
         ordering = ["id"]
@@ -816,7 +857,7 @@ class Play(models.Model):
 
     @cached_property
     def card_obj(self):
-        return Card(representation=self.card)
+        return Card.from_rep(self.card)
 
 
 class Trick(models.Model):
@@ -825,9 +866,17 @@ class Trick(models.Model):
     # num is the number trick of the hand (e.g. 1, 2, 3, 4, 5, and then 6)
     num = models.IntegerField()
 
-    hand = models.ForeignKey(Hand, related_name="tricks", on_delete=models.CASCADE, null=True)
-    active_player = models.ForeignKey(Player, related_name="tricks_playing", on_delete=models.SET_NULL, null=True)
-    taker = models.ForeignKey(Player, related_name="tricks_taken", on_delete=models.SET_NULL, null=True)
+    hand = IdentityMapForeignKey(Hand, related_name="tricks", on_delete=models.CASCADE, null=True)
+    active_player = IdentityMapForeignKey(Player, related_name="tricks_playing", on_delete=models.SET_NULL, null=True)
+    taker = IdentityMapForeignKey(Player, related_name="tricks_taken", on_delete=models.SET_NULL, null=True)
+
+    # Snapshot of the card counting state when the trick finished, so HandKnowledge
+    # can be restored without replaying every play of the hand. Masks are HandMask
+    # integers, and the lists are in seat order (game.player_ids_in_order)
+    played_mask = models.BigIntegerField(blank=True, null=True)
+    played_by_seat = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    void_masks_by_seat = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    game_points_by_seat = ArrayField(models.IntegerField(), default=list, blank=True)
 
     class Meta:
         unique_together = (("hand", "num"),)
@@ -837,31 +886,25 @@ class Trick(models.Model):
         return f"{', '.join(self.plays.all())} ({self.id})"
 
     def is_card_invalid_to_play(self, card, player, lead_play):
-        cards = player.get_cards()
+        hand = player.hand_mask
 
         # First check to make sure the player didn't pull a card out of their sleave
-        if card not in cards:
+        if card is None or card not in hand:
             return f"{card.pretty if card else 'None'} is not one of the player's cards"
 
+        # If this is the first card, it's valid. Otherwise the player must
+        # follow suit if able, or play trump
         lead_card = lead_play.card_obj if lead_play else None
-        # If this is the first card, it's valid
-        if lead_card is None:
-            return
-
-        # If trump was lead, did they follow suit if able?
-        has_trump = any(c.is_trump(self.hand.trump) for c in cards)
-        if lead_card.is_trump(self.hand.trump) and not card.is_trump(self.hand.trump) and has_trump:
-            return "must follow suit"
-
-        # For other lead suits, ensure either:
-        # - card is following suit (if able, and ignoring jick suit)
-        # - player is trumping
-        has_lead_suit = any(c.same_suit(lead_card, self.hand.trump) for c in cards)
-        if (lead_card.suit != card.suit) and has_lead_suit and not card.is_trump(self.hand.trump):
+        if card not in legal_mask(hand, lead_card, self.hand.trump):
             return "must follow suit"
 
         return None
 
+    def get_legal_plays(self, player, lead_play):
+        """Returns the player's cards that can legally be played, in hand order"""
+        lead_card = lead_play.card_obj if lead_play else None
+        return legal_moves(player.get_cards(), lead_card, self.hand.trump)
+
     def submit_card_to_play(self, card, player, current_plays, play=None):
         """Handles validation of the card's legality
 
@@ -906,20 +949,21 @@ class Trick(models.Model):
         player.card_played(card)
 
         # Update card counting logic
+        self.hand.record_play(card, player, lead_play.card_obj)
         self.hand.update_if_out_of_cards(player, card, lead_play, all_plays)
         self.hand.save()
 
         return num_plays == self.hand.game.num_players, all_plays
 
     def submit_play(self, play):
-        card = Card(representation=play.card)
+        card = Card.from_rep(play.card)
         trick_finished, current_plays = self.submit_card_to_play(card, play.player, play=play, current_plays=None)
         self.advance_trick(current_plays=current_plays, trick_finished_arg=trick_finished)
 
     def get_cards(self, all_plays_arg=None, as_rep=False):
         all_plays = all_plays_arg or self.plays.all()
         cards = [play.card for play in all_plays]
-        return [Card(representation=rep) for rep in cards] if not as_rep else cards
+        return [Card.from_rep(rep) for rep in cards] if not as_rep else cards
 
     def get_lead_play(self):
         return self.plays.first()
@@ -947,41 +991,51 @@ class Trick(models.Model):
 
     def find_winning_play(self, current_plays=None):
         plays = current_plays or list(self.plays.all())
-        current_high = plays[0]
-        for play in plays[1:]:
-            if current_high.card_obj.is_less_than(play.card_obj, self.hand.trump):
-                current_high = play
-        return current_high
+        return plays[winning_index([play.card_obj for play in plays], self.hand.trump)]
 
     def _award_cards_to_taker(self, all_plays_arg):
-        winning_play = self.find_winning_play(all_plays_arg)
+        all_plays = all_plays_arg or list(self.plays.all())
+        trump = self.hand.trump
+        result = resolve_trick([play.card_obj for play in all_plays], trump)
+        winning_play = all_plays[result.winner_index]
         LOG.info(f"Winning play was {winning_play}")
         self.taker = winning_play.player
         taker_id = str(self.taker.id)
-        cards = self.get_cards(all_plays_arg=all_plays_arg)
 
         # Give games points to taker
-        game_points = sum(card.game_points for card in cards)
         prev_points = self.hand.game_points_by_player.get(taker_id, 0)
-        self.hand.game_points_by_player[taker_id] = prev_points + game_points
+        self.hand.game_points_by_player[taker_id] = prev_points + result.game_points
+        self.hand.record_trick_taken(self.taker, result.game_points)
 
         # Award Jack or Jick, if taken
-        jack = next((card for card in cards if card.is_jack(self.hand.trump)), None)
-        jick = next((card for card in cards if card.is_jick(self.hand.trump)), None)
-        if jack:
+        if result.has_jack:
             self.hand.winner_jack = self.taker
-            LOG.info(f"{self.taker} won Jack ({jack})")
-        if jick:
+            LOG.info(f"{self.taker} won Jack ({Card(value='jack', suit=trump)})")
+        if result.has_jick:
             self.hand.winner_jick = self.taker
-            LOG.info(f"{self.taker} won Jick ({jick})")
+            LOG.info(f"{self.taker} won Jick ({Card(value='jack', suit=Card.jick_suit(trump))})")
 
         # Save hand
         self.hand.save()
 
+    def _take_card_counting_snapshot(self):
+        # Only when the knowledge is already loaded (it is whenever a computer played), loading it just for the
+        # snapshot would cost more queries than it saves. Without one, HandKnowledge.for_hand starts from an
+        # earlier trick's snapshot and replays a few more plays
+        if "knowledge" not in self.hand.__dict__:
+            return
+        player_ids = self.hand.game.seat_ring.player_ids
+        snapshot = self.hand.knowledge.snapshot(player_ids)
+        self.played_mask = snapshot["played_mask"]
+        self.played_by_seat = snapshot["played_by_seat"]
+        self.void_masks_by_seat = snapshot["void_masks_by_seat"]
+        self.game_points_by_seat = snapshot["game_points_by_seat"]
+
     def _finalize_trick(self, all_plays_arg):
         self.active_player = None
         self._award_cards_to_taker(all_plays_arg)
         LOG.info(f"Trick is finished. {self.taker} took the following cards: {self.get_cards(all_plays_arg=all_plays_arg)}")
+        self._take_card_counting_snapshot()
         self.save()
         self.hand.advance_hand(current_trick=self)
 
@@ -0,0 +1,60 @@
+"""The order players sit around the table, kept in memory
+
+A Game builds one SeatRing (see Game.seat_ring) from player_ids_in_order,
+and its hands and tricks share it through hand.game, so finding who plays
+next (or before), looking up a player by seat and checking teammates never
+needs to query the database once the players have been loaded.
+"""
+from django.utils.functional import cached_property
+
+
+class SeatRing:
+    def __init__(self, game):
+        self.game = game
+        self.player_ids = list(game.player_ids_in_order)
+        count = len(self.player_ids)
+        self.next_ids = {
+            player_id: self.player_ids[(seat + 1) % count] for seat, player_id in enumerate(self.player_ids)
+        }
+        self.prev_ids = {player_id: self.player_ids[seat - 1] for seat, player_id in enumerate(self.player_ids)}
+
+    def __len__(self):
+        return len(self.player_ids)
+
+    @cached_property
+    def players_by_id(self):
+        # Loaded on first use with a single query, many callers only need ids
+        return {player.id: player for player in self.game.player_set.all()}
+
+    @property
+    def players(self):
+        """Players in seat order"""
+        return [self.players_by_id[player_id] for player_id in self.player_ids]
+
+    def next_id(self, player_id):
+        return self.next_ids.get(player_id)
+
+    def prev_id(self, player_id):
+        return self.prev_ids.get(player_id)
+
+    def player(self, player_id):
+        return self.players_by_id[player_id]
+
+    def player_in_seat(self, seat):
+        return self.player(self.player_ids[seat])
+
+    def next_player(self, player_id):
+        return self.player(self.next_ids[player_id])
+
+    def players_after(self, player_id, count):
+        """Yields the next count players that play after player_id, in order"""
+        for _ in range(count):
+            player_id = self.next_ids[player_id]
+            yield self.player(player_id)
+
+    def team_id(self, player_id):
+        return self.player(player_id).team_id
+
+    def are_teammates(self, player_id, other_player_id):
+        team_id = self.team_id(player_id)
+        return team_id is not None and team_id == self.team_id(other_player_id)
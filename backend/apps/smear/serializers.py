@@ -3,6 +3,7 @@ import logging
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from apps.smear.card_codec import encode_cards
 from apps.smear.cards import SUITS, Card
 from apps.smear.models import Bid, Game, Hand, Play, Player, Team, Trick
 
@@ -55,6 +56,8 @@ class TeamSummarySerializer(serializers.ModelSerializer):
 
 
 class PlaySerializer(serializers.ModelSerializer):
+    card = serializers.CharField(max_length=2)
+
     class Meta:
         model = Play
         fields = ("id", "card", "player")
@@ -118,6 +121,8 @@ class HandSummaryWithCardsSerializer(HandSummarySerializer):
             player = obj.game.player_set.get(user=user)
         except Player.DoesNotExist:
             return []
+        if self.context.get("compact_cards"):
+            return encode_cards(player.cards_in_hand)
         return player.cards_in_hand
 
     def get_results(self, hand):
@@ -170,6 +175,13 @@ class TrickSummarySerializer(serializers.ModelSerializer):
         model = Trick
         fields = ("id", "num", "active_player", "taker", "plays")
 
+    def to_representation(self, trick):
+        data = super().to_representation(trick)
+        if self.context.get("compact_cards"):
+            # Send the cards of the trick as one string, in the same order as the plays
+            data["cards"] = encode_cards([play.pop("card") for play in data["plays"]])
+        return data
+
 
 class StatusPlayingTrickSerializer(serializers.ModelSerializer):
     current_hand = serializers.SerializerMethodField()
@@ -12,6 +12,7 @@ from rest_framework.response import Response
 from unique_names_generator import get_random_name
 from unique_names_generator.data import ADJECTIVES, ANIMALS, COLORS
 
+from apps.smear.card_codec import wants_compact_cards
 from apps.smear.models import Bid, Game, Hand, Play, Player, Team, Trick
 from apps.smear.pagination import SmearPagination
 from apps.smear.permissions import (
@@ -48,6 +49,11 @@ class GameViewSet(viewsets.ModelViewSet):
     search_fields = ("name",)
     filterset_fields = ("owner", "passcode_required", "single_player", "players")
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["compact_cards"] = wants_compact_cards(self.request)
+        return context
+
     def get_serializer_class(self):
         if self.action == "retrieve":
             return GameDetailSerializer
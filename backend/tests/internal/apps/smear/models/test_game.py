@@ -117,6 +117,32 @@ def test_Game_next_player(mocker):
     assert game.player_ids_in_order == ids
 
 
+@pytest.mark.django_db
+def test_Game_seat_ring(django_assert_num_queries):
+    num_players = 6
+    game = GameFactory(num_players=num_players, num_teams=2)
+    game.create_initial_teams()
+    [Player.objects.create(game=game, user=UserFactory()) for i in range(0, num_players)]
+    game.autofill_teams()
+    game.set_seats()
+    game.set_plays_after()
+    in_order = list(Player.objects.filter(game=game).order_by("seat"))
+
+    with django_assert_num_queries(1):
+        seat_ring = game.seat_ring
+        for idx, player in enumerate(in_order):
+            next_player = in_order[(idx + 1) % num_players]
+            assert game.next_player_id(player.id) == next_player.id
+            assert game.next_player(player) == next_player
+            assert seat_ring.prev_id(next_player.id) == player.id
+            assert seat_ring.player_in_seat(idx) == player
+            # Teams alternate seats
+            assert seat_ring.are_teammates(player.id, in_order[(idx + 2) % num_players].id)
+            assert not seat_ring.are_teammates(player.id, next_player.id)
+        assert list(seat_ring.players_after(in_order[4].id, 3)) == [in_order[5], in_order[0], in_order[1]]
+    assert game.next_player_id(-1) is None
+
+
 # Set the "repeat" range() to a large number to test computer logic more thoroughly
 @pytest.mark.django_db()
 @pytest.mark.parametrize("repeat", range(1))
@@ -0,0 +1,41 @@
+import pytest
+
+from apps.smear.cards import Card
+from apps.smear.identity_map import identity_map
+from apps.smear.models import Hand, Player
+from tests.internal.apps.smear.factories import GameFactory, HandFactory, PlayerFactory
+
+
+@pytest.mark.django_db
+def test_start_hand_can_be_redealt_from_deck_seed():
+    game = GameFactory(num_players=4, num_teams=0)
+    players = [PlayerFactory(game=game, seat=seat) for seat in range(4)]
+    game.set_plays_after()
+    hand = HandFactory(game=game)
+
+    hand.start_hand(dealer=players[0])
+
+    assert hand.deck_seed is not None
+    dealt = {player.id: player.cards_in_hand for player in Player.objects.filter(game=game)}
+    assert hand.redeal() == dealt
+
+
+@pytest.mark.django_db
+def test_redeal_leaves_the_players_cards_alone():
+    game = GameFactory(num_players=3, num_teams=0)
+    players = [PlayerFactory(game=game, seat=seat) for seat in range(3)]
+    game.set_plays_after()
+    hand = HandFactory(game=game)
+    hand.start_hand(dealer=players[0])
+
+    with identity_map():
+        hand = Hand.objects.get(id=hand.id)
+        live_players = list(Player.objects.filter(game=game).order_by("seat"))
+        live_players[0].card_played(Card.from_rep(live_players[0].cards_in_hand[0]))
+        cards_in_hand = [player.cards_in_hand[:] for player in live_players]
+
+        dealt = hand.redeal()
+
+        assert [player.cards_in_hand for player in live_players] == cards_in_hand
+        assert len(dealt[live_players[0].id]) == 6
+        assert live_players[0].get_pending_fields() == set()
@@ -23,7 +23,9 @@ def test_update_if_out_of_cards_did_not_follow_trump():
 
     trick.hand.update_if_out_of_cards(p2, Card(representation="2S"), lead_play, all_plays)
 
-    assert trick.hand.players_out_of_suits["hearts"] == [str(p2.id)]
+    assert trick.hand.is_out_of_suit(p2, "hearts")
+    assert trick.hand.suits_out_of(p2) == ["hearts"]
+    assert not trick.hand.is_out_of_suit(p1, "hearts")
 
 
 @pytest.mark.django_db
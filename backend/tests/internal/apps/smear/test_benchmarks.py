@@ -0,0 +1,142 @@
+"""Query and time budgets for the computer player
+
+Each benchmark builds a mid-hand position (one trick finished, the next one
+half played) and then, like a request would, loads it from the database and
+calls the function being measured. The test fails if any call does more SQL
+queries than its budget.
+
+Timing depends on the machine, so the median time of a call is only checked
+against its budget when SMEAR_BENCHMARK_TIMES is set (e.g. to 1). Time
+budgets are generous so they only catch large regressions, they can be
+scaled for slower machines with SMEAR_BENCHMARK_TIME_SCALE (e.g. 2.5), and
+SMEAR_BENCHMARK_ROUNDS sets how many times each call is measured.
+"""
+import os
+import statistics
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.smear import card_counting, computer_logic
+from apps.smear.card_counting import HandKnowledge
+from apps.smear.cards import Deck
+from apps.smear.identity_map import identity_map
+from apps.smear.models import Player, Trick
+from tests.internal.apps.smear.factories import GameFactory, HandFactory, PlayerFactory
+
+CHECK_TIMES = bool(os.environ.get("SMEAR_BENCHMARK_TIMES"))
+TIME_SCALE = float(os.environ.get("SMEAR_BENCHMARK_TIME_SCALE", "1"))
+ROUNDS = int(os.environ.get("SMEAR_BENCHMARK_ROUNDS", "5"))
+
+# name: (max queries, max median seconds) of one measured call
+BUDGETS = {
+    "choose_card": (6, 0.05),
+    "calculate_bid": (4, 0.03),
+    "safe_to_play": (5, 0.05),
+    "highest_card_still_out": (2, 0.02),
+}
+
+NUM_PLAYERS = [2, 3, 4, 5, 6, 7, 8]
+
+
+def build_mid_hand(num_players, seed):
+    """Deals a hand, plays the first trick and half of the second, returns the trick in progress"""
+    num_teams = num_players // 2 if num_players >= 4 and num_players % 2 == 0 else 0
+    game = GameFactory(num_players=num_players, num_teams=num_teams)
+    game.create_initial_teams()
+    PlayerFactory.create_batch(num_players, game=game, is_computer=True)
+    game.autofill_teams()
+    game.set_seats()
+    game.set_plays_after()
+
+    players = game.seat_ring.players
+    deck = Deck(seed=seed)
+    for player in players:
+        player.cards_in_hand = [card.representation for card in deck.deal(6)]
+    Player.objects.bulk_update(players, ["cards_in_hand"])
+
+    hand = HandFactory(game=game, trump="spades", bidder=players[0], dealer=players[-1])
+    # Card counting is loaded by the computers as they play, which the snapshot relies on
+    hand.knowledge = HandKnowledge.for_hand(hand)
+    first_trick = play_cards(Trick.objects.create(hand=hand, num=1), players[0], num_players)
+    first_trick._award_cards_to_taker(list(first_trick.plays.all()))
+    first_trick._take_card_counting_snapshot()
+    first_trick.save()
+    return play_cards(Trick.objects.create(hand=hand, num=2), first_trick.taker, num_players // 2)
+
+
+def play_cards(trick, leader, count):
+    trick.start_trick(leader)
+    plays = []
+    for _ in range(count):
+        player = trick.active_player
+        card = trick.get_legal_plays(player, plays[0] if plays else None)[0]
+        _, plays = trick.submit_card_to_play(card, player, plays)
+    trick.save()
+    return trick
+
+
+def measure(name, trick_id, call):
+    """Calls call(trick, player, plays) ROUNDS times on freshly loaded objects, and checks it against its budget
+
+    Loading the position is not measured, only the call itself. The time is
+    only checked with SMEAR_BENCHMARK_TIMES.
+    """
+    max_queries, max_seconds = BUDGETS[name]
+    timings = []
+    for _ in range(ROUNDS):
+        with identity_map():
+            trick = Trick.objects.select_related("hand__game").get(id=trick_id)
+            player = trick.active_player
+            plays = list(trick.plays.all())
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                call(trick, player, plays)
+                timings.append(time.perf_counter() - start)
+        assert len(queries) <= max_queries, f"{name} did {len(queries)} queries, budget is {max_queries}"
+    if not CHECK_TIMES:
+        return
+    median = statistics.median(timings)
+    assert median <= max_seconds * TIME_SCALE, f"{name} took {median:.4f}s, budget is {max_seconds * TIME_SCALE}s"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", NUM_PLAYERS)
+def test_choose_card_budget(num_players):
+    trick_id = build_mid_hand(num_players, seed=num_players).id
+
+    measure("choose_card", trick_id, lambda trick, player, plays: computer_logic.choose_card(player, trick, plays))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", NUM_PLAYERS)
+def test_calculate_bid_budget(num_players):
+    trick_id = build_mid_hand(num_players, seed=num_players).id
+
+    measure("calculate_bid", trick_id, lambda trick, player, plays: computer_logic.calculate_bid(player, trick.hand))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", NUM_PLAYERS)
+def test_safe_to_play_budget(num_players):
+    trick_id = build_mid_hand(num_players, seed=num_players).id
+
+    def call(trick, player, plays):
+        for card in player.get_cards():
+            card_counting.safe_to_play(trick.hand, trick, player, card, plays)
+
+    measure("safe_to_play", trick_id, call)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", NUM_PLAYERS)
+def test_highest_card_still_out_budget(num_players):
+    trick_id = build_mid_hand(num_players, seed=num_players).id
+
+    def call(trick, player, plays):
+        for suit in ("spades", "hearts", "clubs", "diamonds"):
+            card_counting.highest_card_still_out(trick.hand, suit)
+
+    measure("highest_card_still_out", trick_id, call)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from apps.smear.bid_arrays import calculate_bids
+from apps.smear.card_arrays import EMPTY, cards_from_representations, cards_to_representations
+from apps.smear.cards import NO_TRUMP, trump_index
+from apps.smear.computer_logic import calculate_bid
+from tests.internal.apps.smear.factories import HandFactory, PlayerFactory
+
+
+def random_hands(num_hands, num_cards, seed):
+    rng = np.random.default_rng(seed)
+    return np.argsort(rng.random((num_hands, 52)), axis=1)[:, :num_cards].astype(np.int8)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", range(2, 9))
+def test_calculate_bids_matches_calculate_bid(num_players):
+    hands = random_hands(40, 6, seed=num_players)
+    # The last few hands have already played some cards
+    hands[30:, 4:] = EMPTY
+    is_dealer = np.arange(len(hands)) % 2 == 0
+    has_high_bid = np.arange(len(hands)) % 3 == 0
+    hand = HandFactory(game__num_players=num_players)
+    dealer = PlayerFactory(game=hand.game)
+    other = PlayerFactory(game=hand.game)
+    hand.dealer = dealer
+    high_bid = hand.high_bid
+
+    bids, trumps = calculate_bids(hands, num_players, is_dealer, has_high_bid)
+
+    for index, cards in enumerate(hands):
+        player = dealer if is_dealer[index] else other
+        player.cards_in_hand = [rep for rep in cards_to_representations(cards).tolist() if rep]
+        hand.high_bid = high_bid if has_high_bid[index] else None
+        bid, trump = calculate_bid(player, hand)
+        assert (bids[index], trumps[index]) == (bid, trump_index(trump) if trump else NO_TRUMP)
+
+
+def test_calculate_bids_dealer_rule():
+    # Worth a bid of 1 with spades as trump
+    hands = cards_from_representations([["9D", "JS", "9S", "6S", "5D", "2H"]] * 3)
+
+    bids, trumps = calculate_bids(hands, 4, is_dealer=np.array([False, True, True]), has_high_bid=[False, False, True])
+
+    assert bids.tolist() == [0, 2, 0]
+    assert trumps.tolist() == [trump_index("spades")] * 3
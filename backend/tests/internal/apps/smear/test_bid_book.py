@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from apps.smear import bid_book
+from apps.smear.bid_arrays import estimate_bid_ties
+from apps.smear.bid_book import (
+    MAX_PLAYERS,
+    MIN_PLAYERS,
+    BidBook,
+    build_bids,
+    canonical_bidding_keys,
+    card_ids_from_keys,
+    write_bid_book,
+)
+from apps.smear.canonical import canonical_key
+from apps.smear.card_arrays import cards_to_representations
+from apps.smear.computer_logic import HandProfile, _apply_dealer_rule, calculate_bid, computer_bid, estimate_bid
+from apps.smear.hand_mask import HandMask, iter_card_ids
+from tests.internal.apps.smear.factories import HandFactory, PlayerFactory
+from tests.internal.apps.smear.test_bid_arrays import random_hands
+
+HANDS = [
+    ["AS", "JS", "3H", "4H", "3D", "4D"],
+    ["KH", "QH", "JD", "2H", "5C", "9S"],
+    ["JC", "JS", "0C", "2C", "AD", "KD"],
+    ["2S", "3H", "4C", "5D", "6S", "7H"],
+]
+
+
+def write_book(path, hands, num_players_options):
+    keys = np.unique([canonical_key(HandMask.from_reps(hand)) for hand in hands]).astype(np.uint64)
+    write_bid_book(path, keys, build_bids(keys, num_players_options, estimate_bid_ties, chunk_size=1000))
+    return path
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    return write_book(tmp_path / "bid_book.bin", HANDS, [2, 4, 8])
+
+
+@pytest.fixture(scope="module")
+def random_book(tmp_path_factory):
+    # Card order and suit relabelling used to change the bid or trump of some of these
+    hands = [["0S", "5S", "6H", "0D", "2S", "4C"]]
+    hands += cards_to_representations(random_hands(3000, 6, seed=23)).tolist()
+    path = write_book(tmp_path_factory.mktemp("bid_book") / "bid_book.bin", hands, range(MIN_PLAYERS, MAX_PLAYERS + 1))
+    return hands, BidBook(path)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("num_players", range(MIN_PLAYERS, MAX_PLAYERS + 1))
+def test_bid_book_matches_calculate_bid(random_book, num_players):
+    hands, book = random_book
+    hand = HandFactory(game__num_players=num_players)
+    hand.high_bid = None
+    player = PlayerFactory(game=hand.game)
+    hand.dealer = player
+
+    for cards_in_hand in hands:
+        player.cards_in_hand = cards_in_hand
+        book_bid = book.lookup(player.hand_mask.mask, num_players)
+
+        assert _apply_dealer_rule(player, hand, *book_bid) == calculate_bid(player, hand), cards_in_hand
+
+
+def test_estimate_bid_ignores_card_order():
+    cards_in_hand = ["0S", "5S", "6H", "0D", "2S", "4C"]
+
+    bid = estimate_bid(HandProfile(cards_in_hand), 5)
+
+    assert bid == estimate_bid(HandProfile(sorted(cards_in_hand)), 5)
+    assert bid == estimate_bid(HandProfile(cards_in_hand[::-1]), 5)
+
+
+def test_bid_book_unknown_hands(book_path):
+    book = BidBook(book_path)
+
+    assert len(book) == len(HANDS)
+    assert book.lookup(HandMask.from_reps(["AS", "KS", "QS", "3H", "4H", "5H"]).mask, 4) is None
+    # Not built for 3 players
+    assert book.lookup(HandMask.from_reps(HANDS[0]).mask, 3) is None
+
+
+@pytest.mark.django_db
+def test_computer_bid_uses_bid_book(book_path, settings, mocker):
+    hand = HandFactory(game__num_players=4)
+    hand.high_bid = None
+    player = PlayerFactory(game=hand.game, cards_in_hand=HANDS[2])
+    expected_bid = computer_bid(player, hand)
+
+    settings.BID_BOOK_PATH = str(book_path)
+    mocker.patch.dict(bid_book._bid_books, clear=True)
+    calculate = mocker.patch("apps.smear.computer_logic.calculate_bid")
+
+    assert computer_bid(player, hand) == expected_bid == (4, "clubs")
+    calculate.assert_not_called()
+
+
+def test_build_bid_book_command(tmp_path, mocker):
+    # Enumerating every hand takes a while, use the first few canonical hands of a smaller set
+    keys = np.sort(np.array([canonical_key(HandMask.from_reps(hand)) for hand in HANDS], dtype=np.uint64))
+    mocker.patch("apps.smear.management.commands.build_bid_book.canonical_bidding_keys", return_value=keys)
+    path = tmp_path / "bid_book.bin"
+
+    call_command("build_bid_book", str(path), "--num-players", "3", "--limit", "2")
+
+    book = BidBook(path)
+    assert len(book) == 2
+    assert book.lookup(int(keys[0]), 3) == estimate_bid(HandProfile(HandMask(int(keys[0])).reps()), 3)
+    assert book.lookup(int(keys[0]), 4) is None
+
+
+def test_card_ids_from_keys():
+    keys = np.array([HandMask.from_reps(hand).mask for hand in HANDS], dtype=np.uint64)
+
+    assert card_ids_from_keys(keys).tolist() == [list(iter_card_ids(int(key))) for key in keys]
+
+
+def test_canonical_bidding_keys(mocker):
+    # Only deal from 9 cards so enumerating the hands is quick
+    mocker.patch("apps.smear.bid_book.NUM_CARDS", 9)
+
+    keys = canonical_bidding_keys(chunk_size=10)
+
+    assert list(keys) == sorted({canonical_key(mask) for mask in keys.tolist()})
+    assert all(canonical_key(int(key)) == key for key in keys)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from apps.smear.bid_odds import AT_MOST_ONE_OTHER_DEALT, NO_ONE_ELSE_DEALT, at_most_one_other_dealt, no_one_else_dealt
+
+
+def dealt_to_each_other_player(num_players, k, deals, seed):
+    # Deal the 46 cards I can't see at random, and count how many of the first k cards each other player got
+    rng = np.random.default_rng(seed)
+    positions = np.argsort(rng.random((deals, 46)), axis=1)[:, :k]
+    others = positions // 6
+    return np.stack([(others == other).sum(axis=1) for other in range(num_players - 1)], axis=1)
+
+
+@pytest.mark.parametrize("num_players,k", [(2, 1), (3, 4), (4, 2), (6, 5), (8, 13)])
+def test_odds_match_random_deals(num_players, k):
+    counts = dealt_to_each_other_player(num_players, k, deals=20000, seed=num_players)
+    holders = (counts > 0).sum(axis=1)
+
+    assert no_one_else_dealt(6, num_players, k) == pytest.approx((holders == 0).mean(), abs=0.015)
+    assert at_most_one_other_dealt(6, num_players, k) == pytest.approx((holders <= 1).mean(), abs=0.015)
+
+
+def test_odds_tables():
+    # With no other players, or no cards to look for, no one else can have them
+    assert NO_ONE_ELSE_DEALT[6][1][13] == 1.0
+    assert NO_ONE_ELSE_DEALT[6][8][0] == 1.0
+    # With one other player, at most one other player has them
+    assert AT_MOST_ONE_OTHER_DEALT[6][2][13] == 1.0
+    # One other player holds 6 of the 46 cards I can't see
+    assert NO_ONE_ELSE_DEALT[6][2][1] == pytest.approx(40 / 46)
+    # Two other players can't avoid 35 of the 46 cards with their 12
+    assert NO_ONE_ELSE_DEALT[6][3][35] == 0.0
+    for num_players in range(2, 9):
+        for k in range(14):
+            assert NO_ONE_ELSE_DEALT[6][num_players][k] <= AT_MOST_ONE_OTHER_DEALT[6][num_players][k]
+            assert NO_ONE_ELSE_DEALT[6][num_players][k + 1] <= NO_ONE_ELSE_DEALT[6][num_players][k]
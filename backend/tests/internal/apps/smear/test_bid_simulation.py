@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from apps.smear import bid_simulation, computer_logic
+from apps.smear.bid_simulation import expected_points, play_out, simulate
+from apps.smear.card_arrays import cards_from_representations
+from apps.smear.cards import SUIT_INDEX, card_id_from_representation
+from apps.smear.computer_logic import computer_bid, simulated_bid
+from tests.internal.apps.smear.factories import GameFactory, HandFactory, PlayerFactory
+
+SPADES = ["AS", "KS", "QS", "JS", "0S", "2S"]
+HEARTS = ["3H", "4H", "5H", "6H", "7H", "8H"]
+DIAMONDS = ["3D", "4D", "5D", "6D", "7D", "8D"]
+CLUBS = ["3C", "4C", "5C", "6C", "7C", "8C"]
+
+
+def test_play_out_bidder_takes_everything():
+    deals = cards_from_representations([[SPADES, HEARTS]])
+
+    # High, low, jack and game, no one was dealt the jick
+    assert play_out(deals, SUIT_INDEX["spades"], [0, 1]).tolist() == [4]
+
+
+def test_play_out_counts_teammates_points():
+    deals = cards_from_representations([[CLUBS, HEARTS, SPADES, DIAMONDS]])
+
+    assert play_out(deals, SUIT_INDEX["spades"], [0, 1, 0, 1]).tolist() == [4]
+    # Without a team the bidder was never dealt high, low or the jack
+    assert play_out(deals, SUIT_INDEX["spades"], [0, 1, 2, 3]).tolist()[0] <= 1
+
+
+def test_simulate():
+    cards = [card_id_from_representation(rep) for rep in SPADES]
+
+    totals = simulate(cards, [0, 1, 2, 3], 200, seed=5)
+
+    # Spades are worth high, low and jack every time, other suits are worth much less
+    assert totals[SUIT_INDEX["spades"]] >= 3 * 200
+    assert totals.argmax() == SUIT_INDEX["spades"]
+    assert totals.tolist() == simulate(cards, [0, 1, 2, 3], 200, seed=5).tolist()
+
+
+def test_expected_points_in_process(settings):
+    settings.MONTE_CARLO_BID_WORKERS = 0
+    cards = [card_id_from_representation(rep) for rep in SPADES]
+
+    points = expected_points(cards, ["me", "them", "me", "them"], 600, budget=10, seed=1)
+
+    assert points.shape == (4,)
+    assert 3 <= points[SUIT_INDEX["spades"]] <= 5
+    # Out of time before anything was simulated
+    assert expected_points(cards, ["me", "them", "me", "them"], 600, budget=0, seed=1) is None
+
+
+def test_expected_points_process_pool(settings, mocker):
+    settings.MONTE_CARLO_BID_WORKERS = 1
+    mocker.patch.dict(bid_simulation._pools, clear=True)
+    cards = [card_id_from_representation(rep) for rep in SPADES]
+
+    try:
+        points = expected_points(cards, [1, 2, 3], 500, budget=60, seed=2)
+        assert expected_points(cards, [1, 2, 3], 500, budget=0, seed=2) is None
+    finally:
+        bid_simulation._pools[1].shutdown(cancel_futures=True)
+
+    settings.MONTE_CARLO_BID_WORKERS = 0
+    assert points.tolist() == expected_points(cards, [1, 2, 3], 500, budget=60, seed=2).tolist()
+
+
+def test_expected_points_timeout_replaces_the_pool(settings, mocker, monkeypatch):
+    settings.MONTE_CARLO_BID_WORKERS = 1
+    mocker.patch.dict(bid_simulation._pools, clear=True)
+    cards = [card_id_from_representation(rep) for rep in SPADES]
+    old_pool = bid_simulation.get_pool()
+    shutdown = mocker.spy(old_pool, "shutdown")
+
+    try:
+        with monkeypatch.context() as patch:
+            # None of the chunks finish within the budget
+            patch.setattr(bid_simulation, "wait", lambda futures, timeout: (set(), set(futures)))
+            assert expected_points(cards, [1, 2, 3], 500, budget=60) is None
+
+        shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+        assert bid_simulation._pools[1] is not old_pool
+        # The next bid runs in the new pool rather than queueing behind the old one
+        assert expected_points(cards, [1, 2, 3], 500, budget=60) is not None
+    finally:
+        for pool in bid_simulation._pools.values():
+            pool.shutdown(cancel_futures=True)
+        old_pool.shutdown(cancel_futures=True)
+
+
+@pytest.fixture
+def seated_hand():
+    game = GameFactory(num_players=3, num_teams=0)
+    players = [PlayerFactory(game=game, seat=seat) for seat in range(3)]
+    game.set_seats()
+    game.set_plays_after()
+    players[0].cards_in_hand = SPADES
+    hand = HandFactory(game=game, dealer=players[2])
+    hand.high_bid = None
+    return hand, players[0]
+
+
+@pytest.mark.django_db
+def test_computer_bid_simulates_with_a_budget(seated_hand, settings, mocker):
+    hand, player = seated_hand
+    settings.MONTE_CARLO_BID_BUDGET = 10
+    settings.MONTE_CARLO_BID_SAMPLES = 300
+    settings.MONTE_CARLO_BID_WORKERS = 0
+    simulate_spy = mocker.spy(bid_simulation, "expected_points")
+    calculate = mocker.patch("apps.smear.computer_logic.calculate_bid")
+
+    bid, trump = computer_bid(player, hand)
+
+    assert trump == "spades"
+    assert bid in (4, 5)
+    calculate.assert_not_called()
+    assert simulate_spy.call_args.args[1] == [p.id for p in hand.game.seat_ring.players]
+
+
+@pytest.mark.django_db
+def test_computer_bid_falls_back_when_out_of_time(seated_hand, settings, mocker):
+    hand, player = seated_hand
+    settings.MONTE_CARLO_BID_BUDGET = 0.5
+    mocker.patch("apps.smear.bid_simulation.expected_points", return_value=None)
+
+    assert simulated_bid(player, hand) is None
+    assert computer_bid(player, hand) == computer_logic.calculate_bid(player, hand)
+
+
+@pytest.mark.django_db
+def test_simulated_bid_picks_best_trump(seated_hand, mocker):
+    hand, player = seated_hand
+    mocker.patch("apps.smear.bid_simulation.expected_points", return_value=np.array([1.1, 2.85, 2.5, 0]))
+
+    assert simulated_bid(player, hand) == (3, "hearts")
+    assert simulated_bid(player, hand, aggression_factor=0) == (2, "hearts")
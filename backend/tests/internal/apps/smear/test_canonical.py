@@ -0,0 +1,52 @@
+import pytest
+
+from apps.smear.canonical import BIDDING_PERMUTATIONS, PLAYING_PERMUTATIONS, canonical_key, canonicalize
+from apps.smear.hand_mask import HandMask
+
+
+def test_number_of_relabellings():
+    assert len(BIDDING_PERMUTATIONS) == 8
+    assert all(len(permutations) == 2 for permutations in PLAYING_PERMUTATIONS)
+
+
+@pytest.mark.parametrize(
+    "hand,equivalent_hand",
+    [
+        # Swap the black suits
+        (["AS", "JC", "3H", "4H", "3D", "4D"], ["AC", "JS", "3H", "4H", "3D", "4D"]),
+        # Swap colors
+        (["AS", "JC", "3H", "4H", "3D", "5D"], ["AH", "JD", "3S", "4S", "3C", "5C"]),
+    ],
+)
+def test_equivalent_hands_share_a_bidding_key(hand, equivalent_hand):
+    assert canonical_key(HandMask.from_reps(hand)) == canonical_key(HandMask.from_reps(equivalent_hand))
+
+
+def test_jick_pairing_is_preserved_when_bidding():
+    # Jack of spades with jack of clubs is a jack and jick, with jack of hearts it never is
+    hand = HandMask.from_reps(["JS", "JC", "2H", "3H", "4D", "5D"])
+    different_hand = HandMask.from_reps(["JS", "JH", "2C", "3C", "4D", "5D"])
+
+    assert canonical_key(hand) != canonical_key(different_hand)
+
+
+def test_playing_key_distinguishes_trump():
+    hand = HandMask.from_reps(["AS", "2S", "3H", "4H", "3D", "4D"])
+
+    assert canonical_key(hand, trump="spades") != canonical_key(hand, trump="hearts")
+    assert canonical_key(hand, trump="hearts") == canonical_key(
+        HandMask.from_reps(["AS", "2S", "3D", "4D", "3H", "4H"]), trump="diamonds"
+    )
+
+
+@pytest.mark.parametrize("trump", (None, "spades", "hearts", "clubs", "diamonds"))
+def test_canonicalize_maps_back_to_the_original_hand(trump):
+    hand = HandMask.from_reps(["AS", "JC", "0H", "4H", "3D", "KD"])
+
+    canonical = canonicalize(hand, trump=trump)
+
+    assert canonical.key == canonical_key(hand, trump=trump)
+    assert canonical.to_original_mask(canonical.key) == hand.mask
+    if trump:
+        assert canonical.to_canonical_suit(trump) == canonical.trump
+        assert canonical.to_original_suit(canonical.trump) == trump
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from apps.smear import card_arrays
+from apps.smear.cards import CARDS, SUITS, trump_index
+
+
+@pytest.mark.parametrize("trump", SUITS)
+def test_arrays_match_Card(trump):
+    index = trump_index(trump)
+    cards = np.arange(52, dtype=np.int8)
+
+    assert card_arrays.is_trump(cards, index).tolist() == [card.is_trump(trump) for card in CARDS]
+    assert card_arrays.is_jack(cards, index).tolist() == [card.is_jack(trump) for card in CARDS]
+    assert card_arrays.is_jick(cards, index).tolist() == [card.is_jick(trump) for card in CARDS]
+    assert card_arrays.trump_rank(cards, index).tolist() == [card.trump_rank(trump) for card in CARDS]
+    assert card_arrays.game_points(cards).tolist() == [card.game_points for card in CARDS]
+
+
+def test_batched_hands_with_per_hand_trump():
+    hands = card_arrays.cards_from_representations(
+        [
+            ["AS", "JC", "0H", "2D", "3D", "4D"],
+            ["KH", "QH", "JD", "0D", "2C", "3C"],
+        ]
+    )
+    hands[1, 5] = card_arrays.EMPTY
+    trumps = np.array([[trump_index("spades")], [trump_index("hearts")]])
+
+    assert hands.dtype == np.int8
+    assert card_arrays.hand_game_points(hands).tolist() == [4 + 1 + 10, 3 + 2 + 1 + 10]
+    assert card_arrays.trump_counts(hands, trumps).tolist() == [2, 3]
+    assert card_arrays.cards_to_representations(hands[1]).tolist() == ["KH", "QH", "JD", "0D", "2C", ""]
+    assert card_arrays.is_jick(hands, trumps)[1].tolist() == [False, False, True, False, False, False]
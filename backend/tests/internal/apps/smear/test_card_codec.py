@@ -0,0 +1,17 @@
+import pytest
+
+from apps.smear.card_codec import decode_cards, encode_cards
+
+
+def test_encode_cards_round_trip():
+    reps = ["AS", "0H", "JC", "2D", "KS", "QH"]
+
+    encoded = encode_cards(reps)
+
+    assert len(encoded) == 8
+    assert decode_cards(encoded) == reps
+
+
+def test_decode_cards_rejects_invalid_card_ids():
+    with pytest.raises(ValueError):
+        decode_cards(encode_cards(["AS"])[:-2] + "__")
@@ -2,6 +2,7 @@ import pytest
 
 from apps.smear import card_counting
 from apps.smear.cards import Card
+from apps.smear.hand_mask import HandMask
 from apps.smear.models import Play
 from tests.internal.apps.smear.factories import GameFactory, PlayerFactory, TeamFactory, TrickFactory
 
@@ -41,6 +42,147 @@ def test_jack_or_jick_still_out(jick_played):
     assert still_out is not jick_played
 
 
+@pytest.mark.django_db
+def test_hand_knowledge_records_plays_without_querying(django_assert_num_queries):
+    trick = TrickFactory(hand__trump="spades")
+    player = PlayerFactory(game=trick.hand.game)
+    Play.objects.create(trick=trick, card="AS")
+    hand = trick.hand
+    lead_card = Card.from_rep("AS")
+
+    with django_assert_num_queries(2):
+        assert card_counting.highest_card_still_out(hand, "spades").representation == "KS"
+        hand.record_play(Card.from_rep("KS"), player, lead_card)
+        hand.record_play(Card.from_rep("JS"), player, lead_card)
+        assert card_counting.card_has_been_played(hand, Card.from_rep("KS"))
+        assert not card_counting.card_has_been_played(hand, Card.from_rep("QS"))
+        assert card_counting.highest_card_still_out(hand, "spades").representation == "QS"
+        assert card_counting.jack_or_jick_still_out(hand)
+        hand.record_play(Card.from_rep("JC"), player, lead_card)
+        assert not card_counting.jack_or_jick_still_out(hand)
+
+
+@pytest.mark.django_db
+def test_hand_knowledge_restores_from_trick_snapshot():
+    game = GameFactory(num_players=3, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0)
+    p2 = PlayerFactory(game=game, seat=1)
+    p3 = PlayerFactory(game=game, seat=2)
+    game.set_seats()
+    game.set_plays_after()
+    trick = TrickFactory(hand__game=game, hand__trump="spades", num=1)
+    hand = trick.hand
+    plays = [
+        Play.objects.create(trick=trick, card="AH", player=p1),
+        Play.objects.create(trick=trick, card="2C", player=p2),
+        Play.objects.create(trick=trick, card="KH", player=p3),
+    ]
+    # No snapshot unless the knowledge was already loaded
+    trick._take_card_counting_snapshot()
+    assert trick.played_mask is None
+    assert hand.knowledge.game_points == {}
+    trick._award_cards_to_taker(plays)
+    trick._take_card_counting_snapshot()
+    trick.save()
+    trick.refresh_from_db()
+    assert trick.played_mask == HandMask.from_reps(["AH", "2C", "KH"]).mask
+    assert trick.game_points_by_seat == [7, 0, 0]
+
+    # Plays of finished tricks are not replayed, only the snapshot is read
+    Play.objects.filter(trick=trick).delete()
+    next_trick = TrickFactory(hand=hand, num=2)
+    Play.objects.create(trick=next_trick, card="QH", player=p1)
+    del hand.knowledge
+    knowledge = hand.knowledge
+
+    assert knowledge.played_mask == HandMask.from_reps(["AH", "2C", "KH", "QH"]).mask
+    assert knowledge.played_by[p2.id] == HandMask.from_reps(["2C"]).mask
+    # p2 didn't follow suit
+    assert knowledge.void_masks[p2.id] & HandMask.from_reps(["2H"]).mask
+    assert p3.id not in knowledge.void_masks
+    assert knowledge.game_points == {p1.id: 7}
+    assert knowledge.snapshot([p1.id, p2.id, p3.id])["game_points_by_seat"] == [7, 0, 0]
+
+
+@pytest.mark.django_db
+def test_hand_knowledge_replays_game_points_of_finished_tricks():
+    game = GameFactory(num_players=2, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0)
+    p2 = PlayerFactory(game=game, seat=1)
+    game.set_seats()
+    game.set_plays_after()
+    first = TrickFactory(hand__game=game, hand__trump="spades", num=1, taker=p2)
+    Play.objects.create(trick=first, card="0H", player=p1)
+    Play.objects.create(trick=first, card="2S", player=p2)
+    second = TrickFactory(hand=first.hand, num=2)
+    Play.objects.create(trick=second, card="AS", player=p2)
+
+    # No snapshots were taken, the finished trick is replayed and the one in progress hasn't been won yet
+    assert first.hand.knowledge.game_points == {p2.id: 10}
+
+
+def test_hand_knowledge_highest_still_out_ignore_card():
+    knowledge = card_counting.HandKnowledge("clubs")
+    for rep in ("AC", "KC", "AH"):
+        knowledge.record_play(Card.from_rep(rep))
+
+    assert knowledge.highest_still_out("clubs").representation == "QC"
+    assert knowledge.highest_still_out("clubs", ignore_card=Card.from_rep("KC")).representation == "KC"
+    assert knowledge.highest_still_out("hearts").representation == "KH"
+    # The jick counts as trump, not as a spade
+    assert knowledge.highest_still_out("spades").representation == "AS"
+    knowledge.record_play(Card.from_rep("AS"))
+    assert knowledge.highest_still_out("spades").representation == "KS"
+
+
+def test_hand_knowledge_possible_cards_from_voids():
+    knowledge = card_counting.HandKnowledge("clubs")
+    # Player 2 didn't follow a diamond lead, player 3 trumped in
+    knowledge.record_play(Card.from_rep("AD"), 1, Card.from_rep("AD"))
+    knowledge.record_play(Card.from_rep("2H"), 2, Card.from_rep("AD"))
+    knowledge.record_play(Card.from_rep("JS"), 3, Card.from_rep("AD"))
+
+    player_2 = HandMask(knowledge.possible_cards(2))
+    player_3 = HandMask(knowledge.possible_cards(3))
+
+    assert len(player_2) == 52 - 13 - 2
+    assert "KD" not in player_2.reps()
+    assert "2S" in player_2.reps()
+    # Trumping in doesn't mean player 3 is out of diamonds
+    assert "KD" in player_3.reps()
+    assert "JS" not in player_3.reps()
+
+
+def test_hand_knowledge_possible_cards_for_observer_with_high_and_low():
+    knowledge = card_counting.HandKnowledge("hearts", winner_high_id=1, winner_low_id=1)
+    knowledge.record_play(Card.from_rep("KH"), 1, Card.from_rep("KH"))
+    observer = PlayerFactory.build(id=1, cards_in_hand=["3H", "0H", "AS"])
+
+    possible = HandMask(knowledge.possible_cards(2, observer=observer))
+
+    # Player 1 won high with the king and low with the 3
+    assert not possible & HandMask.from_reps(["AH", "KH", "2H", "3H", "0H", "AS"])
+    assert possible & HandMask.from_reps(["QH", "JH", "JD", "4H"]) == HandMask.from_reps(["QH", "JH", "JD", "4H"])
+
+
+@pytest.mark.django_db
+def test_could_be_defeated_uses_known_cards():
+    game = GameFactory(num_players=3, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0, cards_in_hand=["KH", "2C"])
+    PlayerFactory(game=game, seat=1)
+    PlayerFactory(game=game, seat=2)
+    game.set_seats()
+    game.set_plays_after()
+    trick = TrickFactory(hand__game=game, hand__trump="spades")
+    Play.objects.create(trick=trick, card="AH", player=p1)
+
+    # The ace of hearts has been played and p1 holds the king, so only trump can take the queen
+    assert card_counting.could_be_defeated(trick.hand, trick, p1, Card.from_rep("QH"), [])
+    trick.hand.mark_everyone_out_of_suit("spades")
+    assert not card_counting.could_be_defeated(trick.hand, trick, p1, Card.from_rep("QH"), [])
+    assert card_counting.could_be_defeated(trick.hand, trick, p1, Card.from_rep("JH"), [])
+
+
 @pytest.mark.django_db
 def test_is_teammate_taking_trick_ace_trump():
     game = GameFactory(num_players=4, num_teams=2)
@@ -99,7 +241,8 @@ def test_safe_to_play_with_jack_and_everyone_left_out_of_trump():
     game.set_plays_after()
 
     trick = TrickFactory(hand__game=game, hand__trump="hearts")
-    trick.hand.players_out_of_suits["hearts"] = [str(p3.id)]
+    p3.refresh_from_db()
+    trick.hand.mark_out_of_suit(p3, "hearts")
 
     Play.objects.create(trick=trick, card="0H", player=p1)
     current_plays = trick.plays.all()
@@ -107,3 +250,25 @@ def test_safe_to_play_with_jack_and_everyone_left_out_of_trump():
     safe = card_counting.safe_to_play(trick.hand, trick, p2, Card(representation="JH"), current_plays)
 
     assert safe is True
+
+
+@pytest.mark.django_db
+def test_decision_cache_shares_answers(mocker):
+    game = GameFactory(num_players=3, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0)
+    p2 = PlayerFactory(game=game, seat=1, cards_in_hand=["KH", "2C"])
+    PlayerFactory(game=game, seat=2)
+    game.set_seats()
+    game.set_plays_after()
+    trick = TrickFactory(hand__game=game, hand__trump="spades")
+    plays = [Play.objects.create(trick=trick, card="AH", player=p1)]
+    cache = card_counting.DecisionCache()
+    possible_cards = mocker.spy(card_counting.HandKnowledge, "possible_cards")
+
+    first = card_counting.safe_to_play(trick.hand, trick, p2, Card.from_rep("2C"), plays, cache=cache)
+    second = card_counting.safe_to_play(trick.hand, trick, p2, Card.from_rep("2C"), plays, cache=cache)
+    card_counting.could_be_defeated(trick.hand, trick, p2, Card.from_rep("KH"), plays, cache=cache)
+
+    assert first is second is False
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert possible_cards.call_count == 1
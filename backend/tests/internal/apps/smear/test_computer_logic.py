@@ -1,8 +1,29 @@
 import pytest
 
-from apps.smear.computer_logic import calculate_bid, choose_card
+from apps.smear.computer_logic import HandProfile, calculate_bid, choose_card
 from apps.smear.models import Play
-from tests.internal.apps.smear.factories import HandFactory, PlayerFactory, TrickFactory
+from tests.internal.apps.smear.factories import GameFactory, HandFactory, PlayerFactory, TrickFactory
+
+
+def test_HandProfile():
+    profile = HandProfile(["JC", "2S", "AS", "0S", "KH", "QD"])
+
+    spades = profile.trumps["spades"]
+    assert spades.num_trump == 4
+    assert spades.num_jacks_and_jicks == 1
+    assert spades.num_AKQ == 1
+    assert (spades.high_rank, spades.low_rank) == (14, 1)
+    # In hundredths
+    assert spades.game_points == 20 + 10 + 20 + 60 + 20 + 15
+
+    clubs = profile.trumps["clubs"]
+    assert clubs.num_trump == 1
+    assert clubs.num_jacks_and_jicks == 1
+    assert clubs.num_AKQ == 0
+    assert clubs.high_rank == clubs.low_rank
+
+    assert profile.trumps["hearts"].num_AKQ == 1
+    assert profile.trumps["diamonds"].game_points == 15 + 20 + 20 + 20
 
 
 @pytest.mark.django_db
@@ -236,3 +257,26 @@ def test_choose_card_lead_jack_or_jick_if_they_are_high_trump_and_can_take_somet
 
     # if jack is out, it could take our jick
     assert card.representation == ("4H" if jack_out else "JC")
+
+
+@pytest.mark.django_db
+def test_choose_card_builds_trick_context_once(mocker):
+    game = GameFactory(num_players=3, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0)
+    p2 = PlayerFactory(game=game, seat=1, cards_in_hand=["0H", "2H", "QD", "3C", "4C", "5C"])
+    PlayerFactory(game=game, seat=2)
+    game.set_seats()
+    game.set_plays_after()
+    trick = TrickFactory(hand__game=game, hand__trump="spades")
+    plays = [Play.objects.create(trick=trick, card="KH", player=p1)]
+    get_legal_plays = mocker.spy(trick, "get_legal_plays")
+    find_winning_play = mocker.spy(trick, "find_winning_play")
+    get_cards = mocker.spy(p2, "get_cards")
+
+    card = choose_card(p2, trick, plays)
+
+    assert card.representation == "2H"
+    assert get_legal_plays.call_count == 1
+    # Once for the trick context, once more from card counting
+    assert find_winning_play.call_count == 2
+    assert get_cards.call_count == 1
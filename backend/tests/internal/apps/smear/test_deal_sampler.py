@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from apps.smear.card_arrays import EMPTY
+from apps.smear.cards import Card
+from apps.smear.deal_sampler import DealSampler
+from apps.smear.hand_mask import FULL_MASK, SUIT_MASKS, HandMask
+from apps.smear.models import Play
+from tests.internal.apps.smear.factories import GameFactory, PlayerFactory, TrickFactory
+
+
+def mask(reps):
+    return HandMask.from_reps(reps).mask
+
+
+def assert_consistent(hands, hand_sizes, possible_masks):
+    for deal in hands:
+        dealt = set()
+        for hand, hand_size, possible in zip(deal, hand_sizes, possible_masks):
+            cards = [card_id for card_id in hand.tolist() if card_id != EMPTY]
+            assert len(cards) == hand_size
+            assert all(possible >> card_id & 1 for card_id in cards)
+            assert dealt.isdisjoint(cards)
+            dealt.update(cards)
+
+
+def test_deal_sampler_respects_hand_sizes_and_voids():
+    unseen = FULL_MASK & ~mask(["AS", "KS", "2H", "3H", "4C", "5D", "QS", "JS"])
+    hand_sizes = [6, 6, 5]
+    possible_masks = [unseen & ~SUIT_MASKS[1], unseen & ~SUIT_MASKS[0] & ~SUIT_MASKS[2], unseen]
+
+    hands = DealSampler([1, 2, 3], hand_sizes, possible_masks, seed=1).sample(500)
+
+    assert hands.shape == (500, 3, 6)
+    assert (hands[:, 2, 5] == EMPTY).all()
+    assert_consistent(hands, hand_sizes, possible_masks)
+
+
+def test_deal_sampler_tight_constraints():
+    hearts = ["2H", "3H", "4H", "5H", "6H", "7H"]
+    spades = ["2S", "3S", "4S", "5S", "6S", "7S"]
+    clubs = ["2C", "3C", "4C", "5C", "6C", "7C"]
+    # Dealing greedily would often leave the last player without enough cards
+    possible_masks = [mask(hearts + spades), mask(spades + clubs), mask(hearts + clubs)]
+
+    hands = DealSampler([1, 2, 3], [6, 6, 6], possible_masks, seed=2).sample(500)
+
+    assert_consistent(hands, [6, 6, 6], possible_masks)
+    # Different splits of the suits are produced
+    assert len({tuple(sorted(deal[0].tolist())) for deal in hands}) > 1
+
+
+def test_deal_sampler_is_seeded():
+    possible_masks = [FULL_MASK, FULL_MASK & ~SUIT_MASKS[3]]
+
+    first = DealSampler([1, 2], [6, 6], possible_masks, seed=42).sample(50)
+    second = DealSampler([1, 2], [6, 6], possible_masks, seed=42).sample(50)
+
+    assert np.array_equal(first, second)
+
+
+def test_deal_sampler_no_consistent_deal():
+    with pytest.raises(ValueError):
+        DealSampler([1, 2], [3, 3], [mask(["2H", "3H", "4H"]), mask(["2H", "3H", "4H"])])
+
+
+def test_deal_sampler_deals():
+    deals = DealSampler([1, 2], [2, 1], [mask(["2H", "3H"]), mask(["4H", "5H"])], seed=3).deals(10)
+
+    assert len(deals) == 10
+    for deal in deals:
+        assert deal[1] == [Card.from_rep("2H"), Card.from_rep("3H")]
+        assert len(deal[2]) == 1
+
+
+@pytest.mark.django_db
+def test_deal_sampler_for_player():
+    game = GameFactory(num_players=3, num_teams=0)
+    p1 = PlayerFactory(game=game, seat=0, cards_in_hand=["AS", "KS", "QS", "JS", "0S"])
+    p2 = PlayerFactory(game=game, seat=1)
+    p3 = PlayerFactory(game=game, seat=2)
+    game.set_seats()
+    game.set_plays_after()
+    trick = TrickFactory(hand__game=game, hand__trump="spades")
+    Play.objects.create(trick=trick, card="9S", player=p1)
+    # p2 is out of trump
+    Play.objects.create(trick=trick, card="2H", player=p2)
+
+    sampler = DealSampler.for_player(trick.hand, p1, seed=4)
+    deals = sampler.deals(200)
+
+    assert sampler.player_ids == [p2.id, p3.id]
+    for deal in deals:
+        assert len(deal[p2.id]) == 5
+        assert len(deal[p3.id]) == 6
+        assert not any(card.is_trump("spades") for card in deal[p2.id])
+        assert not {"AS", "9S", "2H"} & {card.representation for card in deal[p2.id] + deal[p3.id]}
@@ -0,0 +1,82 @@
+import pytest
+
+from apps.smear.cards import Card
+from apps.smear.hand_mask import ALL_SEATS_VOID_MASKS, MAX_SEATS, HandMask, legal_moves, seat_voids, void_bit
+
+
+def test_HandMask_round_trips_representations():
+    reps = ["AS", "JC", "0H", "2D"]
+
+    mask = HandMask.from_reps(reps)
+
+    assert len(mask) == 4
+    assert sorted(mask.reps()) == sorted(reps)
+    assert HandMask.from_cards(mask.cards()) == mask
+    assert Card.from_rep("JC") in mask
+    assert Card.from_rep("JS") not in mask
+
+
+@pytest.mark.parametrize(
+    "trump,smallest_to_largest,expected",
+    [
+        ("spades", False, ["AS", "JS", "JC", "2S"]),
+        ("spades", True, ["2S", "JC", "JS", "AS"]),
+        ("hearts", False, ["0H"]),
+        ("diamonds", False, []),
+    ],
+)
+def test_HandMask_trump_cards(trump, smallest_to_largest, expected):
+    mask = HandMask.from_reps(["2S", "JC", "AS", "JS", "0H", "4C"])
+
+    trump_cards = mask.trump_cards(trump, smallest_to_largest=smallest_to_largest)
+
+    assert [card.representation for card in trump_cards] == expected
+
+
+def test_HandMask_suit_moves_jick_to_trump():
+    mask = HandMask.from_reps(["JC", "4C", "AS"])
+
+    assert sorted(mask.suit("clubs").reps()) == ["4C", "JC"]
+    assert mask.suit("clubs", trump="spades").reps() == ["4C"]
+    assert sorted(mask.suit("spades", trump="spades").reps()) == ["AS", "JC"]
+
+
+def test_HandMask_set_algebra():
+    mine = HandMask.from_reps(["AS", "KS", "2H"])
+    played = HandMask.from_reps(["KS", "3H"])
+
+    assert (mine & played).reps() == ["KS"]
+    assert sorted((mine | played).reps()) == ["2H", "3H", "AS", "KS"]
+    assert sorted((mine - played).reps()) == ["2H", "AS"]
+    assert len(~mine) == 49
+
+
+@pytest.mark.parametrize(
+    "hand,lead,trump,expected",
+    [
+        (["2S", "3H", "4C"], None, "spades", ["2S", "3H", "4C"]),
+        (["2S", "3H", "4C"], "AS", "spades", ["2S"]),
+        (["JC", "3H", "4C"], "AS", "spades", ["JC"]),
+        (["3H", "4C"], "AS", "spades", ["3H", "4C"]),
+        (["2S", "3H", "4C"], "AH", "spades", ["2S", "3H"]),
+        (["JD", "2S", "3S"], "2D", "hearts", ["JD", "2S", "3S"]),
+        (["2H", "2S", "3S"], "JH", "diamonds", ["2H", "2S", "3S"]),
+        (["2D", "2S", "3S"], "JH", "diamonds", ["2D"]),
+    ],
+)
+def test_legal_moves(hand, lead, trump, expected):
+    hand_cards = [Card.from_rep(rep) for rep in hand]
+    lead_card = Card.from_rep(lead) if lead else None
+
+    legal = legal_moves(hand_cards, lead_card, trump)
+
+    assert [card.representation for card in legal] == expected
+
+
+def test_seat_voids():
+    voids = void_bit(0, 1) | void_bit(7, 3) | ALL_SEATS_VOID_MASKS[2]
+
+    assert voids < 1 << 32
+    assert seat_voids(voids, 0) == 0b0110
+    assert seat_voids(voids, 7) == 0b1100
+    assert all(seat_voids(voids, seat) & 0b0100 for seat in range(MAX_SEATS))
@@ -0,0 +1,85 @@
+import pytest
+
+from apps.smear.identity_map import identity_map
+from apps.smear.models import Play, Player, Trick
+from tests.internal.apps.smear.factories import PlayerFactory, TeamFactory, TrickFactory
+
+
+@pytest.mark.django_db
+def test_identity_map_shares_related_instances(django_assert_num_queries):
+    team = TeamFactory()
+    player = PlayerFactory(game=team.game, team=team)
+    trick = TrickFactory(hand__game=team.game, hand__bidder=player, active_player=player)
+    Play.objects.create(trick=trick, player=player, card="AS")
+
+    with identity_map():
+        trick = Trick.objects.get(id=trick.id)
+        play = Play.objects.get(trick=trick)
+        with django_assert_num_queries(3):
+            # One query each for the player, the hand and the team
+            assert trick.active_player is play.player
+            assert trick.hand.bidder is play.player
+            assert play.player.team is trick.active_player.team
+
+
+@pytest.mark.django_db
+def test_identity_map_only_within_context():
+    player = PlayerFactory()
+    trick = TrickFactory(hand__game=player.game, hand__bidder=player, active_player=player)
+
+    trick = Trick.objects.get(id=trick.id)
+
+    assert trick.active_player == trick.hand.bidder
+    assert trick.active_player is not trick.hand.bidder
+
+
+@pytest.mark.django_db
+def test_identity_map_reloads_update_the_shared_instance():
+    player = PlayerFactory(cards_in_hand=["AS"])
+
+    with identity_map():
+        loaded = Player.objects.get(id=player.id)
+        loaded.increment_score()
+        Player.objects.filter(id=player.id).update(cards_in_hand=["KS", "QS"])
+
+        reloaded = Player.objects.get(id=player.id)
+
+        assert reloaded is loaded
+        assert loaded.score == 1
+        assert loaded.cards_in_hand == ["KS", "QS"]
+
+
+@pytest.mark.django_db
+def test_identity_map_reloads_keep_unsaved_edits():
+    player = PlayerFactory(cards_in_hand=["AS", "KS"])
+
+    with identity_map():
+        loaded = Player.objects.get(id=player.id)
+        # Edited in place and not saved yet
+        loaded.cards_in_hand.remove("AS")
+        Player.objects.filter(id=player.id).update(score=5)
+
+        reloaded = Player.objects.get(id=player.id)
+
+        assert reloaded is loaded
+        assert loaded.get_pending_fields() == {"cards_in_hand"}
+        assert loaded.cards_in_hand == ["KS"]
+        assert loaded.score == 5
+
+        loaded.save()
+        Player.objects.filter(id=player.id).update(cards_in_hand=[])
+        assert Player.objects.get(id=player.id).cards_in_hand == []
+
+
+@pytest.mark.django_db
+def test_identity_map_refresh_from_db_discards_unsaved_edits():
+    player = PlayerFactory(cards_in_hand=["AS", "KS"])
+
+    with identity_map():
+        loaded = Player.objects.get(id=player.id)
+        loaded.cards_in_hand = ["QS"]
+
+        loaded.refresh_from_db()
+
+        assert loaded.cards_in_hand == ["AS", "KS"]
+        assert loaded.get_pending_fields() == set()
@@ -2,7 +2,20 @@ import copy
 
 import pytest
 
-from apps.smear.cards import Card, Deck
+from apps.smear.cards import (
+    CARD_REPRESENTATION,
+    IS_JACK,
+    IS_JICK,
+    IS_TRUMP,
+    NUM_CARDS,
+    TRUMP_RANK,
+    Card,
+    Deck,
+    card_id_from_representation,
+    resolve_trick,
+    trump_index,
+    winning_index,
+)
 
 
 @pytest.mark.parametrize(
@@ -99,3 +112,119 @@ def test_Deck_deal():
     assert len(deck.cards) == 49
     assert len(cards) == 3
     assert cards == old_cards[0:3]
+
+
+def test_card_ids_round_trip_through_representation():
+    for card_id in range(NUM_CARDS):
+        rep = CARD_REPRESENTATION[card_id]
+        assert card_id_from_representation(rep) == card_id
+        assert Card(representation=rep).id == card_id
+
+
+@pytest.mark.parametrize(
+    "rep,trump,exp_trump_rank,exp_is_trump,exp_is_jack,exp_is_jick",
+    [
+        ("JS", "spades", 11, True, True, False),
+        ("JC", "spades", 10, True, False, True),
+        ("JD", "spades", 10, False, False, False),
+        ("AS", "spades", 14, True, False, False),
+        ("0H", "hearts", 9, True, False, False),
+        ("2D", "hearts", 1, False, False, False),
+        ("JH", "", 10, False, False, False),
+    ],
+)
+def test_trump_tables(rep, trump, exp_trump_rank, exp_is_trump, exp_is_jack, exp_is_jick):
+    card_id = card_id_from_representation(rep)
+    index = trump_index(trump)
+
+    assert TRUMP_RANK[index][card_id] == exp_trump_rank
+    assert IS_TRUMP[index][card_id] is exp_is_trump
+    assert IS_JACK[index][card_id] is exp_is_jack
+    assert IS_JICK[index][card_id] is exp_is_jick
+
+
+def test_Card_same_suit_with_jick():
+    trump = "hearts"
+
+    assert Card(representation="JD").same_suit(Card(representation="2H"), trump)
+    assert not Card(representation="JD").same_suit(Card(representation="2D"), trump)
+    assert Card(representation="JC").same_suit(Card(representation="2C"), trump)
+
+
+def test_Card_rejects_invalid_card():
+    with pytest.raises(ValueError):
+        Card(representation="1X")
+    with pytest.raises(ValueError):
+        Card(value="11", suit="spades")
+
+
+def test_Card_instances_are_interned():
+    card = Card.from_rep("AS")
+
+    assert Card(representation="AS") is card
+    assert Card(value="ace", suit="spades") is card
+    assert copy.deepcopy(card) is card
+    assert {card, Card.from_rep("AS"), Card.from_rep("KS")} == {Card.from_rep("KS"), card}
+
+
+def test_Card_is_immutable():
+    card = Card.from_rep("AS")
+
+    with pytest.raises(AttributeError):
+        card.suit = "hearts"
+
+    assert card.suit == "spades"
+
+
+@pytest.mark.parametrize(
+    "reps,trump,expected_index",
+    [
+        (["2H", "AH", "KH"], "spades", 1),
+        (["2H", "AD", "KC"], "spades", 0),
+        (["2H", "AH", "2S"], "spades", 2),
+        (["JC", "AS", "JS"], "spades", 1),
+        (["0S", "JC", "JS", "3S"], "spades", 2),
+        (["AH"], "spades", 0),
+    ],
+)
+def test_winning_index(reps, trump, expected_index):
+    cards = [Card.from_rep(rep) for rep in reps]
+
+    assert winning_index(cards, trump) == expected_index
+
+
+def test_Deck_with_same_seed_deals_same_cards():
+    deck = Deck()
+    same_deck = Deck(seed=deck.seed)
+
+    assert deck.deal(6) == same_deck.deal(6)
+    assert deck.cards == same_deck.cards
+
+
+def test_Deck_deals_every_card_once():
+    deck = Deck(seed=1234)
+
+    dealt = [card for _ in range(8) for card in deck.deal(6)]
+
+    assert len(set(dealt)) == 48
+    assert len(deck.cards) == 4
+    assert not set(dealt) & set(deck.cards)
+
+
+@pytest.mark.parametrize(
+    "reps,trump,expected",
+    [
+        (["2H", "AH", "KH"], "spades", (1, 7, False, False, 0)),
+        (["0S", "JC", "JS", "3S"], "spades", (2, 12, True, True, 4)),
+        (["AD", "JH", "0D"], "spades", (0, 15, False, False, 0)),
+        (["AD", "JH", "0D"], "diamonds", (0, 15, False, True, 3)),
+        (["0D", "JH", "AH"], "diamonds", (1, 15, False, True, 2)),
+    ],
+)
+def test_resolve_trick(reps, trump, expected):
+    cards = [Card.from_rep(rep) for rep in reps]
+
+    result = resolve_trick(cards, trump)
+
+    assert tuple(result) == expected
+    assert result.winner_index == winning_index(cards, trump)
@@ -2,6 +2,8 @@ import pytest
 from rest_framework import status
 from rest_framework.reverse import reverse
 
+from apps.smear.card_codec import decode_cards
+from apps.smear.models import Game, Trick
 from apps.smear.serializers import GameSerializer
 from tests.internal.apps.smear.factories import GameFactory, GameFactoryWithHandsAndTricks, PlayerFactory
 from tests.internal.apps.user.factories import UserFactory
@@ -91,6 +93,52 @@ def test_game_viewset_status_bidding(authed_client, django_assert_num_queries, m
     }
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "query,accept",
+    [
+        ("?card_format=compact", "application/json"),
+        ("", "application/json; card_format=compact"),
+    ],
+)
+def test_game_viewset_status_compact_cards(authed_client, query, accept):
+    game = GameFactoryWithHandsAndTricks()
+    game.start_game()
+    p1 = game.player_set.first()
+    client = authed_client(p1.user)
+
+    url = f"{reverse('games-detail', kwargs={'pk': game.id})}status/{query}"
+    response = client.get(url, HTTP_ACCEPT=accept)
+
+    assert response.status_code == status.HTTP_200_OK
+    p1.refresh_from_db()
+    cards = response.json()["current_hand"]["cards"]
+    assert isinstance(cards, str)
+    assert decode_cards(cards) == p1.cards_in_hand
+
+
+@pytest.mark.django_db
+def test_game_viewset_status_compact_trick_cards(authed_client):
+    game = GameFactoryWithHandsAndTricks(state=Game.GAME_OVER)
+    trick = Trick.objects.get(hand__game=game, hand__num=1, num=2)
+    plays = list(trick.plays.order_by("id"))
+    for play, card in zip(plays, ["0H", "JD", "2C", "KS"]):
+        play.card = card
+        play.save()
+    client = authed_client(game.player_set.first().user)
+
+    url = f"{reverse('games-detail', kwargs={'pk': game.id})}status/?hand_num=1&trick_num=2"
+    expected_plays = client.get(url).json()["current_trick"]["plays"]
+    response = client.get(f"{url}&card_format=compact")
+
+    assert response.status_code == status.HTTP_200_OK
+    current_trick = response.json()["current_trick"]
+    assert decode_cards(current_trick["cards"]) == [play["card"] for play in expected_plays]
+    assert sorted(decode_cards(current_trick["cards"])) == sorted(["0H", "JD", "2C", "KS"])
+    assert [play["id"] for play in current_trick["plays"]] == [play["id"] for play in expected_plays]
+    assert all("card" not in play for play in current_trick["plays"])
+
+
 @pytest.mark.django_db
 def test_game_viewset_create(authed_client, django_assert_num_queries):
     owner_user = UserFactory()
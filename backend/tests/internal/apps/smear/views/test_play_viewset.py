@@ -180,7 +180,7 @@ def test_play_viewset_database_queries(authed_client, django_assert_num_queries)
 
     # Player 1 leads Ace of Trump
     play_data = {"card": f"A{trump_rep}"}
-    with django_assert_num_queries(15):
+    with django_assert_num_queries(14):
         response = client1.post(url, play_data)
         assert response.status_code == status.HTTP_201_CREATED, response.json()
 